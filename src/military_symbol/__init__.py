@@ -3,14 +3,31 @@ import sys
 
 sys.path.append(os.path.dirname(__file__))
 from command_line import *
+from command_line import init as init, get_schema as get_schema, get_symbol_cache as get_symbol_cache
 from schema import Schema as Schema
 from symbol import Symbol as Symbol
 from template import Template as Template
 from output_style import OutputStyle as OutputStyle
 
-if __name__ == '__main__':
-    command_line_main()
-
-
+# The library imports its modules by their bare names, so military_symbol.instrumentation is aliased to the same module
+# rather than loaded again with its own state
+import instrumentation as instrumentation
+sys.modules[__name__ + '.instrumentation'] = instrumentation
 
+def __getattr__(name:str):
+    # The default schema and cache are loaded lazily by command_line
+    if name in ['sym_schema', 'symbol_cache']:
+        import command_line
+        return getattr(command_line, name)
+    # Batch rendering is only imported when it's used, since it pulls in multiprocessing
+    if name in ['render_many', 'RenderResult', 'resolve_many', 'NameResult']:
+        import batch_render
+        return getattr(batch_render, name)
+    # Fork support is only imported when it's used
+    if name in ['preload', 'get_memory_usage']:
+        import shared_schema
+        return getattr(shared_schema, name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
+if __name__ == '__main__':
+    command_line_main()
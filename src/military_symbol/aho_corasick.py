@@ -0,0 +1,65 @@
+"""
+A small Aho-Corasick automaton for finding which of a fixed set of patterns occur in a string in a
+single pass over it, independent of the number of patterns.
+"""
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. Patterns are identified by their index in the list the automaton
+    was built from.
+    """
+
+    def __init__(self, patterns:list):
+        self.pattern_count:int = len(patterns)
+        self.transitions:list = [{}]  # Per node, a map of character to child node
+        self.fail:list = [0]          # Per node, the node for the longest proper suffix that is also in the trie
+        self.outputs:list = [()]      # Per node, the indices of the patterns ending at this node
+
+        # Build the trie
+        node_outputs:list = [[]]
+        for pattern_index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                next_node = self.transitions[node].get(char, None)
+                if next_node is None:
+                    next_node = len(self.transitions)
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    node_outputs.append([])
+                    self.transitions[node][char] = next_node
+                node = next_node
+            node_outputs[node].append(pattern_index)
+
+        # Compute failure links breadth-first, so every node's failure target is finished before it
+        queue:list = list(self.transitions[0].values())
+        for node in queue:
+            for char, child in self.transitions[node].items():
+                fail_node = self.fail[node]
+                while fail_node and char not in self.transitions[fail_node]:
+                    fail_node = self.fail[fail_node]
+                self.fail[child] = self.transitions[fail_node].get(char, 0)
+                node_outputs[child] += node_outputs[self.fail[child]]
+                queue.append(child)
+
+        self.outputs = [tuple(outputs) for outputs in node_outputs]
+
+    def __repr__(self) -> str:
+        return f'AhoCorasick({self.pattern_count} patterns, {len(self.transitions)} nodes)'
+
+    def find_all(self, text:str) -> set:
+        """
+        Returns the indices of every pattern occurring at least once in the given text
+        """
+        transitions = self.transitions
+        fail = self.fail
+        outputs = self.outputs
+
+        found:set = set(outputs[0])
+        node = 0
+        for char in text:
+            while node and char not in transitions[node]:
+                node = fail[node]
+            node = transitions[node].get(char, 0)
+            if outputs[node]:
+                found.update(outputs[node])
+        return found
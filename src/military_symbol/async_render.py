@@ -0,0 +1,161 @@
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(__file__))
+import command_line
+import batch_render
+from symbol import Symbol
+
+"""
+Coroutine counterparts of the module-level rendering helpers, for use from an asyncio event loop. Lookups that hit the
+default symbol cache are answered on the loop; anything that has to be created runs on an executor, and concurrent
+identical requests on the same loop share one call.
+"""
+
+# The executor misses are run on; None uses the event loop's default executor
+_executor = None
+
+# Map of (event loop, request key) to the future of the call in progress for it
+_in_flight:dict = {}
+
+
+def set_executor(executor):
+    """
+    Sets the executor that cache misses are dispatched to. The default symbol cache is thread-safe, so a
+    ThreadPoolExecutor may be used; process pools can't be, since results are cached in this process.
+    :param executor: A concurrent.futures.Executor, or None to use the event loop's default executor
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    """
+    Returns the executor that cache misses are dispatched to, or None if the event loop's default executor is used
+    """
+    return _executor
+
+
+def _get_loaded_symbol_cache():
+    # The default cache is loaded on first use, which reads the schema, so that's left to the executor
+    return command_line._default_symbol_cache
+
+
+async def _run_coalesced(key:tuple, func, *args):
+    """
+    Runs func(*args) on the executor, unless a call for the same key is already running on this event loop, in
+    which case its result is shared
+    """
+    loop = asyncio.get_running_loop()
+    flight_key:tuple = (loop, key)
+
+    future = _in_flight.get(flight_key, None)
+    if future is None:
+        future = loop.run_in_executor(_executor, func, *args)
+        _in_flight[flight_key] = future
+        future.add_done_callback(lambda done: _in_flight.pop(flight_key, None))
+
+    # Shielded so that one caller being cancelled doesn't cancel the call for the others waiting on it
+    return await asyncio.shield(future)
+
+
+async def get_symbol_and_svg_string(creator_var:str, is_sidc:bool, padding:int=4, style:str='light', use_variants:bool=False,
+                                    use_background=False, background_color='#ffffff', force_all_elements=False,
+                                    limit_to_symbol_sets=None) -> tuple:
+    """
+    Returns a (Symbol, str) tuple containing the symbol and SVG string for the given creator value and style elements,
+    as command_line.get_symbol_and_svg_string does
+    :param creator_var: The SIDC or name to construct the symbol from
+    :param is_sidc: Whether the creator value is a SIDC (true) or name (false)
+    :param padding: The padding around the symbol, in pixels, to maintain when cropping. Values less than 0 will result in no cropping being performed. The default value is 4 pixels.
+    :param style: Style to use, between 'light', 'dark', 'medium', and 'unfilled'
+    :param use_variants: Whether to use variant symbols
+    :param use_background: Whether to use a colored background around the symbol
+    :param background_color: Background color to use, if it's used
+    :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+    :return: A (Symbol, str) tuple containing the symbol and SVG for the constructed symbol.
+    """
+    symbol_cache = _get_loaded_symbol_cache()
+    if symbol_cache is not None:
+        symbol, svg_string = symbol_cache.get_cached_symbol_and_svg_string(creator_var, is_sidc, padding, style, use_variants,
+            use_background=use_background, background_color=background_color, limit_to_symbol_sets=limit_to_symbol_sets)
+        if svg_string:
+            return symbol, svg_string
+
+    key:tuple = ('svg', creator_var, is_sidc, padding, style, use_variants, use_background, background_color,
+                 force_all_elements, tuple(limit_to_symbol_sets) if limit_to_symbol_sets is not None else None)
+    return await _run_coalesced(key, lambda: command_line.get_symbol_and_svg_string(creator_var, is_sidc, padding=padding,
+        style=style, use_variants=use_variants, use_background=use_background, background_color=background_color,
+        force_all_elements=force_all_elements, limit_to_symbol_sets=limit_to_symbol_sets))
+
+
+async def get_svg_string(creator_var:str, is_sidc:bool, pixel_padding=4, use_variants=False, style='light', use_background=False,
+                         background_color='#ffffff', force_all_elements=False, limit_to_symbol_sets=None) -> str:
+    """
+    Constructs an SVG for the specified symbol, given as a SIDC or name, as command_line.get_svg_string does
+    :param creator_var: The SIDC or name to construct the symbol from
+    :param is_sidc: Whether the creator value is a SIDC (true) or name (false)
+    :param pixel_padding: The padding around the symbol, in pixels, to maintain when cropping. Values less than 0 will result in no cropping being performed. The default value is 4 pixels.
+    :param use_variants: Whether to use variant symbols
+    :param style: Style to use, between 'light', 'dark', 'medium', and 'unfilled'
+    :param use_background: Whether to use a colored background around the symbol
+    :param background_color: Background color to use, if it's used
+    :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+    :return: A string containing the SVG for the constructed symbol.
+    """
+    symbol, svg_string = await get_symbol_and_svg_string(creator_var, is_sidc, padding=pixel_padding, style=style,
+        use_variants=use_variants, use_background=use_background, background_color=background_color,
+        force_all_elements=force_all_elements, limit_to_symbol_sets=limit_to_symbol_sets)
+    return svg_string
+
+
+async def get_symbol_class(originator, is_sidc=True, limit_to_symbol_sets=None) -> Symbol:
+    """
+    Returns a symbol.Symbol object constructed from the given name, as a best guess, or SIDC, as
+    command_line.get_symbol_class does
+    :param originator: The variable to construct from, whether name or SIDC
+    :param is_sidc: Whether the originator is a SIDC (true) or name (false)
+    :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+    :return: The generated symbol
+    """
+    symbol_cache = _get_loaded_symbol_cache()
+    if symbol_cache is not None:
+        symbol:Symbol = symbol_cache.get_cached_symbol(originator, is_sidc, limit_to_symbol_sets=limit_to_symbol_sets)
+        if symbol is not None:
+            return symbol
+
+    key:tuple = ('symbol', originator, is_sidc, tuple(limit_to_symbol_sets) if limit_to_symbol_sets is not None else None)
+    return await _run_coalesced(key, lambda: command_line.get_symbol_class(originator, is_sidc=is_sidc,
+        limit_to_symbol_sets=limit_to_symbol_sets))
+
+
+async def render_many(inputs, **kwargs):
+    """
+    Renders every input as batch_render.render_many does, yielding each RenderResult as it's ready. The batch runs on
+    the executor, so with workers=1 it renders on an executor thread rather than blocking the event loop.
+    :param inputs: An iterable of SIDCs or names; it's consumed on the executor, so it may be a blocking generator
+    :param kwargs: Keyword arguments for batch_render.render_many
+    :return: An asynchronous generator of RenderResult objects
+    """
+    loop = asyncio.get_running_loop()
+    results = batch_render.render_many(inputs, **kwargs)
+    finished = object()
+
+    try:
+        while True:
+            result = await loop.run_in_executor(_executor, next, results, finished)
+            if result is finished:
+                break
+            yield result
+    finally:
+        # Shuts down the batch's worker pool, if it has one, off the event loop
+        await loop.run_in_executor(_executor, _close_results, results)
+
+
+def _close_results(results):
+    try:
+        results.close()
+    except ValueError:
+        # A cancelled call is still running the generator on another thread; it's closed when collected instead
+        pass
@@ -0,0 +1,389 @@
+import os
+import sys
+import time
+import contextlib
+
+sys.path.append(os.path.dirname(__file__))
+import command_line
+import name_to_sidc
+from schema import Schema
+
+"""
+Rendering of many symbols, or resolution of many names, at once, optionally spread over a pool of worker processes
+"""
+
+class RenderResult:
+    """
+    The outcome of rendering one input in one style. Exactly one of svg and error is set.
+    """
+
+    def __init__(self, index:int, creator_val:str, is_sidc:bool, style:str):
+        self.index:int = index            # The position of this result in the batch
+        self.creator_val:str = creator_val  # The SIDC or name that was rendered
+        self.is_sidc:bool = is_sidc
+        self.style:str = style
+        self.sidc:str = None              # The SIDC of the rendered symbol
+        self.svg:str = None
+        self.error:str = None
+
+    def __repr__(self) -> str:
+        return f'RenderResult({self.index}, "{self.creator_val}", {self.style}, {"error: " + self.error if self.error is not None else self.sidc})'
+
+    def is_ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        return {
+            'index': self.index,
+            'input': self.creator_val,
+            'is_sidc': self.is_sidc,
+            'style': self.style,
+            'sidc': self.sidc,
+            'svg': self.svg,
+            'error': self.error
+        }
+
+
+def _init_worker(schema_dir:str, snapshot_path:str, template_filename:str):
+    # Runs once in each worker process, so the schema is loaded once per worker rather than once per task, or not at
+    # all if the worker was forked from a process that preloaded the same schema
+    import shared_schema
+    if shared_schema.is_preloaded_in_parent(schema_dir, snapshot_path, template_filename):
+        return
+    command_line.init(schema_dir=schema_dir, snapshot_path=snapshot_path)
+    if template_filename:
+        command_line.add_templates_from_file(template_filename)
+
+
+def _render_item(task:tuple, options:dict) -> RenderResult:
+    index, creator_val, is_sidc, style = task
+    result = RenderResult(index, creator_val, is_sidc, style)
+    try:
+        symbol, svg_string = command_line.get_symbol_and_svg_string(creator_val, is_sidc, style=style, **options)
+        if symbol is None or not svg_string:
+            result.error = f'Unable to create a symbol from "{creator_val}"'
+        else:
+            result.sidc = symbol.get_sidc()
+            result.svg = svg_string
+    except Exception as ex:
+        result.error = f'{type(ex).__name__}: {ex}'
+    return result
+
+
+def _render_chunk(tasks:list, options:dict) -> list:
+    return [_render_item(task, options) for task in tasks]
+
+
+def _failed_chunk(tasks:list, ex:BaseException) -> list:
+    results:list = []
+    for index, creator_val, is_sidc, style in tasks:
+        result = RenderResult(index, creator_val, is_sidc, style)
+        result.error = f'{type(ex).__name__}: {ex}'
+        results.append(result)
+    return results
+
+
+def render_many(inputs, is_sidc:bool=True, styles:list=['light'], padding:int=4, use_variants:bool=False,
+                use_background:bool=False, background_color:str='#ffffff', limit_to_symbol_sets:list=None,
+                workers:int=None, ordered:bool=True, chunk_size:int=64, schema_dir:str=None, snapshot_path:str=None,
+                template_filename:str=None, force_all_elements:bool=False):
+    """
+    Renders every input in every given style, yielding a RenderResult for each. Failures are reported on their
+    result rather than raised, so one bad input doesn't abort the batch.
+    :param inputs: An iterable of SIDCs or names; it's consumed lazily, so it may be a generator
+    :param is_sidc: Whether the inputs are SIDCs (true) or names (false)
+    :param styles: The styles to render each input in, from ['light', 'medium', 'dark', 'unfilled']
+    :param padding: The padding around each symbol, in pixels. Values less than 0 will result in no cropping being performed.
+    :param use_variants: Whether to use variant symbols
+    :param use_background: Whether to use a colored background around each symbol
+    :param background_color: Background color to use, if it's used
+    :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+    :param workers: The number of worker processes to use, defaulting to the number of CPUs; 1 or less renders in
+        this process with the default symbol cache
+    :param ordered: Whether to yield results in input order (true) or as soon as they're rendered (false)
+    :param chunk_size: The number of renders sent to a worker at a time
+    :param schema_dir: The directory to load the schema JSON files from in each worker; defaults to the bundled schema
+    :param snapshot_path: An optional compiled schema snapshot for the workers to load; it's compiled first if stale
+    :param template_filename: An optional template file for name guessing; it's only added to the default schema once
+    :param force_all_elements: Whether to force all elements of each symbol to be drawn
+    :return: A generator of RenderResult objects, one per input and style, with inputs varying slowest
+    """
+    options:dict = {
+        'padding': padding,
+        'use_variants': use_variants,
+        'use_background': use_background,
+        'background_color': background_color,
+        'limit_to_symbol_sets': limit_to_symbol_sets,
+        'force_all_elements': force_all_elements
+    }
+
+    def generate_tasks():
+        index:int = 0
+        for creator_val in inputs:
+            for style in styles:
+                yield (index, creator_val, is_sidc, style)
+                index += 1
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        if schema_dir is not None or snapshot_path is not None:
+            command_line.init(schema_dir=schema_dir, snapshot_path=snapshot_path)
+        if template_filename:
+            command_line.add_templates_from_file(template_filename)
+        for task in generate_tasks():
+            yield _render_item(task, options)
+        return
+
+    # Compile the snapshot once up front so that workers don't all rebuild it at once
+    _precompile_snapshot(schema_dir, snapshot_path)
+
+    yield from _map_chunks(generate_tasks(), _render_chunk, (options,), _failed_chunk, workers=workers, ordered=ordered,
+                           chunk_size=chunk_size, initializer=_init_worker,
+                           initargs=(schema_dir, snapshot_path, template_filename))
+
+
+def _precompile_snapshot(schema_dir:str, snapshot_path:str):
+    if snapshot_path is not None:
+        load_args:dict = {'snapshot_path': snapshot_path}
+        if schema_dir is not None:
+            load_args['directory'] = schema_dir
+        Schema.load_from_directory(**load_args)
+
+
+def _map_chunks(task_iter, chunk_func, chunk_args:tuple, failed_func, workers:int, ordered:bool, chunk_size:int,
+                initializer, initargs:tuple):
+    # Runs chunk_func(tasks, *chunk_args) over chunks of tasks in a pool of worker processes, yielding each result.
+    # A chunk that can't be run is turned into results by failed_func(tasks, exception).
+
+    # Imported here so that importing the module stays cheap
+    import itertools
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    # Only a few chunks per worker are submitted at a time, so large or unbounded inputs aren't all queued at once
+    max_pending:int = workers * 4
+    pending:dict = {}     # Map of future to (chunk number, tasks)
+    completed:dict = {}   # Map of chunk number to results waiting to be yielded in order
+    next_chunk:int = 0    # The next chunk number to submit
+    next_yield:int = 0    # The next chunk number to yield, if ordered
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        while True:
+            while len(pending) < max_pending:
+                tasks:list = list(itertools.islice(task_iter, chunk_size))
+                if len(tasks) < 1:
+                    break
+                try:
+                    future = executor.submit(chunk_func, tasks, *chunk_args)
+                except Exception as ex:
+                    # The pool is broken, so report the chunk as failed rather than stopping
+                    completed[next_chunk] = failed_func(tasks, ex)
+                else:
+                    pending[future] = (next_chunk, tasks)
+                next_chunk += 1
+
+            if len(pending) < 1 and (not ordered or next_yield >= next_chunk):
+                for results in completed.values():
+                    yield from results
+                break
+
+            if len(pending) > 0:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_number, tasks = pending.pop(future)
+                    try:
+                        completed[chunk_number] = future.result()
+                    except Exception as ex:
+                        completed[chunk_number] = failed_func(tasks, ex)
+
+            if ordered:
+                while next_yield in completed:
+                    yield from completed.pop(next_yield)
+                    next_yield += 1
+            else:
+                for chunk_number in list(completed):
+                    yield from completed.pop(chunk_number)
+
+
+class NameResult:
+    """
+    The outcome of resolving one name record to a SIDC. If error is set, the other resolution fields are not.
+    """
+
+    def __init__(self, index:int, name:str, record_id=None):
+        self.index:int = index            # The position of this result in the stream
+        self.name:str = name              # The name that was resolved
+        self.record_id = record_id        # The "id" of the input record, passed through unchanged
+        self.sidc:str = None
+        self.components:dict = None       # Map of matched component name to its ID code and name
+        self.remaining:str = None         # The text of the name left unmatched
+        self.elapsed_ms:float = 0.0       # Time taken to resolve the name, including the cache lookup
+        self.cached:bool = False          # Whether the resolution came from the cache
+        self.error:str = None
+
+    def __repr__(self) -> str:
+        return f'NameResult({self.index}, "{self.name}", {"error: " + self.error if self.error is not None else self.sidc})'
+
+    def is_ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        return {
+            'index': self.index,
+            'id': self.record_id,
+            'name': self.name,
+            'sidc': self.sidc,
+            'components': self.components,
+            'remaining': self.remaining,
+            'elapsed_ms': round(self.elapsed_ms, 3),
+            'cached': self.cached,
+            'error': self.error
+        }
+
+
+# Resolutions made in this process, keyed by name resolution key; created by _get_resolution_cache
+_resolution_cache = None
+
+
+def _get_resolution_cache(cache_size:int):
+    # A call asking for a different size than the current cache's replaces it, rather than silently keeping the old
+    # limit
+    global _resolution_cache
+    max_entries:int = max(cache_size, 1)
+    if _resolution_cache is None or _resolution_cache.max_entries != max_entries:
+        from bounded_cache import BoundedCache
+        _resolution_cache = BoundedCache(max_entries=max_entries, policy='lru')
+    return _resolution_cache
+
+
+def _init_resolve_worker(schema_dir:str, snapshot_path:str, template_filename:str, cache_size:int):
+    _init_worker(schema_dir, snapshot_path, template_filename)
+    _get_resolution_cache(cache_size)
+
+
+def parse_name_record(record) -> tuple:
+    """
+    Reads a name record, given as a dict, a line of JSON, or a bare name
+    :param record: A dict or JSON object with a "name" and optional "tags" (symbol set names to limit guessing to,
+        as a list or a single string) and "id" (passed through to the result), or a string that isn't JSON, which
+        is taken as the name itself
+    :return: A (name, tags list, record ID) tuple
+    """
+    if isinstance(record, str):
+        stripped:str = record.strip()
+        if not stripped.startswith('{'):
+            return stripped, [], None
+        import json
+        record = json.loads(stripped)
+
+    if not isinstance(record, dict):
+        raise Exception(f'Name records must be JSON objects, not {type(record).__name__}')
+
+    name = record.get('name', None)
+    if not isinstance(name, str):
+        raise Exception('Name record has no "name" string')
+
+    tags = record.get('tags', [])
+    if isinstance(tags, str):
+        tags = [tags]
+    elif not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise Exception('Name record "tags" must be a string or a list of strings')
+
+    return name, tags, record.get('id', None)
+
+
+def _resolve_item(task:tuple, cache_size:int) -> NameResult:
+    index, record, limit_to_symbol_sets = task
+    start_time:float = time.perf_counter()
+
+    try:
+        name, tags, record_id = parse_name_record(record)
+    except Exception as ex:
+        result = NameResult(index, record if isinstance(record, str) else None)
+        result.error = f'{type(ex).__name__}: {ex}'
+        result.elapsed_ms = (time.perf_counter() - start_time) * 1000.0
+        return result
+
+    result = NameResult(index, name, record_id)
+    try:
+        schema = command_line.get_schema()
+        limits:list = list(limit_to_symbol_sets or []) + tags
+        cache = _get_resolution_cache(cache_size)
+        name_key:tuple = name_to_sidc.name_resolution_key(name, schema, limits)
+
+        resolved:tuple = cache.get(name_key)
+        if resolved is not None:
+            result.cached = True
+        else:
+            # Name guessing reports what it had to assume on stdout, which would corrupt streamed output
+            with contextlib.redirect_stdout(sys.stderr):
+                resolution = name_to_sidc.resolve_name(name, schema, limit_to_symbol_sets=limits)
+            if resolution is None or resolution.symbol is None:
+                raise Exception(f'No symbol creatable for name "{name}"')
+            resolved = (resolution.symbol.get_sidc(), resolution.get_components_dict(), resolution.remaining)
+            cache.put(name_key, resolved)
+
+        result.sidc, result.components, result.remaining = resolved
+    except Exception as ex:
+        result.error = f'{type(ex).__name__}: {ex}'
+
+    result.elapsed_ms = (time.perf_counter() - start_time) * 1000.0
+    return result
+
+
+def _resolve_chunk(tasks:list, cache_size:int) -> list:
+    return [_resolve_item(task, cache_size) for task in tasks]
+
+
+def _failed_resolve_chunk(tasks:list, ex:BaseException) -> list:
+    results:list = []
+    for index, record, limit_to_symbol_sets in tasks:
+        result = NameResult(index, record if isinstance(record, str) else None)
+        result.error = f'{type(ex).__name__}: {ex}'
+        results.append(result)
+    return results
+
+
+def resolve_many(records, limit_to_symbol_sets:list=None, workers:int=1, ordered:bool=True, chunk_size:int=64,
+                 cache_size:int=65536, schema_dir:str=None, snapshot_path:str=None, template_filename:str=None):
+    """
+    Resolves a stream of name records to SIDCs, yielding a NameResult for each with the matched components, the
+    unmatched text, and the time taken. Records are consumed lazily and each process keeps a bounded cache of
+    resolutions, so memory use doesn't grow with the length of the stream. Failures are reported on their result
+    rather than raised.
+    :param records: An iterable of name records, as accepted by parse_name_record; it may be a generator
+    :param limit_to_symbol_sets: A list of symbol set names to restrict guessing to for every record, in addition
+        to each record's own tags
+    :param workers: The number of worker processes to use; 1 or less resolves in this process, and None uses one
+        per CPU
+    :param ordered: Whether to yield results in input order (true) or as soon as they're resolved (false)
+    :param chunk_size: The number of records sent to a worker at a time
+    :param cache_size: The maximum number of resolutions each process caches
+    :param schema_dir: The directory to load the schema JSON files from in each worker; defaults to the bundled schema
+    :param snapshot_path: An optional compiled schema snapshot for the workers to load; it's compiled first if stale
+    :param template_filename: An optional template file for name guessing; it's only added to the default schema once
+    :return: A generator of NameResult objects, one per record
+    """
+
+    def generate_tasks():
+        for index, record in enumerate(records):
+            yield (index, record, limit_to_symbol_sets)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        if schema_dir is not None or snapshot_path is not None:
+            command_line.init(schema_dir=schema_dir, snapshot_path=snapshot_path)
+        if template_filename:
+            command_line.add_templates_from_file(template_filename)
+        for task in generate_tasks():
+            yield _resolve_item(task, cache_size)
+        return
+
+    _precompile_snapshot(schema_dir, snapshot_path)
+
+    yield from _map_chunks(generate_tasks(), _resolve_chunk, (cache_size,), _failed_resolve_chunk, workers=workers,
+                           ordered=ordered, chunk_size=chunk_size, initializer=_init_resolve_worker,
+                           initargs=(schema_dir, snapshot_path, template_filename, cache_size))
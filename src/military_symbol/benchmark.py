@@ -0,0 +1,441 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(__file__))
+from schema import Schema
+from symbol import Symbol
+from output_style import OutputStyle
+from library_version import VERSION
+import name_to_sidc
+
+"""
+A benchmark harness timing each stage of symbol generation separately, writing the results to a JSON report
+"""
+
+# The names resolved by the resolve stage, each prefixed with every one of BENCHMARK_AFFILIATIONS
+BENCHMARK_NAMES:list = [
+    'infantry platoon',
+    'mechanized infantry company',
+    'armored battalion headquarters',
+    'field artillery battery',
+    'self-propelled artillery',
+    'reconnaissance squad',
+    'engineer company',
+    'combat engineer platoon',
+    'air defense battery',
+    'medical evacuation platoon',
+    'military police company',
+    'signal battalion',
+    'special forces team',
+    'airborne infantry brigade',
+    'attack helicopter',
+    'utility rotary wing',
+    'fighter aircraft',
+    'bomber',
+    'unmanned aerial vehicle',
+    'tanker aircraft',
+    'surface combatant frigate',
+    'destroyer',
+    'aircraft carrier',
+    'submarine',
+    'mine warfare vessel',
+    'cargo ship',
+    'fishing vessel',
+    'main battle tank',
+    'armored personnel carrier',
+    'truck',
+    'ambulance',
+    'bridge',
+    'hospital',
+    'airport',
+    'power plant',
+    'checkpoint',
+    'improvised explosive device',
+    'satellite',
+    'space station',
+    'civilian crowd'
+]
+
+BENCHMARK_AFFILIATIONS:list = ['friendly', 'hostile', 'neutral', 'unknown']
+
+# Long names that contain many entity names at once, for the rank stage, which times picking the best of their matches
+BENCHMARK_AMBIGUOUS_NAMES:list = [
+    'friendly armored mechanized infantry reconnaissance cavalry engineer air defense artillery unit',
+    'hostile special operations forces naval ground air land sea unit headquarters',
+    'neutral civilian medical emergency fire police rescue hospital ambulance truck station',
+    'suspected unmanned aerial surface subsurface vehicle missile launcher radar satellite',
+    'friendly light medium heavy wheeled tracked tank recovery vehicle with mine clearing equipment'
+]
+
+STAGES:list = ['import', 'load', 'load_full', 'load_snapshot', 'from_sidc', 'resolve', 'rank', 'render', 'memory']
+
+# The most importing the package may take, as its cumulative time from -X importtime in a fresh interpreter
+IMPORT_BUDGET_S:float = 0.025
+
+# Types whose instances are shared with the rest of the interpreter rather than owned by a schema
+_UNOWNED_TYPES:tuple = (type, type(sys), type(len), type(lambda: None))
+
+
+def get_entity_sidcs(schema:Schema) -> list:
+    """
+    Returns a SIDC for every entity in every symbol set of the schema, with a friendly affiliation
+    """
+    sidcs:list = []
+    for symbol_set in schema.symbol_sets.values():
+        for entity in symbol_set.entities.values():
+            sidcs.append(f'1003{symbol_set.id_code}0000{entity.id_code}0000')
+    return sidcs
+
+
+def get_benchmark_names() -> list:
+    return [f'{affiliation} {name}' for affiliation in BENCHMARK_AFFILIATIONS for name in BENCHMARK_NAMES]
+
+
+def get_entity_matches(schema:Schema, name_string:str) -> list:
+    """
+    Returns the (name, entity) pairs for every entity in every symbol set whose name occurs in the given string, in
+    the order name_to_sidc.rank_matches expects them
+    """
+    name_string = name_string.lower().strip()
+    index = schema.get_name_index()
+    matches:list = []
+    for pool in index.get_entity_pools(index.get_symbol_set_ids()):
+        matches += pool.find_matches(name_string)
+    return matches
+
+
+def _time_repeats(func, repeat:int) -> tuple:
+    # The first run fills lazily-built indexes and caches, so it's reported separately from the repeats
+    times:list = []
+    for _ in range(repeat + 1):
+        gc.collect()
+        start_time:float = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    return times[0], times[1:]
+
+
+def _summarize(first_time:float, times:list, item_count:int) -> dict:
+    median:float = statistics.median(times)
+    return {
+        'items': item_count,
+        'repeats': len(times),
+        'first_s': round(first_time, 6),
+        'times_s': [round(t, 6) for t in times],
+        'min_s': round(min(times), 6),
+        'median_s': round(median, 6),
+        'mean_s': round(statistics.fmean(times), 6),
+        'median_per_item_us': round(median / max(item_count, 1) * 1e6, 3)
+    }
+
+
+def measure_import_time(repeat:int=5) -> tuple:
+    """
+    Times importing the package in fresh interpreters, from the cumulative time -X importtime reports for it, so that
+    the interpreter's own startup isn't counted
+    :param repeat: The number of imports to time after a first one, which may also write bytecode caches
+    :return: A (first time, list of repeat times) tuple, in seconds
+    """
+    package_dir:str = os.path.dirname(os.path.abspath(__file__))
+    package_name:str = os.path.basename(package_dir)
+    env:dict = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(package_dir)] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+
+    times:list = []
+    for _ in range(repeat + 1):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {package_name}'], env=env,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise Exception(f'Importing {package_name} failed: {completed.stderr.strip().splitlines()[-1:]}')
+
+        # Lines are "import time: <self us> | <cumulative us> | <module>", with submodules indented under the module
+        cumulative_us:int = None
+        for line in completed.stderr.splitlines():
+            fields:list = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == package_name and not fields[2][1:].startswith(' '):
+                cumulative_us = int(fields[1])
+        if cumulative_us is None:
+            raise Exception(f'No import time reported for {package_name}')
+        times.append(cumulative_us / 1e6)
+    return times[0], times[1:]
+
+
+def get_schema_memory_report(schema:Schema) -> dict:
+    """
+    Returns the memory held by every object reachable from a schema, by type. Each object is counted once however
+    many times it's referenced, so a string shared by many schema objects only counts once; instance dictionaries
+    are reported as "<type>.__dict__".
+    :param schema: The schema to measure, which should have its symbol sets loaded
+    :return: A dict of the total object count and bytes, and a map of type name to the count and bytes of its
+        objects, largest first
+    """
+    seen:set = set()
+    by_type:dict = {}
+    pending:list = [schema]
+
+    def add(obj, type_name:str):
+        entry:list = by_type.get(type_name, None)
+        if entry is None:
+            entry = by_type[type_name] = [0, 0]
+        entry[0] += 1
+        entry[1] += sys.getsizeof(obj)
+
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, _UNOWNED_TYPES):
+            continue
+        seen.add(id(obj))
+        add(obj, type(obj).__name__)
+
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, bool)) and obj is not None:
+            instance_dict = getattr(obj, '__dict__', None)
+            if instance_dict is not None and id(instance_dict) not in seen:
+                seen.add(id(instance_dict))
+                add(instance_dict, f'{type(obj).__name__}.__dict__')
+                pending.extend(instance_dict.values())
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get('__slots__', ())
+                for slot in ([slots] if isinstance(slots, str) else slots):
+                    if slot not in ('__dict__', '__weakref__') and hasattr(obj, slot):
+                        pending.append(getattr(obj, slot))
+
+    return {
+        'objects': sum(entry[0] for entry in by_type.values()),
+        'bytes': sum(entry[1] for entry in by_type.values()),
+        'by_type': {type_name: {'count': entry[0], 'bytes': entry[1]}
+                    for type_name, entry in sorted(by_type.items(), key=lambda item: -item[1][1])}
+    }
+
+
+def measure_schema_memory(snapshot_path:str=None) -> dict:
+    """
+    Loads a schema with every symbol set parsed and reports the memory it uses: get_schema_memory_report() along
+    with the bytes allocated by loading it that are still held afterwards, and the peak allocated while loading, as
+    traced by tracemalloc
+    :param snapshot_path: A compiled schema snapshot to load from
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        schema:Schema = Schema.load_from_directory(snapshot_path=snapshot_path)
+        schema.symbol_sets.load_all()
+        gc.collect()
+        traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    report:dict = get_schema_memory_report(schema)
+    report['traced_bytes'] = traced_bytes
+    report['peak_traced_bytes'] = peak_bytes
+    return report
+
+
+def run_benchmarks(stages:list=None, repeat:int=5, render_sample:int=250, snapshot_path:str=None, label:str='',
+                   verbose:bool=True, import_budget:float=IMPORT_BUDGET_S) -> dict:
+    """
+    Times each requested benchmark stage, returning a report
+    :param stages: The stages to run, from STAGES; defaults to all of them. load_snapshot only runs if a snapshot path
+        is given. memory reports the memory held by a fully-loaded schema instead of timing anything. import times
+        importing the package in fresh interpreters and checks the fastest import against import_budget.
+    :param repeat: The number of times to repeat each stage after a first run, which is reported separately; the
+        report gives every repeat's time along with the minimum and median
+    :param render_sample: The number of entity symbols rendered in each render configuration
+    :param snapshot_path: A compiled schema snapshot to time loading from, which is written first if stale
+    :param label: A label for the report, such as a commit hash
+    :param verbose: Whether to print each stage's median time to stderr as it finishes
+    :param import_budget: The most the import stage's fastest import may take, in seconds
+    :return: A JSON-serializable dict of the environment, the timings of each stage, the memory report and the import
+        budget check if run
+    """
+    stages = stages if stages is not None else STAGES
+    for stage in stages:
+        if stage not in STAGES:
+            raise Exception(f'Unknown benchmark stage "{stage}"; must be one of {STAGES}')
+
+    results:dict = {}
+
+    def record(name:str, timings:tuple, item_count:int):
+        results[name] = _summarize(timings[0], timings[1], item_count)
+        if verbose:
+            print(f'{name:<36} {results[name]["median_s"] * 1000:10.2f} ms median, {results[name]["first_s"] * 1000:10.2f} ms first '
+                  f'({results[name]["median_per_item_us"]:.1f} us/item over {item_count})', file=sys.stderr)
+
+    import_check:dict = None
+    if 'import' in stages:
+        record('import', measure_import_time(repeat), 1)
+        import_check = {
+            'budget_s': import_budget,
+            'min_s': results['import']['min_s'],
+            'within_budget': results['import']['min_s'] <= import_budget
+        }
+        if verbose and not import_check['within_budget']:
+            print(f'{"import":<36} {import_check["min_s"] * 1000:10.2f} ms fastest, over the {import_budget * 1000:.2f} ms budget',
+                  file=sys.stderr)
+
+    if 'load' in stages:
+        record('load', _time_repeats(lambda: Schema.load_from_directory(), repeat), 1)
+
+    if 'load_full' in stages:
+        def load_full():
+            schema = Schema.load_from_directory()
+            for symbol_set in schema.symbol_sets.values():
+                symbol_set.entities
+        record('load_full', _time_repeats(load_full, repeat), 1)
+
+    if 'load_snapshot' in stages and snapshot_path:
+        Schema.load_from_directory(snapshot_path=snapshot_path)
+        record('load_snapshot', _time_repeats(lambda: Schema.load_from_directory(snapshot_path=snapshot_path), repeat), 1)
+
+    memory:dict = None
+    if 'memory' in stages:
+        memory = measure_schema_memory(snapshot_path=snapshot_path)
+        if verbose:
+            print(f'{"memory":<36} {memory["bytes"] / 1e6:10.2f} MB in {memory["objects"]} objects, '
+                  f'{memory["traced_bytes"] / 1e6:.2f} MB allocated', file=sys.stderr)
+            for type_name, entry in list(memory['by_type'].items())[:10]:
+                print(f'    {type_name:<32} {entry["bytes"] / 1e6:10.2f} MB in {entry["count"]} objects', file=sys.stderr)
+
+    # The remaining stages share one fully-loaded schema
+    schema:Schema = Schema.load_from_directory()
+    sidcs:list = get_entity_sidcs(schema)
+
+    if 'from_sidc' in stages:
+        record('from_sidc', _time_repeats(lambda: [Symbol.from_sidc(sidc=sidc, schema=schema) for sidc in sidcs], repeat), len(sidcs))
+
+    if 'resolve' in stages:
+        names:list = get_benchmark_names()
+        # Name guessing reports what it assumes on stdout, which isn't part of the report
+        with open(os.devnull, 'w') as null_file:
+            stdout = sys.stdout
+            sys.stdout = null_file
+            try:
+                timings:tuple = _time_repeats(lambda: [name_to_sidc.name_to_symbol(name, schema) for name in names], repeat)
+            finally:
+                sys.stdout = stdout
+        record('resolve', timings, len(names))
+
+    if 'rank' in stages:
+        ranked:list = [(name.lower(), get_entity_matches(schema, name)) for name in BENCHMARK_AMBIGUOUS_NAMES]
+        record('rank', _time_repeats(lambda: [name_to_sidc.rank_matches(name, matches) for name, matches in ranked], repeat),
+               sum([len(matches) for name, matches in ranked]))
+
+    if 'render' in stages:
+        step:int = max(len(sidcs) // max(render_sample, 1), 1)
+        symbols:list = [Symbol.from_sidc(sidc=sidc, schema=schema) for sidc in sidcs[::step][:render_sample]]
+
+        for fill_style in ['light', 'medium', 'dark', 'unfilled']:
+            for use_text_paths in [False, True]:
+                for use_background in [False, True]:
+                    output_style = OutputStyle(use_text_paths=use_text_paths)
+                    output_style.fill_style = fill_style
+                    output_style.use_background = use_background
+                    output_style.background_width = OutputStyle.DEFAULT_BACKGROUND_WIDTH if use_background else 0
+
+                    name:str = f'render/{fill_style}{"/text_paths" if use_text_paths else ""}{"/background" if use_background else ""}'
+                    record(name, _time_repeats(lambda: [symbol.get_svg(output_style=output_style) for symbol in symbols], repeat), len(symbols))
+
+    report:dict = {
+        'label': label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'library_version': VERSION,
+        'schema_hash': schema.source_hash,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'stages': results
+    }
+    if memory is not None:
+        report['memory'] = memory
+    if import_check is not None:
+        report['import_budget'] = import_check
+    return report
+
+
+def compare_reports(baseline:dict, report:dict, threshold:float=0.1) -> list:
+    """
+    Compares the median times of the stages in two reports
+    :param baseline: The report to compare against
+    :param report: The new report
+    :param threshold: The fractional slowdown beyond which a stage counts as a regression
+    :return: A list of (stage, baseline median, new median, ratio, is regression) tuples for the stages in both
+    """
+    comparisons:list = []
+    for stage, result in report['stages'].items():
+        base_result:dict = baseline.get('stages', {}).get(stage, None)
+        if base_result is None:
+            continue
+        ratio:float = result['median_s'] / base_result['median_s'] if base_result['median_s'] > 0 else float('inf')
+        comparisons.append((stage, base_result['median_s'], result['median_s'], ratio, ratio > 1.0 + threshold))
+    return comparisons
+
+
+def bench_main(argv:list):
+    """
+    Runs the benchmarks from "military-symbol bench" command-line arguments
+    :param argv: The arguments following "bench"
+    """
+    parser = argparse.ArgumentParser(prog='military-symbol bench',
+                                     description='Time schema loading, SIDC parsing, name resolution and rendering')
+    parser.add_argument('-o', '--output', dest='output', default='',
+                        help='The file to write the JSON report to; defaults to stdout')
+    parser.add_argument('-r', '--repeat', dest='repeat', type=int, default=5,
+                        help='The number of times to repeat each stage; default is 5')
+    parser.add_argument('--stage', dest='stages', action='append', default=[], choices=STAGES,
+                        help='A stage to run; may be given more than once, and defaults to all of them')
+    parser.add_argument('--render-sample', dest='render_sample', type=int, default=250,
+                        help='The number of symbols rendered in each render configuration; default is 250')
+    parser.add_argument('--snapshot', dest='snapshot_path', default=None,
+                        help='A compiled schema snapshot to time loading from')
+    parser.add_argument('--label', dest='label', default='', help='A label for the report, such as a commit hash')
+    parser.add_argument('--compare', dest='compare', default='',
+                        help='A previous report to compare median times against')
+    parser.add_argument('--threshold', dest='threshold', type=float, default=0.1,
+                        help='The fractional slowdown reported as a regression when comparing; default is 0.1')
+    parser.add_argument('--import-budget', dest='import_budget', type=float, default=IMPORT_BUDGET_S * 1000,
+                        help=f'The most importing the package may take in the import stage, in milliseconds; default is {IMPORT_BUDGET_S * 1000:g}')
+    arguments = parser.parse_args(argv)
+
+    report:dict = run_benchmarks(stages=arguments.stages if len(arguments.stages) > 0 else None, repeat=arguments.repeat,
+                                 render_sample=arguments.render_sample, snapshot_path=arguments.snapshot_path,
+                                 label=arguments.label, import_budget=arguments.import_budget / 1000)
+
+    if arguments.output != '':
+        with open(arguments.output, 'w') as out_file:
+            json.dump(report, out_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if arguments.compare != '':
+        with open(arguments.compare, 'r') as in_file:
+            baseline:dict = json.load(in_file)
+
+        regression_count:int = 0
+        print(f'Compared with "{baseline.get("label", "") or arguments.compare}":', file=sys.stderr)
+        for stage, base_median, new_median, ratio, is_regression in compare_reports(baseline, report, arguments.threshold):
+            regression_count += 1 if is_regression else 0
+            print(f'{stage:<36} {base_median * 1000:10.2f} ms -> {new_median * 1000:10.2f} ms  x{ratio:.2f}'
+                  f'{"  REGRESSION" if is_regression else ""}', file=sys.stderr)
+        if 'memory' in baseline and 'memory' in report:
+            base_bytes:int = baseline['memory']['bytes']
+            print(f'{"memory":<36} {base_bytes / 1e6:10.2f} MB -> {report["memory"]["bytes"] / 1e6:10.2f} MB  '
+                  f'x{report["memory"]["bytes"] / max(base_bytes, 1):.2f}', file=sys.stderr)
+        if regression_count > 0:
+            sys.exit(1)
+
+    if not report.get('import_budget', {}).get('within_budget', True):
+        sys.exit(1)
@@ -0,0 +1,211 @@
+import threading
+from collections import OrderedDict
+
+"""
+A size-bounded key-value cache with least-recently-used or least-frequently-used eviction
+"""
+
+class BoundedCache:
+    """
+    A map limited to a maximum number of entries and/or a maximum total size of its values, evicting entries
+    by recency (LRU) or frequency of use (LFU, with ties broken by recency) when either limit is exceeded.
+    Lookups through get() are counted as hits or misses.
+
+    If created as thread-safe, changes to the cache are made under a lock, but lookups don't wait for it: a hit
+    reads the value without locking and only updates its recency or frequency if the lock is free, so eviction
+    order and statistics are approximate under contention.
+    """
+
+    POLICIES = ['lru', 'lfu']
+
+    def __init__(self, max_entries:int=None, max_bytes:int=None, policy:str='lru', size_func=None, thread_safe:bool=False):
+        """
+        :param max_entries: The maximum number of entries to hold, or None for no limit
+        :param max_bytes: The maximum total size of all values, or None for no limit
+        :param policy: The eviction policy, either 'lru' or 'lfu'
+        :param size_func: A function returning the size of a value; defaults to len() if a byte limit is given, and
+            otherwise values aren't sized
+        :param thread_safe: Whether the cache may be used from multiple threads at once
+        """
+        policy = policy.lower()
+        if policy not in BoundedCache.POLICIES:
+            raise Exception(f'Unknown cache eviction policy "{policy}"; must be one of {BoundedCache.POLICIES}')
+
+        self.max_entries:int = max_entries
+        self.max_bytes:int = max_bytes
+        self.policy:str = policy
+        self.size_func = size_func if size_func is not None else (len if max_bytes is not None else None)
+
+        self.values:dict = {}       # Map of key to (value, size) tuples
+        self.order:OrderedDict = OrderedDict()  # LRU: keys, least recently used first
+        self.frequencies:dict = {}  # LFU: map of key to use count
+        self.buckets:dict = {}      # LFU: map of use count to an OrderedDict of keys, least recently used first
+        self.min_frequency:int = 0
+
+        self.lock = threading.Lock() if thread_safe else None
+
+        self.total_bytes:int = 0
+        self.hits:int = 0
+        self.misses:int = 0
+        self.evictions:int = 0
+
+    def __repr__(self) -> str:
+        return f'BoundedCache({self.policy}, {len(self.values)} entries, {self.total_bytes} bytes)'
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __contains__(self, key) -> bool:
+        return key in self.values
+
+    def _touch(self, key):
+        if self.policy == 'lru':
+            self.order.move_to_end(key)
+            return
+
+        frequency:int = self.frequencies[key]
+        bucket:OrderedDict = self.buckets[frequency]
+        del bucket[key]
+        if len(bucket) < 1:
+            del self.buckets[frequency]
+            if self.min_frequency == frequency:
+                self.min_frequency = frequency + 1
+
+        self.frequencies[key] = frequency + 1
+        self.buckets.setdefault(frequency + 1, OrderedDict())[key] = None
+
+    def _remove(self, key):
+        value, size = self.values.pop(key)
+        self.total_bytes -= size
+
+        if self.policy == 'lru':
+            del self.order[key]
+        else:
+            frequency:int = self.frequencies.pop(key)
+            bucket:OrderedDict = self.buckets[frequency]
+            del bucket[key]
+            if len(bucket) < 1:
+                del self.buckets[frequency]
+
+        return value
+
+    def _evict_one(self):
+        if self.policy == 'lru':
+            key = next(iter(self.order))
+        else:
+            if self.min_frequency not in self.buckets:
+                self.min_frequency = min(self.buckets)
+            key = next(iter(self.buckets[self.min_frequency]))
+
+        self._remove(key)
+        self.evictions += 1
+
+    def _is_over_limit(self) -> bool:
+        if self.max_entries is not None and len(self.values) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def get(self, key, default=None):
+        """
+        Returns the value for the given key, marking it as used, or the default if it isn't cached
+        """
+        entry:tuple = self.values.get(key, None)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        if self.lock is None:
+            self._touch(key)
+        elif self.lock.acquire(blocking=False):
+            try:
+                if key in self.values:
+                    self._touch(key)
+            finally:
+                self.lock.release()
+        return entry[0]
+
+    def peek(self, key, default=None):
+        """
+        Returns the value for the given key without counting a hit or miss or marking it as used
+        """
+        entry:tuple = self.values.get(key, None)
+        return entry[0] if entry is not None else default
+
+    def put(self, key, value) -> bool:
+        """
+        Caches a value, evicting other entries as needed to stay within the limits
+        :return: Whether the value was cached; values larger than the byte limit on their own are not
+        """
+        if self.lock is None:
+            return self._put(key, value)
+        with self.lock:
+            return self._put(key, value)
+
+    def _put(self, key, value) -> bool:
+        size:int = self.size_func(value) if self.size_func is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            if key in self.values:
+                self._remove(key)
+            return False
+
+        if key in self.values:
+            # Replace the value in place, keeping its recency or frequency
+            self.total_bytes += size - self.values[key][1]
+            self.values[key] = (value, size)
+            self._touch(key)
+        else:
+            self.values[key] = (value, size)
+            self.total_bytes += size
+            if self.policy == 'lru':
+                self.order[key] = None
+            else:
+                self.frequencies[key] = 1
+                self.buckets.setdefault(1, OrderedDict())[key] = None
+                self.min_frequency = 1
+
+        while self._is_over_limit():
+            self._evict_one()
+
+        return key in self.values
+
+    def pop(self, key, default=None):
+        """
+        Removes and returns the value for the given key, or the default if it isn't cached
+        """
+        if self.lock is None:
+            return self._remove(key) if key in self.values else default
+        with self.lock:
+            return self._remove(key) if key in self.values else default
+
+    def clear(self):
+        if self.lock is None:
+            self._clear()
+            return
+        with self.lock:
+            self._clear()
+
+    def _clear(self):
+        self.values = {}
+        self.order = OrderedDict()
+        self.frequencies = {}
+        self.buckets = {}
+        self.min_frequency = 0
+        self.total_bytes = 0
+
+    def get_stats(self) -> dict:
+        """
+        Returns statistics for the cache
+        :return: A dict of the eviction policy, number of entries, total value size, limits, and hit, miss, and
+            eviction counts
+        """
+        return {
+            'policy': self.policy,
+            'size': len(self.values),
+            'bytes': self.total_bytes,
+            'max size': self.max_entries,
+            'max bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -2,6 +2,8 @@ import argparse
 import os
 import os.path
 import sys
+import threading
+import time
 
 sys.path.append(os.path.dirname(__file__))
 import name_to_sidc
@@ -11,25 +13,110 @@ from schema import Schema
 from template import Template
 # from symbol_template import SymbolTemplateSet
 from symbol_cache import SymbolCache
+from library_version import VERSION
 
-VERSION = "2.0.8"
 STYLE_CHOICES = ['light', 'medium', 'dark', 'unfilled']
 
-# Load the symbol schema from its default location; don't
-sym_schema: Schema = Schema.load_from_directory()
-if sym_schema is None:
-    print("Error loading symbol schema; exiting", file=sys.stderr)
+# The default symbol schema and cache are only loaded on first use (or by init()), so importing the
+# module stays cheap
+_default_schema: Schema = None
+_default_symbol_cache: SymbolCache = None
+_default_lock = threading.Lock()
+# The template files already added to the default schema, so that each is only added once
+_default_template_files: set = set()
+
+
+def _load_default_schema(schema_dir:str=None, snapshot_path:str=None, verbose:bool=False, cache_options:dict=None) -> Schema:
+    # Callers must hold _default_lock
+    global _default_schema, _default_symbol_cache
+
+    load_args:dict = {'verbose': verbose, 'snapshot_path': snapshot_path}
+    if schema_dir is not None:
+        load_args['directory'] = schema_dir
+
+    schema: Schema = Schema.load_from_directory(**load_args)
+    if schema is None:
+        raise Exception(f'Error loading symbol schema from "{schema_dir if schema_dir is not None else "default location"}"')
+
+    _default_schema = schema
+    _default_template_files.clear()
+    # The default cache is shared by every caller of the module-level helpers, so it's thread-safe unless told otherwise
+    symbol_cache_options:dict = {'thread_safe': True}
+    symbol_cache_options.update(cache_options if cache_options is not None else {})
+    _default_symbol_cache = SymbolCache(schema, **symbol_cache_options)
+    return schema
+
+
+def init(schema_dir:str=None, snapshot_path:str=None, verbose:bool=False, cache_options:dict=None) -> Schema:
+    """
+    Loads the default symbol schema and creates the default symbol cache used by the module-level helper
+    functions, replacing any previously loaded ones. Calling this is optional, since the helpers load the
+    schema from its default location on first use, but it allows warming up ahead of time or using a
+    different schema directory or compiled snapshot.
+    :param schema_dir: The directory to load the schema JSON files from; defaults to the bundled schema
+    :param snapshot_path: An optional compiled schema snapshot to load from (and write if stale)
+    :param verbose: Whether to print ancillary information while loading
+    :param cache_options: Optional keyword arguments for the default SymbolCache, such as its capacity limits
+    :return: The loaded schema
+    """
+    with _default_lock:
+        schema:Schema = _load_default_schema(schema_dir=schema_dir, snapshot_path=snapshot_path, verbose=verbose, cache_options=cache_options)
+
+    # Any schema shared_schema.preload() loaded has been replaced, so workers forked from now on must load their own
+    if 'shared_schema' in sys.modules:
+        sys.modules['shared_schema'].clear_preload()
+    return schema
+
+
+def get_schema() -> Schema:
+    """
+    Returns the default symbol schema, loading it from its default location if it hasn't been loaded yet
+    :return: The default Schema
+    """
+    if _default_schema is None:
+        with _default_lock:
+            if _default_schema is None:
+                _load_default_schema()
+    return _default_schema
+
+
+def get_symbol_cache() -> SymbolCache:
+    """
+    Returns the default symbol cache used by the module-level helper functions, loading the default schema if needed
+    :return: The default SymbolCache
+    """
+    if _default_symbol_cache is None:
+        get_schema()
+    return _default_symbol_cache
+
+
+def __getattr__(name:str):
+    # Backwards compatibility for the module-level schema and cache, which used to be loaded on import
+    if name == 'sym_schema':
+        return get_schema()
+    elif name == 'symbol_cache':
+        return get_symbol_cache()
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
-symbol_cache: SymbolCache = SymbolCache(sym_schema)
 
 def add_templates_from_file(template_filename:str):
     """
-    Add a symbol template to allow easier generation of symbols by name for specific situation.
+    Add a symbol template to allow easier generation of symbols by name for specific situation. Each file is only
+    added once to the default schema; adding it again does nothing until init() replaces the schema.
     :param template_filename: The filename for the template file is structured as shown in the example_template.json file
     """
     try:
-        templates = Template.load_from_file(template_filename)
-        sym_schema.add_templates(templates)
+        schema: Schema = get_schema()
+        template_path:str = os.path.abspath(template_filename)
+        with _default_lock:
+            if schema is _default_schema and template_path in _default_template_files:
+                return
+        templates = Template.load_from_file(template_filename, schema=schema)
+        with _default_lock:
+            if schema is not _default_schema or template_path in _default_template_files:
+                return
+            schema.add_templates(templates)
+            _default_template_files.add(template_path)
     except Exception as ex:
         print(f'Error adding templates from "{template_filename}: {ex}')
         return
@@ -80,7 +167,7 @@ def get_symbol_class(originator, is_sidc=True, verbose=False, limit_to_symbol_se
     :param verbose: Whether to print ancillary information
     :return: The generated symbol
     """
-    return symbol_cache.get_symbol(originator, is_sidc=is_sidc, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)
+    return get_symbol_cache().get_symbol(originator, is_sidc=is_sidc, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)
 
 
 def get_symbol_class_from_name(name, verbose=False, limit_to_symbol_sets=None) -> Symbol:
@@ -118,7 +205,7 @@ def get_svg_string(creator_var:str, is_sidc:bool, pixel_padding=4, use_variants=
     :param background_color: Background color to use, if it's used
     :return: A string containing the SVG for the constructed symbol.
     """
-    return symbol_cache.get_svg_string(creator_var, is_sidc, padding=pixel_padding, style=style,
+    return get_symbol_cache().get_svg_string(creator_var, is_sidc, padding=pixel_padding, style=style,
                                        use_variants=use_variants, 
                                        use_background=use_background,
                                        background_color=background_color, 
@@ -141,7 +228,7 @@ def get_symbol_and_svg_string(creator_var:str, is_sidc:bool, padding:int=4, styl
     :param verbose: Whether to print ancillary information while processing, defaulting to false.
     :return: A (Symbol, str) tuple containing the symbol and SVG for the constructed symbol.
     """
-    return symbol_cache.get_symbol_and_svg_string(creator_var, is_sidc, padding, style, use_variants, use_background=use_background, 
+    return get_symbol_cache().get_symbol_and_svg_string(creator_var, is_sidc, padding, style, use_variants, use_background=use_background, 
         background_color=background_color, verbose=verbose, force_all_elements=force_all_elements, limit_to_symbol_sets=limit_to_symbol_sets)
 
 
@@ -161,7 +248,7 @@ def write_symbol_svg_string(creator_var, is_sidc:bool, out_filepath, bounding_pa
     :param background_color: Background color to use, if it's used
     :param verbose: Whether to print ancillary information while processing, defaulting to false.
     """
-    symbol, svg_string = symbol_cache.get_symbol_and_svg_string(creator_var, is_sidc,
+    symbol, svg_string = get_symbol_cache().get_symbol_and_svg_string(creator_var, is_sidc,
                                                                 padding=bounding_padding, style=style,
                                                                 use_variants=use_variants,
                                                                 use_background=use_background,
@@ -216,6 +303,138 @@ def write_symbol_svg_string_from_name(name_string, out_filepath, bounding_paddin
         limit_to_symbol_sets=limit_to_symbol_sets)
 
 
+def read_inputs(inputs:list, input_file:str=''):
+    """
+    Generates the given inputs followed by the lines of the given input file (or stdin if it's "-"), skipping blank
+    lines. The file is read lazily, so inputs can be streamed.
+    :param inputs: A list of inputs to generate first
+    :param input_file: The path of a file of inputs, one per line, "-" for stdin, or an empty string for neither
+    """
+    yield from inputs
+    if input_file == '':
+        return
+
+    in_file = sys.stdin if input_file == '-' else open(input_file, 'r')
+    try:
+        for line in in_file:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+
+
+class ProgressReporter:
+    """
+    Reports the number of results processed and the throughput to stderr, at most once per interval
+    """
+
+    def __init__(self, enabled:bool=True, interval:float=1.0):
+        self.enabled:bool = enabled
+        self.interval:float = interval
+        self.start_time:float = time.perf_counter()
+        self.last_report_time:float = self.start_time
+        self.count:int = 0
+        self.error_count:int = 0
+
+    def add(self, is_error:bool=False):
+        self.count += 1
+        if is_error:
+            self.error_count += 1
+
+        if self.enabled:
+            now:float = time.perf_counter()
+            if now - self.last_report_time >= self.interval:
+                self.last_report_time = now
+                self.report(now)
+
+    def report(self, now:float=None, final:bool=False):
+        now = now if now is not None else time.perf_counter()
+        elapsed:float = max(now - self.start_time, 1e-9)
+        print(f'{"Finished: " if final else ""}{self.count} processed, {self.error_count} errors, '
+              f'{elapsed:.1f} s, {self.count / elapsed:.1f}/s', file=sys.stderr)
+
+    def finish(self):
+        if self.enabled:
+            self.report(final=True)
+
+
+def run_batch(arguments, output_dir:str, style_name:str, limit_to_symbol_sets:list=None) -> None:
+    """
+    Renders every input from the command line arguments, the input file, or stdin through render_many, writing
+    SVGs to the output directory or NDJSON records to stdout
+    :param arguments: The parsed command-line arguments
+    :param output_dir: The output directory, or an empty string to write to stdout
+    :param style_name: The full name of the style to render in
+    :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+    """
+    import json
+    from batch_render import render_many
+
+    inputs = read_inputs(arguments.inputs, arguments.input_file)
+    progress = ProgressReporter(enabled=arguments.progress)
+
+    if output_dir != '':
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = render_many(inputs, is_sidc=not arguments.by_name, styles=[style_name], padding=arguments.padding,
+                          use_variants=arguments.use_variants, use_background=arguments.use_background,
+                          background_color=arguments.background_color, limit_to_symbol_sets=limit_to_symbol_sets,
+                          workers=arguments.jobs if arguments.jobs > 0 else None,
+                          template_filename=arguments.template_filename if arguments.template_filename != '' else None,
+                          force_all_elements=arguments.force_all_elements)
+
+    for result in results:
+        progress.add(is_error=not result.is_ok())
+
+        if output_dir != '' and not arguments.sidc_only:
+            if result.is_ok():
+                with open(os.path.join(output_dir, f'{result.sidc}.svg'), 'w') as out_file:
+                    out_file.write(result.svg)
+            else:
+                print(f'Unable to render "{result.creator_val}": {result.error}', file=sys.stderr)
+            continue
+
+        record:dict = result.to_dict()
+        if arguments.sidc_only:
+            del record['svg']
+        print(json.dumps(record), flush=False)
+
+    sys.stdout.flush()
+    progress.finish()
+
+
+def run_resolve(arguments, limit_to_symbol_sets:list=None) -> None:
+    """
+    Resolves every name record from the command line arguments, the input file, or stdin through resolve_many,
+    writing one NDJSON record per name to stdout
+    :param arguments: The parsed command-line arguments
+    :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+    """
+    import json
+    from batch_render import resolve_many
+
+    records = read_inputs(arguments.inputs, arguments.input_file)
+    progress = ProgressReporter(enabled=arguments.progress)
+
+    results = resolve_many(records, limit_to_symbol_sets=limit_to_symbol_sets,
+                           workers=arguments.jobs if arguments.jobs > 0 else None,
+                           cache_size=arguments.resolve_cache_size,
+                           template_filename=arguments.template_filename if arguments.template_filename != '' else None)
+
+    for result in results:
+        progress.add(is_error=not result.is_ok())
+        sys.stdout.write(json.dumps(result.to_dict()) + '\n')
+
+        # Flush per record when reading stdin, so that each answer is available as soon as its name is
+        if arguments.input_file == '-':
+            sys.stdout.flush()
+
+    sys.stdout.flush()
+    progress.finish()
+
+
 class MyParser(argparse.ArgumentParser):
     def error(self, message):
         sys.stderr.write('error: %s\n' % message)
@@ -223,6 +442,24 @@ class MyParser(argparse.ArgumentParser):
         sys.exit(2)
 
 def command_line_main():
+    # Subcommands, which take their own arguments
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from symbol_server import serve_main
+        serve_main(sys.argv[2:])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        from benchmark import bench_main
+        bench_main(sys.argv[2:])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == 'precompute':
+        from precompute import precompute_main
+        precompute_main(sys.argv[2:])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == 'shared-memory':
+        from shared_schema import shared_memory_main
+        shared_memory_main(sys.argv[2:])
+        return
+
     # Get current working directory
     style_choices_args = STYLE_CHOICES.copy()
     style_choices_args.extend([i[0] for i in style_choices_args])
@@ -236,7 +473,7 @@ def command_line_main():
                         help='Whether to auto-name outputs (only valid for one)')
     parser.add_argument('-v', '--verbose', dest='verbose', action='store_const', const=True, default=False,
                         help="Whether to print ancillary information (pollutes STDOUT if you're using a pipe)")
-    parser.add_argument('-p', '--padding', dest='padding', action='store', default=4,
+    parser.add_argument('-p', '--padding', dest='padding', action='store', type=int, default=4,
                         help="Select padding for output SVG; default is 4; values < 0 will not crop to fit content")
     parser.add_argument('-t', '--use-variants', dest='use_variants', action='store_const', const=True, default=False,
                         help='Whether to use variant symbols if they exist')
@@ -255,6 +492,19 @@ def command_line_main():
     parser.add_argument('-e', '--limit-to', dest='limit_to_symbol_sets', action='append', default=[],
                         help='Limits to a specific symbol set for name guessing, like air, ground, surface, etc. Has no effect when using SIDCs. ' + 
                              'Multiple symbol sets to choose from can be specified.')
+    parser.add_argument('-i', '--input-file', dest='input_file', action='store', default='',
+                        help='A file of SIDCs or names to render, one per line; use - to read from stdin')
+    parser.add_argument('-j', '--jobs', dest='jobs', action='store', type=int, default=1,
+                        help='The number of worker processes to render with; 0 uses one per CPU')
+    parser.add_argument('--ndjson', dest='ndjson', action='store_const', const=True, default=False,
+                        help='Write one JSON record per input to stdout instead of bare SVGs; implied by -j and -i when there is no output directory')
+    parser.add_argument('--resolve', dest='resolve', action='store_const', const=True, default=False,
+                        help='Resolve names to SIDCs, writing one JSON record per name to stdout with the SIDC, matched components, ' +
+                             'unmatched text and timing. Inputs may be JSON objects with "name" and optional "tags" and "id" keys')
+    parser.add_argument('--resolve-cache-size', dest='resolve_cache_size', action='store', type=int, default=65536,
+                        help='The maximum number of name resolutions to cache per process in --resolve mode; default is 65536')
+    parser.add_argument('--progress', dest='progress', action='store_const', const=True, default=False,
+                        help='Report progress and throughput to stderr')
     parser.add_argument('--version', dest='show_version', action='store_const', const=True, default=False, help="Show the version and exit.")
     parser.add_argument('inputs', nargs='*', default=[])
 
@@ -264,7 +514,7 @@ def command_line_main():
         print(VERSION)
         return
 
-    if len(arguments.inputs) < 1:
+    if len(arguments.inputs) < 1 and arguments.input_file == '':
         parser.print_help()
         sys.exit(2)
 
@@ -288,8 +538,14 @@ def command_line_main():
     if style_name not in STYLE_CHOICES:
         style_name = [name for name in STYLE_CHOICES if name[0] == style_name[0]][0]
 
-    if arguments.template_filename != '':
-        add_symbol_template_set(arguments.template_filename)
+    # Batch mode, for inputs from a file or stdin and parallel rendering, writes one file per input named by its SIDC,
+    # or NDJSON records to stdout
+    use_batch: bool = arguments.input_file != '' or arguments.jobs != 1 or arguments.ndjson
+    if use_batch and not arguments.resolve and not arguments.sidc_only and output_dir != '':
+        if arguments.ndjson:
+            parser.error('--ndjson writes records to stdout and can\'t be combined with an output directory')
+        if not use_auto_name and not arguments.output_dir.endswith(('/', os.sep)):
+            parser.error('Batch rendering names each output by its SIDC; give an output directory (ending in "/" to create it) or use -a')
 
     # Handle limiting to symbol sets
     limit_to_symbol_sets = []
@@ -302,6 +558,18 @@ def command_line_main():
     if len(limit_to_symbol_sets) < 1:
         limit_to_symbol_sets = None
 
+    # Streaming name resolution
+    if arguments.resolve:
+        run_resolve(arguments, limit_to_symbol_sets=limit_to_symbol_sets)
+        return
+
+    # The batch functions add the template file themselves, in each worker process
+    if use_batch:
+        run_batch(arguments, output_dir=output_dir, style_name=style_name, limit_to_symbol_sets=limit_to_symbol_sets)
+        return
+
+    if arguments.template_filename != '':
+        add_templates_from_file(arguments.template_filename)
 
     # Loop through remaining inputs and process t hem
     for input_arg in arguments.inputs:
@@ -48,6 +48,8 @@ def convert_color(item):
 		return None
 
 class BBox():
+	__slots__ = ('x_min', 'y_min', 'x_max', 'y_max')
+
 	def __init__(self, x_min:float=100, y_min:float=100, x_max:float=100, y_max:float=100):
 		self.x_min = x_min
 		self.y_min = y_min
@@ -77,11 +79,11 @@ class BBox():
 
 	@classmethod
 	def merge_all(cls, box_list):
-		boxes = [copy.copy(box) for box in box_list]
-		if len(boxes) < 1:
+		if len(box_list) < 1:
 			return None
-		ret = boxes[0]
-		for box in boxes[1:]:
+		# Only the first box needs copying, since merge() leaves its argument unchanged
+		ret = copy.copy(box_list[0])
+		for box in box_list[1:]:
 			ret.merge(box)
 		return ret
 
@@ -102,6 +104,8 @@ class SymbolElement:
 	Base class that contains styling elements
 	"""
 	class Base:
+		__slots__ = ('fill_color', 'stroke_color', 'stroke_width', 'stroke_dashed', 'stroke_style')
+
 		def __init__(self, stroke_dashed:bool=False):
 			self.fill_color:str = None
 			self.stroke_color:str = "icon"
@@ -158,7 +162,7 @@ class SymbolElement:
 				if element == 'none':
 					return None
 
-				return element
+				return sys.intern(element)
 
 			if type(element) == bool:
 				return 'icon' if element else None
@@ -183,6 +187,8 @@ class SymbolElement:
 	Full frame command
 	"""
 	class FullFrame(Base):
+		__slots__ = ('elements',)
+
 		def __init__(self, affiliations):
 			super().__init__()
 			self.elements:dict = {
@@ -238,6 +244,8 @@ class SymbolElement:
 	Represents a path command
 	"""
 	class Path(Base):
+		__slots__ = ('d', 'bbox')
+
 		def __init__(self, d:str = '', bbox:BBox = BBox(), stroke_dashed:bool=False):
 			super().__init__(stroke_dashed=stroke_dashed)
 			self.d:str = d # The SVG path
@@ -283,6 +291,8 @@ class SymbolElement:
 	Represents a circle command
 	"""
 	class Circle(Base):
+		__slots__ = ('pos', 'radius')
+
 		def __init__(self):
 			super().__init__()
 			self.pos:tuple = (100, 100)
@@ -329,6 +339,8 @@ class SymbolElement:
 	Represents a text command
 	"""
 	class Text(Base):
+		__slots__ = ('text', 'pos', 'font_size', 'font_family', 'align', 'text_type')
+
 		def __init__(self):
 			super().__init__()
 			self.text:str = '' # The actual rendered text
@@ -346,15 +358,7 @@ class SymbolElement:
 
 		def svg(self, symbol, output_style=OutputStyle()) -> list:
 			if output_style.use_text_paths:
-				font_face = font_rendering.Font(output_style.text_path_font, size = int(self.font_size))
-
-				paths = font_face.render_text(
-					text = self.text, 
-					pos = self.pos,
-					fontsize = int(self.font_size),
-					align = self.align)
-				
-				ret_path = ' '.join(paths)
+				ret_path, bounds = self.get_text_path(output_style)
 				path_el = SymbolElement.Path()
 				path_el.fill_color = self.fill_color
 				path_el.stroke_color = self.stroke_color
@@ -363,8 +367,29 @@ class SymbolElement:
 
 			return self.__repr__()
 
+		def get_text_path(self, output_style=OutputStyle()) -> tuple:
+			"""
+			Returns the text as a single path in the output style's text path font, along with its bounds
+			"""
+			font_face = font_rendering.get_font(output_style.text_path_font, size = int(self.font_size))
+			return font_face.get_text_path(
+				text = self.text,
+				pos = self.pos,
+				fontsize = int(self.font_size),
+				align = self.align)
+
 		def get_bbox(self, symbol, output_style=OutputStyle()) -> BBox:
-			return BBox()
+			if output_style.use_text_paths:
+				# Text rendered as paths is bounded by the outlines of the path font
+				ret_path, bounds = self.get_text_path(output_style)
+			else:
+				# Text rendered as <text> is drawn in a font of the viewer's choosing, so it's estimated from the
+				# path font's metrics
+				font_face = font_rendering.get_font(output_style.text_path_font, size = int(self.font_size))
+				bounds = font_face.measure_text(text = self.text, pos = self.pos, fontsize = int(self.font_size), align = self.align)
+			if bounds is None:
+				return BBox(self.pos[0], self.pos[1], self.pos[0], self.pos[1])
+			return BBox(*bounds)
 
 		@classmethod
 		def get_used_pos_and_size(cls, text:str, text_type:str = 'normal'):
@@ -409,14 +434,14 @@ class SymbolElement:
 			ret = cls()
 			if 'textm1' in json:
 				# Parse text
-				ret.text = json['textm1']
+				ret.text = sys.intern(json['textm1'])
 				ret.pos, ret.font_size = cls.get_used_pos_and_size(text=ret.text, text_type = 'm1')
 			elif 'textm2' in json:
 				# Parse text
-				ret.text = json['textm2']
+				ret.text = sys.intern(json['textm2'])
 				ret.pos, ret.font_size = cls.get_used_pos_and_size(text=ret.text, text_type = 'm2')
 			else:
-				ret.text = json['text']
+				ret.text = sys.intern(json['text'])
 				ret.pos, ret.font_size = cls.get_used_pos_and_size(text=ret.text, text_type = 'normal')
 
 			if 'pos' in json:
@@ -436,7 +461,7 @@ class SymbolElement:
 			then return
 			"""
 			if output_style.use_text_paths:
-				font_face = font_rendering.Font(output_style.text_path_font, size = int(self.font_size))
+				font_face = font_rendering.get_font(output_style.text_path_font, size = int(self.font_size))
 
 				paths = font_face.render_text(
 					text = self.text, 
@@ -477,6 +502,8 @@ class SymbolElement:
 	Base class for transformation
 	"""
 	class Transformation(Base):
+		__slots__ = ('items',)
+
 		def __init__(self, items:list = []):
 			super().__init__()
 			self.items:list = copy.copy(items)
@@ -488,6 +515,8 @@ class SymbolElement:
 	Represents a translation
 	"""
 	class Translate(Transformation):
+		__slots__ = ('delta',)
+
 		def __init__(self, delta:tuple=(0, 0), items:list = []):
 			super().__init__(items=items)
 			self.delta:tuple = copy.copy(delta)
@@ -534,6 +563,8 @@ class SymbolElement:
 	Represents a scaling
 	"""
 	class Scale(Transformation):
+		__slots__ = ('scale',)
+
 		def __init__(self, scale:float = 1.0):
 			super().__init__()
 			self.scale:float = scale
@@ -1,10 +1,16 @@
-import freetype
-
 """
 Freetype helper functions for rendering text as paths.
-Functions are adapted from freetype-py examples.
+Functions are adapted from freetype-py examples. freetype itself is only imported once a
+Font is created, since most uses of the library never render text as paths.
+Fonts are pooled per process and cache the outline of every glyph they render, so freetype is
+only used the first time a given character is drawn at a given size.
 """
 
+import threading
+from collections import namedtuple
+
+import instrumentation
+
 SCALING:float = 64.0
 BASE_HEIGHT:float = 1.0 # 70.0 / 64.0 #64.0 # 90.0
 
@@ -41,24 +47,71 @@ def cubic_to(a, b, c, ctx):
 		ctx[3][1] + -c.y / SCALING * scale_factor
 	))
 
+# A point of a glyph outline, in the same units as freetype's outline vectors
+GlyphPoint = namedtuple('GlyphPoint', ['x', 'y'])
+
+# A glyph's advance, and its outline as a list of (drawing function, points) segments
+Glyph = namedtuple('Glyph', ['advance', 'segments'])
+
 """
 Font object for rendering
 """
 class Font(object):
 	def __init__(self, font_file, size):
+		import freetype
 		self.face = freetype.Face(font_file)
 		self.face.set_pixel_sizes(0, size)
+		self.glyphs:dict = {} # Map of (font size, character) to Glyph
+		self.text_paths:dict = {} # Map of (text, font size, alignment, position) to (path, bounds) tuples
+		self.text_bounds:dict = {} # Map of (text, font size, alignment, position) to estimated bounds
+		self.vertical_metrics:dict = {} # Map of font size to (ascender, descender)
+		self.lock = threading.Lock() # Guards the face, which freetype doesn't allow concurrent use of
+
+	def get_glyph(self, char, fontsize) -> Glyph:
+		"""
+		Returns the advance and outline of the given character at the given font size, loading it with freetype
+		on first use
+		"""
+		glyph:Glyph = self.glyphs.get((fontsize, char), None)
+		if glyph is not None:
+			return glyph
+
+		import freetype
+
+		segments:list = []
+		def record(func):
+			return lambda *args: segments.append((func, tuple(GlyphPoint(point.x, point.y) for point in args[:-1])))
+
+		with self.lock:
+			self.face.set_char_size(fontsize * int(SCALING)) # Freetype uses a height of 64 by default
+			self.face.load_char(char, freetype.FT_LOAD_DEFAULT | freetype.FT_LOAD_NO_BITMAP)
+			self.face.glyph.outline.decompose(None,
+				move_to=record(move_to),
+				line_to=record(line_to),
+				conic_to=record(conic_to),
+				cubic_to=record(cubic_to))
+			glyph = Glyph(self.face.glyph.advance.x, segments)
+
+		self.glyphs[(fontsize, char)] = glyph
+		return glyph
 
 	# Align is ['middle', 'start', 'end'].
 	# Returns a list of SVG paths (but without SVG formatting or XML elements,just
 	# the content of the "d" attribute)
-	def render_text(self, text, pos = (0, 0), fontsize = 30, align='middle') -> str:		
+	def render_text(self, text, pos = (0, 0), fontsize = 30, align='middle') -> str:
+		return self.layout_text(text, pos=pos, fontsize=fontsize, align=align)[0]
+
+	def layout_text(self, text, pos = (0, 0), fontsize = 30, align='middle') -> tuple:
+		"""
+		Returns the path of each character of the given text, along with the (x_min, y_min, x_max, y_max) bounds of
+		their outline points, or None for bounds if the text has no outlines
+		"""
+		glyphs:list = [self.get_glyph(char, fontsize) for char in text]
+
 		# Determine text width
 		text_width = 0.0
-		for char_index, char in enumerate(text):
-			self.face.set_char_size(fontsize * int(SCALING)) # Freetype uses a height of 64 by default
-			self.face.load_char(char, freetype.FT_LOAD_DEFAULT | freetype.FT_LOAD_NO_BITMAP)
-			text_width += self.face.glyph.advance.x
+		for glyph in glyphs:
+			text_width += glyph.advance
 
 		if align == 'start' or align == 'left':
 			x_offset:float = 0.0 
@@ -68,17 +121,86 @@ class Font(object):
 			x_offset:float = -text_width / 2
 
 		paths = []
+		xs = []
+		ys = []
 
-		for char_index, char in enumerate(text):
+		scale_factor = BASE_HEIGHT
+		for glyph in glyphs:
 			ctx = ([], x_offset, fontsize, pos)
-			self.face.set_char_size(fontsize * int(SCALING)) # Freetype uses a height of 64 by default
-			self.face.load_char(char, freetype.FT_LOAD_DEFAULT | freetype.FT_LOAD_NO_BITMAP)
-			self.face.glyph.outline.decompose(ctx, 
-				move_to=move_to, 
-				line_to=line_to, 
-				conic_to=conic_to, 
-				cubic_to=cubic_to)
+			for func, points in glyph.segments:
+				func(*points, ctx)
+				# Control points are included, so the bounds may be slightly larger than the curves themselves
+				xs += [pos[0] + (x_offset + point.x) / SCALING * scale_factor for point in points]
+				ys += [pos[1] + -point.y / SCALING * scale_factor for point in points]
 			paths.append(' '.join(ctx[0]))
-			x_offset += self.face.glyph.advance.x
+			x_offset += glyph.advance
+
+		bounds = (min(xs), min(ys), max(xs), max(ys)) if len(xs) > 0 else None
+		return paths, bounds
+
+	def get_vertical_metrics(self, fontsize) -> tuple:
+		"""
+		Returns the font's (ascender, descender) at the given font size, in the same units as text paths; the
+		descender is negative below the baseline
+		"""
+		metrics:tuple = self.vertical_metrics.get(fontsize, None)
+		if metrics is None:
+			with self.lock:
+				self.face.set_char_size(fontsize * int(SCALING))
+				metrics = (self.face.size.ascender / SCALING * BASE_HEIGHT, self.face.size.descender / SCALING * BASE_HEIGHT)
+			self.vertical_metrics[fontsize] = metrics
+		return metrics
+
+	def measure_text(self, text, pos = (0, 0), fontsize = 30, align='middle') -> tuple:
+		"""
+		Returns the (x_min, y_min, x_max, y_max) bounds of the given text from the advance widths of its glyphs and the
+		font's ascender and descender, as an estimate for text drawn as <text> in a font of the viewer's choosing, or
+		None if the text is empty
+		"""
+		if len(text) < 1:
+			return None
+
+		key:tuple = (text, fontsize, align, tuple(pos))
+		bounds:tuple = self.text_bounds.get(key, None)
+		if bounds is None:
+			text_width:float = sum([self.get_glyph(char, fontsize).advance for char in text]) / SCALING * BASE_HEIGHT
+			ascender, descender = self.get_vertical_metrics(fontsize)
+			if align == 'start' or align == 'left':
+				x_min:float = pos[0]
+			elif align == 'end' or align == 'right':
+				x_min:float = pos[0] - text_width
+			else:
+				x_min:float = pos[0] - text_width / 2
+			bounds = (x_min, pos[1] - ascender, x_min + text_width, pos[1] - descender)
+			self.text_bounds[key] = bounds
+		return bounds
+
+	def get_text_path(self, text, pos = (0, 0), fontsize = 30, align='middle') -> tuple:
+		"""
+		Returns the whole given text as a single path, along with its bounds as returned by layout_text(). Paths are
+		cached, so rendering a label the font has already rendered doesn't lay it out again.
+		"""
+		key:tuple = (text, fontsize, align, tuple(pos))
+		text_path:tuple = self.text_paths.get(key, None)
+		if text_path is None:
+			with instrumentation.timer('text.layout'):
+				paths, bounds = self.layout_text(text, pos=pos, fontsize=fontsize, align=align)
+			text_path = (' '.join(paths), bounds)
+			self.text_paths[key] = text_path
+		return text_path
+
+_font_pool:dict = {} # Map of (font file, size) to Font
+_font_pool_lock = threading.Lock()
 
-		return paths # ' '.join(paths)
\ No newline at end of file
+def get_font(font_file, size) -> Font:
+	"""
+	Returns the pooled Font for the given font file and size, creating it on first use
+	"""
+	font:Font = _font_pool.get((font_file, size), None)
+	if font is None:
+		with _font_pool_lock:
+			font = _font_pool.get((font_file, size), None)
+			if font is None:
+				font = Font(font_file, size)
+				_font_pool[(font_file, size)] = font
+	return font
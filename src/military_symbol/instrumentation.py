@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+
+"""
+Opt-in counters and timings for the stages of loading, name resolution and rendering. Instrumentation is off unless
+enable() is called or the MILITARY_SYMBOL_INSTRUMENTATION environment variable is set to 1; while it's off, each
+instrumented point costs one attribute check or a call returning a shared no-op object.
+"""
+
+# Whether measurements are being recorded; instrumented code checks this before doing any work
+enabled:bool = os.environ.get('MILITARY_SYMBOL_INSTRUMENTATION', '') == '1'
+
+_lock = threading.Lock()
+_timings:dict = {}      # Map of timing name to [count, total seconds, maximum seconds]
+_counters:dict = {}     # Map of counter name to count
+_listeners:list = []    # Functions called with (name, seconds) for each timing recorded
+
+
+def enable():
+    """
+    Starts recording counters and timings
+    """
+    global enabled
+    enabled = True
+
+
+def disable():
+    """
+    Stops recording counters and timings, keeping those already recorded
+    """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Discards every recorded counter and timing
+    """
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def add_listener(listener):
+    """
+    Registers a function to be called with (name, seconds) for every timing recorded, from the thread that recorded
+    it; it should return quickly
+    """
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def record(name:str, seconds:float):
+    """
+    Records one timing of the given name, if instrumentation is enabled
+    """
+    if not enabled:
+        return
+
+    with _lock:
+        timing:list = _timings.get(name, None)
+        if timing is None:
+            _timings[name] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+        listeners:list = list(_listeners) if _listeners else None
+
+    if listeners is not None:
+        for listener in listeners:
+            listener(name, seconds)
+
+
+def count(name:str, amount:int=1):
+    """
+    Adds to the counter of the given name, if instrumentation is enabled
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+class _Timer:
+    """
+    A context manager recording the time spent in its block
+    """
+
+    def __init__(self, name:str):
+        self.name:str = name
+        self.start_time:float = 0.0
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.name, time.perf_counter() - self.start_time)
+        return False
+
+
+class _Stages:
+    """
+    Records the time between successive marks as named stages of one operation. Time marked against the same stage
+    more than once is added together and recorded once when the operation finishes.
+    """
+
+    def __init__(self, prefix:str):
+        self.prefix:str = prefix
+        self.start_time:float = time.perf_counter()
+        self.last_time:float = self.start_time
+        self.stage_times:dict = {}
+
+    def mark(self, stage:str):
+        now:float = time.perf_counter()
+        self.stage_times[stage] = self.stage_times.get(stage, 0.0) + (now - self.last_time)
+        self.last_time = now
+
+    def skip(self):
+        # Excludes the time since the last mark from every stage
+        self.last_time = time.perf_counter()
+
+    def finish(self):
+        now:float = time.perf_counter()
+        for stage, seconds in self.stage_times.items():
+            record(f'{self.prefix}.{stage}', seconds)
+        record(self.prefix, now - self.start_time)
+
+
+class _NullInstrument:
+    """
+    Stands in for a timer or set of stages while instrumentation is disabled
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def mark(self, stage:str):
+        pass
+
+    def skip(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+_NULL_INSTRUMENT = _NullInstrument()
+
+
+def timer(name:str):
+    """
+    Returns a context manager recording the time spent in its block under the given name
+    """
+    return _Timer(name) if enabled else _NULL_INSTRUMENT
+
+
+def stages(prefix:str):
+    """
+    Returns an object timing the stages of one operation: call mark(stage) at the end of each stage, and finish() at
+    the end of the operation to record each stage as "<prefix>.<stage>" and the whole operation as "<prefix>"
+    """
+    return _Stages(prefix) if enabled else _NULL_INSTRUMENT
+
+
+def get_snapshot() -> dict:
+    """
+    Returns a copy of everything recorded so far
+    :return: A dict with 'timings', a map of name to a dict of the count and the total, mean and maximum seconds,
+        and 'counters', a map of name to count
+    """
+    with _lock:
+        timings:dict = {name: list(timing) for name, timing in _timings.items()}
+        counters:dict = dict(_counters)
+
+    return {
+        'enabled': enabled,
+        'timings': {name: {
+            'count': timing[0],
+            'total_s': timing[1],
+            'mean_s': timing[1] / timing[0],
+            'max_s': timing[2]
+        } for name, timing in sorted(timings.items())},
+        'counters': dict(sorted(counters.items()))
+    }
+
+
+def to_json(indent:int=None) -> str:
+    """
+    Returns get_snapshot() as a JSON string
+    """
+    import json
+    return json.dumps(get_snapshot(), indent=indent)
+
+
+def to_prometheus(prefix:str='military_symbol') -> str:
+    """
+    Returns everything recorded so far in the Prometheus text exposition format. Timings are exported as summaries
+    without quantiles, labelled by stage, along with their maximums; counters are exported as counters.
+    """
+    snapshot:dict = get_snapshot()
+
+    def escape(value:str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    lines:list = [
+        f'# HELP {prefix}_stage_seconds Time spent in each instrumented stage',
+        f'# TYPE {prefix}_stage_seconds summary'
+    ]
+    for name, timing in snapshot['timings'].items():
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{escape(name)}"}} {timing["count"]}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{escape(name)}"}} {timing["total_s"]:.9f}')
+
+    lines += [
+        f'# HELP {prefix}_stage_max_seconds The longest time spent in each instrumented stage',
+        f'# TYPE {prefix}_stage_max_seconds gauge'
+    ]
+    for name, timing in snapshot['timings'].items():
+        lines.append(f'{prefix}_stage_max_seconds{{stage="{escape(name)}"}} {timing["max_s"]:.9f}')
+
+    lines += [
+        f'# HELP {prefix}_events_total Instrumented event counts',
+        f'# TYPE {prefix}_events_total counter'
+    ]
+    for name, value in snapshot['counters'].items():
+        lines.append(f'{prefix}_events_total{{event="{escape(name)}"}} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,5 @@
+"""
+The library version, kept in its own module so that caches can key on it without importing the command line
+"""
+
+VERSION:str = "2.0.8"
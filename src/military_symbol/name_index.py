@@ -0,0 +1,184 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+from aho_corasick import AhoCorasick
+
+"""
+Precomputed indices of candidate names for matching natural-language names against the schema
+"""
+
+class CandidatePool:
+    """
+    An ordered list of (name, candidate) pairs for a fixed list of candidates, with an Aho-Corasick automaton
+    over the names so that every name occurring in a query is found in a single pass over the query
+    """
+
+    def __init__(self, candidates):
+        self.entries:list = []        # (lowercase name, candidate) pairs, in candidate order
+        self.name_entries:list = []   # Per unique name, the indices of the entries with that name
+        self.candidate_ids:set = set()
+
+        for candidate in candidates:
+            self.candidate_ids.add(id(candidate))
+            if hasattr(candidate, 'match_name') and not candidate.match_name:
+                continue
+            for name in candidate.names:
+                self.entries.append((name.lower().strip(), candidate))
+
+        names:list = []
+        name_indices:dict = {}
+        for entry_index, (name, candidate) in enumerate(self.entries):
+            if name not in name_indices:
+                name_indices[name] = len(names)
+                names.append(name)
+                self.name_entries.append([])
+            self.name_entries[name_indices[name]].append(entry_index)
+
+        self.matcher:AhoCorasick = AhoCorasick(names)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, candidate) -> bool:
+        return id(candidate) in self.candidate_ids
+
+    def __repr__(self) -> str:
+        return f'CandidatePool({len(self.entries)} names, {self.matcher})'
+
+    def find_matches(self, name_string:str, candidate_filter=None) -> list:
+        """
+        Returns the (name, candidate) pairs whose names occur in the given lowercase string, in candidate order
+        :param name_string: The lowercase string to search
+        :param candidate_filter: An optional function returning whether a given candidate may match
+        :return: A list of (name, candidate) pairs
+        """
+        entry_indices:list = []
+        for name_index in self.matcher.find_all(name_string):
+            entry_indices += self.name_entries[name_index]
+
+        matches:list = []
+        for entry_index in sorted(entry_indices):
+            name, candidate = self.entries[entry_index]
+            if candidate_filter is None or candidate_filter(candidate):
+                matches.append((name, candidate))
+        return matches
+
+
+class NameIndex:
+    """
+    The candidate pools for each stage of name matching against a single schema. Pools are built on first use
+    and kept until the schema changes; the template pool is rebuilt whenever templates are added.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.pools:dict = {}  # Pool key to CandidatePool
+        self.template_version:int = -1
+        self.symbol_set_version:int = -1
+        self.symbol_set_order:list = []            # The IDs of all symbol sets, in schema order
+        self.symbol_set_ids_by_dimension:dict = {} # Dimension ID to the IDs of its symbol sets
+        self.common_symbol_set_ids:list = []
+
+    def __repr__(self) -> str:
+        return f'NameIndex({", ".join([str(key) for key in self.pools])})'
+
+    def invalidate(self):
+        self.pools = {}
+        self.template_version = -1
+        self.symbol_set_version = -1
+
+    def check_versions(self):
+        if self.symbol_set_version != self.schema.symbol_sets.version:
+            self.pools = {}
+            self.symbol_set_order = []
+            self.symbol_set_ids_by_dimension = {}
+            self.common_symbol_set_ids = []
+            for header in self.schema.symbol_sets.get_headers():
+                self.symbol_set_order.append(header.id_code)
+                if header.common:
+                    self.common_symbol_set_ids.append(header.id_code)
+                else:
+                    self.symbol_set_ids_by_dimension.setdefault(header.dimension_id, []).append(header.id_code)
+            self.symbol_set_version = self.schema.symbol_sets.version
+
+        if self.template_version != self.schema.template_version:
+            self.pools.pop('templates', None)
+            self.template_version = self.schema.template_version
+
+    def get_pool(self, key, candidate_func) -> CandidatePool:
+        self.check_versions()
+        pool = self.pools.get(key, None)
+        if pool is None:
+            pool = CandidatePool(candidate_func())
+            self.pools[key] = pool
+        return pool
+
+    def get_template_pool(self) -> CandidatePool:
+        return self.get_pool('templates', lambda: self.schema.templates)
+
+    def get_symbol_set_pool(self) -> CandidatePool:
+        return self.get_pool('symbol sets', lambda: self.schema.symbol_sets.get_headers())
+
+    def get_affiliation_pool(self) -> CandidatePool:
+        return self.get_pool('affiliations', lambda: self.schema.affiliations.values())
+
+    def get_amplifier_pool(self, prerun_only:bool=False) -> CandidatePool:
+        if prerun_only:
+            return self.get_pool('prerun amplifiers', lambda: [amp for amp in self.schema.amplifiers.values() if amp.prerun])
+        return self.get_pool('amplifiers', lambda: self.schema.amplifiers.values())
+
+    def get_hqtfd_pool(self) -> CandidatePool:
+        return self.get_pool('hqtfds', lambda: self.schema.hqtfds.values())
+
+    def get_status_pool(self) -> CandidatePool:
+        return self.get_pool('statuses', lambda: self.schema.statuses.values())
+
+    def get_entity_pool(self, symbol_set_id:str) -> CandidatePool:
+        return self.get_pool(('entities', symbol_set_id), lambda: self.schema.symbol_sets[symbol_set_id].entities.values())
+
+    def get_modifier_pool(self, symbol_set_id:str, mod_set:int) -> CandidatePool:
+        return self.get_pool((f'm{mod_set}', symbol_set_id), lambda: getattr(self.schema.symbol_sets[symbol_set_id], f'm{mod_set}').values())
+
+    def build_all(self):
+        """
+        Builds every candidate pool up front, rather than on first use
+        """
+        self.get_template_pool()
+        self.get_symbol_set_pool()
+        self.get_affiliation_pool()
+        self.get_amplifier_pool()
+        self.get_amplifier_pool(prerun_only=True)
+        self.get_hqtfd_pool()
+        self.get_status_pool()
+        for symbol_set_id in self.get_symbol_set_ids():
+            if self.schema.symbol_sets.get(symbol_set_id, None) is None:
+                continue
+            self.get_entity_pool(symbol_set_id)
+            self.get_modifier_pool(symbol_set_id, 1)
+            self.get_modifier_pool(symbol_set_id, 2)
+
+    def get_common_symbol_set_ids(self) -> list:
+        self.check_versions()
+        return self.common_symbol_set_ids
+
+    def get_symbol_set_ids(self, dimensions=None, include_common:bool=True) -> list:
+        """
+        Returns the IDs of the symbol sets in the given dimensions (or all of them), in schema order
+        :param dimensions: An optional list of Dimension objects to restrict to
+        :param include_common: Whether to include common symbol sets
+        :return: A list of symbol set IDs
+        """
+        self.check_versions()
+        allowed_ids:set = set(self.common_symbol_set_ids) if include_common else set()
+        if dimensions is None:
+            for symbol_set_ids in self.symbol_set_ids_by_dimension.values():
+                allowed_ids.update(symbol_set_ids)
+        else:
+            for dimension in dimensions:
+                allowed_ids.update(self.symbol_set_ids_by_dimension.get(dimension.id_code, []))
+
+        return [symbol_set_id for symbol_set_id in self.symbol_set_order if symbol_set_id in allowed_ids]
+
+    def get_entity_pools(self, symbol_set_ids:list) -> list:
+        return [self.get_entity_pool(symbol_set_id) for symbol_set_id in symbol_set_ids if self.schema.symbol_sets.get(symbol_set_id, None) is not None]
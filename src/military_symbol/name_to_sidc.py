@@ -5,12 +5,10 @@ import copy
 
 sys.path.append(os.path.dirname(__file__))
 
-from thefuzz import fuzz
-from functools import cmp_to_key
-
 from symbol import Symbol
 from schema import Schema, SymbolSet
 from template import Template
+import instrumentation
 
 def split_into_words(in_str:str) -> list:
     """
@@ -28,44 +26,58 @@ def exact_match(a, b):
 
     return False
 
-def fuzzy_match(schema, name_string, candidate_list, match_longest=True, verbose=False, print_candidates=False):
+def fuzzy_match(schema, name_string, candidate_list, verbose=False):
     """
-    Returns a list of closest candidates for the given name string from the provided list of candidates
+    Returns the closest candidate for the given name string from the provided list of candidates
     :param schema: The symbol schema to consider the candidates to be part of
     :param name_string: The string to match against
     :param candidate_list: A list of candidates containing name, names, or alt_names attributes to choose from
-    :param match_longest: Whether to prefer matching the longest possible (most specific) match, or the shortest. Defaults to true (longest).
-    :return: A list containing the closest-matched candidates
+    :return: A (candidate, remaining name string) tuple, or (None, None) if nothing matched
     """
 
     name_string = name_string.lower().strip()
+    if len(name_string) < 1:
+        return None, None
 
-    # Step 1: calculate the number of words in candidate_list_of_lists
-    matches = []  # Set of (candidate, weight) pairs
+    # Return matching candidates
     candidate_name_list = [(name.lower().strip(), candidate) for candidate in candidate_list for name in candidate.names if (not hasattr(candidate, 'match_name') or candidate.match_name)]
+    matches = [(name, candidate) for (name, candidate) in candidate_name_list if name in name_string]
+
+    return rank_matches(name_string, matches, verbose=verbose)
+
+def fuzzy_match_pools(schema, name_string, pools, candidate_filter=None, verbose=False):
+    """
+    Returns the closest candidate for the given name string from the given precomputed candidate pools, as fuzzy_match does
+    :param schema: The symbol schema to consider the candidates to be part of
+    :param name_string: The string to match against
+    :param pools: A list of name_index.CandidatePool objects to choose from, in order of preference for otherwise equal matches
+    :param candidate_filter: An optional function returning whether a given candidate may be chosen
+    :return: A (candidate, remaining name string) tuple, or (None, None) if nothing matched
+    """
 
-    print_candidates = False
+    name_string = name_string.lower().strip()
     if len(name_string) < 1:
         return None, None
 
-    if print_candidates:
-        print(f'Searching for \"{name_string}\" in {candidate_name_list}')
+    matches = []
+    for pool in pools:
+        matches += pool.find_matches(name_string, candidate_filter=candidate_filter)
 
-    # Return matching candidates
-    matches = [(name, candidate) for (name, candidate) in candidate_name_list if name in name_string]
+    return rank_matches(name_string, matches, verbose=verbose)
 
-    if print_candidates:
-        print(matches)
+def rank_matches(name_string, matches, verbose=False):
+    """
+    Picks the best of the (name, candidate) pairs whose names were found in the given name string
+    :param name_string: The lowercase string that was matched against
+    :param matches: A list of (lowercase name, candidate) pairs, in candidate order
+    :return: A (candidate, remaining name string) tuple, or (None, None) if there are no matches
+    """
 
     # Handle exact matches
     for match in matches:
         if exact_match(name_string, match[0]):
             matches = [(name, cand) for (name, cand) in matches if exact_match(name, name_string)]
             break
-    
-            if print_candidates:
-                print('An exact match was found')
-                print(matches)
 
     # Handle 0 and 1-match weights
     if len(matches) < 1:
@@ -73,45 +85,19 @@ def fuzzy_match(schema, name_string, candidate_list, match_longest=True, verbose
     elif len(matches) == 1:
         return matches[0][1], name_string.replace(matches[0][0], '').strip().replace('  ', ' ')
 
-    # Apply fuzzy match score
+    # Apply fuzzy match score; thefuzz is imported here so that importing the module stays cheap
+    from thefuzz import fuzz
     matches = [(name, cand, fuzz.partial_ratio(name, name_string)) for (name, cand) in matches]
-    if print_candidates:
-        print([(n, r) for (n, c, r) in matches])
-
-    def sort_func(a, b):
-        score_a = fuzz.partial_ratio(a[0], name_string)
-        score_b = fuzz.partial_ratio(b[0], name_string)
-
-        ent_a = a[1]
-        ent_b = b[1]
-
-        def calc_match_weight(obj) -> bool:
-            op = getattr(obj, 'get_match_weight', None)
-            if callable(op):
-                return obj.get_match_weight()
-            else:
-                return 0.0
 
-        sym_set_a = a[1].symbol_set if hasattr(a[1], 'symbol_set') else None
-        sym_set_b = b[1].symbol_set if hasattr(b[1], 'symbol_set') else None
+    # Rank by ascending score, then by descending match weight, then by descending name length; sorting is
+    # stable, so candidates that tie on all three keep their candidate order
+    def sort_key(match) -> tuple:
+        name, cand, score = match
+        get_match_weight = getattr(cand, 'get_match_weight', None)
+        match_weight = get_match_weight() if callable(get_match_weight) else 0.0
+        return (score, -match_weight, -len(name))
 
-        match_weight_a = calc_match_weight(ent_a)
-        match_weight_b = calc_match_weight(ent_b)
-
-        if score_a == score_b:
-            if match_weight_a > match_weight_b:
-                return -1
-            elif match_weight_a < match_weight_b:
-                return 1
-
-            if len(a[0]) == len(b[0]):
-                return 0
-
-            return 1 if len(a[0]) < len(b[0]) else -1
-
-        return 1 if score_a > score_b else -1
-
-    matches = sorted(matches, key=cmp_to_key(sort_func))
+    matches.sort(key=sort_key)
     if verbose and 'symbol_set' in dir(matches[0][1]):
         print('\tMatches ' + f"{[f'{entity.names[0]} ({entity.symbol_set}-{entity.id_code}) (score {score}, match weight {entity.get_match_weight()})' for (name, entity, score) in matches]}")
 
@@ -127,11 +113,90 @@ def symbol_set_from_name(schema, item, verbose:bool=False) -> SymbolSet:
         print(f"Can't parse symbol set from item {item}", file=sys.stderr)
         return None
 
-    # Guess from names
-    sym_set_candidates = schema.symbol_sets.values()
-    sym_set, sym_set_name = fuzzy_match(schema, item, sym_set_candidates, verbose=verbose)
-    return sym_set
+    # Guess from names, using the symbol set headers so that only the matched set is parsed
+    sym_set_header, sym_set_name = fuzzy_match_pools(schema, item, [schema.get_name_index().get_symbol_set_pool()], verbose=verbose)
+    return schema.symbol_sets.get(sym_set_header.id_code, None) if sym_set_header is not None else None
+
+
+def normalize_name(name:str, limit_to_symbol_sets:list=None, verbose:bool=False) -> tuple:
+    """
+    Splits a name into the sanitized string that name_to_symbol matches against and the symbol sets to limit
+    matching to, including any given as "[symbol set]" tags in the name
+    :param name: The name to normalize, e.g. "Friendly  infantry platoon [land unit]"
+    :param limit_to_symbol_sets: A list of symbol set objects or names to restrict guessing to
+    :return: A (lowercase name string, list of symbol set objects or names) tuple
+    """
+    limit_to_symbol_sets = list(limit_to_symbol_sets) if limit_to_symbol_sets is not None else []
+
+    # Handle symbol categories
+    symbol_set_tags = re.findall(r"\[([\w\d\s]+)\]", name)
+    limit_to_symbol_sets.extend([d.lower() for d in symbol_set_tags])
+
+    # Remove category tags
+    proc_name_string = re.sub(r"\[([\w\d\s]+)\]", "", name)
+    proc_name_string = re.sub(r"\s+", " ", proc_name_string)
 
+    if verbose and len(symbol_set_tags) > 0:
+        print('\tIdentified tags ' + ", ".join([f'\"{d}\"' for d in symbol_set_tags]) + f" -> {proc_name_string}")
+
+    # Sanitize string
+    proc_name_string = proc_name_string.lower()
+    proc_name_string = re.sub('[ \t\n]+', ' ', proc_name_string).strip()
+
+    return proc_name_string, limit_to_symbol_sets
+
+def name_resolution_key(name:str, schema:Schema, limit_to_symbol_sets:list=None) -> tuple:
+    """
+    Returns a hashable key identifying the result of name_to_symbol for the given name, so that names differing
+    only in case, whitespace or tag placement share one key
+    :param name: The name to resolve
+    :param schema: The schema the name will be resolved against
+    :param limit_to_symbol_sets: A list of symbol set objects or names to restrict guessing to
+    :return: A (name string, symbol set limits, template version) tuple
+    """
+    proc_name_string, limit_to_symbol_sets = normalize_name(name, limit_to_symbol_sets)
+    limits = tuple([item.id_code if isinstance(item, SymbolSet) else str(item).lower().strip() for item in limit_to_symbol_sets])
+    return proc_name_string, limits, schema.template_version
+
+class NameResolution:
+    """
+    The outcome of resolving a name: the best-guess symbol, along with which parts of it were matched from the
+    name and what text was left unmatched
+    """
+
+    COMPONENTS = ['template', 'affiliation', 'amplifier', 'entity', 'hqtfd', 'status', 'modifier_1', 'modifier_2']
+
+    def __init__(self, name:str):
+        self.name:str = name            # The name as given
+        self.name_string:str = ''       # The normalized name string that was matched against
+        self.remaining:str = ''         # The text left over after every match was removed
+        self.symbol:Symbol = None
+        self.components:dict = {}       # Map of component name, from COMPONENTS, to the matched schema item
+
+    def __repr__(self) -> str:
+        return f'NameResolution("{self.name}" -> {self.symbol.get_sidc() if self.symbol is not None else None}, leaving "{self.remaining}")'
+
+    def get_components_dict(self) -> dict:
+        """
+        Returns the matched components in a JSON-friendly form
+        :return: A dict mapping each matched component name to a dict of its ID code, primary name, and symbol set
+            ID code where the component belongs to one
+        """
+        ret:dict = {}
+        for component in NameResolution.COMPONENTS:
+            item = self.components.get(component, None)
+            if item is None:
+                continue
+
+            item_dict:dict = {
+                'id': getattr(item, 'sidc', None) if component == 'template' else item.id_code,
+                'name': item.names[0] if len(item.names) > 0 else ''
+            }
+            symbol_set = getattr(item, 'symbol_set', None)
+            if component != 'template' and symbol_set is not None:
+                item_dict['symbol_set'] = symbol_set.id_code
+            ret[component] = item_dict
+        return ret
 
 def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_symbol_sets:list=[], templates:list=[]) -> Symbol:
     """
@@ -142,57 +207,60 @@ def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_sym
     :param limit_to_symbol_sets: A list of symbol set objects or names to restrict guessing to
     :return:
     """
+    resolution = resolve_name(name, schema, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets, templates=templates)
+    return resolution.symbol if resolution is not None else None
+
+def resolve_name(name: str, schema:Schema, verbose: bool = False, limit_to_symbol_sets:list=[], templates:list=[]) -> NameResolution:
+    """
+    Makes a best guess at the symbol for the provided name as name_to_symbol does, recording what was matched
+    :param name: The string representing the name to construct a best-guess symbol from, e.g. "Friendly infantry platoon"
+    :param schema: The symbol schema to use
+    :param verbose: Whether to print ancillary information during execution; defaults to false.
+    :param limit_to_symbol_sets: A list of symbol set objects or names to restrict guessing to
+    :param templates: Additional templates to match against
+    :return: A NameResolution holding the symbol, matched components and unmatched text
+    """
 
     if not Schema:
         print('Schema must be provided for name_to_symbol', file=sys.stderr)
         return None
 
-    templates_to_use = schema.templates + templates
+    resolution = NameResolution(name)
+    stage_times = instrumentation.stages('name_to_symbol')
 
-    limit_to_symbol_sets = copy.copy(limit_to_symbol_sets)
+    index = schema.get_name_index()
 
-    proc_name_string = name
     if verbose:
         print(f'Matching "{name}"')
 
-    # Handle symbol categories
-    symbol_set_tags = re.findall(r"\[([\w\d\s]+)\]", proc_name_string)
-    if len(symbol_set_tags) > 0:
-        if limit_to_symbol_sets is not None:
-            limit_to_symbol_sets.extend([d.lower() for d in symbol_set_tags])
-        else:
-            limit_to_symbol_sets = list([d.lower() for d in symbol_set_tags])
-
-    # Remove category tags
-    proc_name_string = re.sub(r"\[([\w\d\s]+)\]", "", proc_name_string)
-    proc_name_string = re.sub(r"\s+", " ", proc_name_string)
-
-    if verbose and len(symbol_set_tags) > 0:
-        print('\tIdentified tags ' + ", ".join([f'\"{d}\"' for d in symbol_set_tags]) + f" -> {proc_name_string}")
+    proc_name_string, limit_to_symbol_sets = normalize_name(name, limit_to_symbol_sets, verbose=verbose)
 
     # Handle restricting to specific symbol sets
-    if limit_to_symbol_sets is not None and isinstance(limit_to_symbol_sets, list) and len(limit_to_symbol_sets) > 0:
+    if len(limit_to_symbol_sets) > 0:
         limit_to_symbol_sets = [symbol_set_from_name(schema, item) for item in limit_to_symbol_sets if symbol_set_from_name(schema, item) is not None]
     else:
         limit_to_symbol_sets = None
 
     if verbose and limit_to_symbol_sets is not None:
         print(f'\tLimiting to symbol sets {[e.names[0] for e in limit_to_symbol_sets]}')
-    
-    # Sanitize string
-    proc_name_string = proc_name_string.lower()
-    proc_name_string = re.sub('[ \t\n]+', ' ', proc_name_string).strip()
 
     if verbose:
         print(f'\tMatching "{proc_name_string}"')
 
+    resolution.name_string = proc_name_string
+    stage_times.mark('normalize')
+
     # Step 0: Check for templates
     template: template.Template = None
-    template, new_name_string = fuzzy_match(schema, proc_name_string, templates_to_use, print_candidates=True)
+    if len(templates) > 0:
+        template, new_name_string = fuzzy_match(schema, proc_name_string, schema.templates + templates)
+    else:
+        template, new_name_string = fuzzy_match_pools(schema, proc_name_string, [index.get_template_pool()])
     ret_symbol: Symbol = None
 
     if template is not None:
         proc_name_string = new_name_string
+        resolution.components['template'] = template
         if verbose:
             print(f"\tMatches template \"{template.names[0]}\" leaving \"{proc_name_string}\"; affiliation is {'not ' if template.affiliation_is_flexible else ''}fixed: {template.symbol}")
 
@@ -202,22 +270,26 @@ def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_sym
         ret_symbol = Symbol()
 
     ret_symbol.schema = schema
+    stage_times.mark('template')
 
     # Step 1: Detect standard identity
     if template is None or template.affiliation_is_flexible:
-        affiliation, new_name_string = fuzzy_match(schema, proc_name_string.lower(), schema.affiliations.values(), match_longest=True)
+        affiliation, new_name_string = fuzzy_match_pools(schema, proc_name_string.lower(), [index.get_affiliation_pool()])
 
         if affiliation is None:
             print("\tUnable to determine standard identity; assuming unknown")
             affiliation = [si for si in schema.affiliations.values() if si.names[0] == 'unknown'][0]
         else:
             proc_name_string = new_name_string
+            resolution.components['affiliation'] = affiliation
 
         if verbose:
             print(f'\tAssuming affiliation "{affiliation.names[0]}" leaving "{proc_name_string}"')
 
         ret_symbol.affiliation = affiliation
 
+    stage_times.mark('affiliation')
+
     # Assume context is reality
     ret_symbol.context = schema.contexts['0']
 
@@ -225,37 +297,40 @@ def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_sym
     prerun_amplifier = False
 
     if template is None or template.amplifier_is_flexible:
-        candidate_amplifiers = [amp for amp in schema.amplifiers.values() if amp.prerun]
-
         # Limit to given symbol sets
+        amplifier_filter = None
         if limit_to_symbol_sets is not None:
-            candidate_amplifiers = [amp for amp in candidate_amplifiers if amp.applies_to_any_in_symbol_sets(limit_to_symbol_sets)]
+            amplifier_filter = lambda amp: amp.applies_to_any_in_symbol_sets(limit_to_symbol_sets)
 
-        amplifier, new_name_string = fuzzy_match(schema, proc_name_string, candidate_amplifiers, match_longest=True)
+        amplifier, new_name_string = fuzzy_match_pools(schema, proc_name_string, [index.get_amplifier_pool(prerun_only=True)], candidate_filter=amplifier_filter)
         if amplifier is not None:
             proc_name_string = new_name_string
             if verbose:
                 print(f'\tAssuming amplifier "{amplifier.names[0]}" leaving "{proc_name_string}"')
             prerun_amplifier = True
+            resolution.components['amplifier'] = amplifier
 
         ret_symbol.amplifier = amplifier
 
+    stage_times.mark('amplifier')
 
     # Entity type
     if template is None or template.entity_is_flexible:
-        candidates = schema.get_flat_entities()
+        candidate_symbol_set_ids = index.get_symbol_set_ids()
 
         # Limit to symbol sets
         if limit_to_symbol_sets is not None:
-            candidates = [c for c in candidates if c.is_in_any_of_symbol_sets(limit_to_symbol_sets)]
+            limit_ids = [ss.id_code for ss in limit_to_symbol_sets]
+            candidate_symbol_set_ids = [ss_id for ss_id in candidate_symbol_set_ids if ss_id in limit_ids]
 
-        # Limit by amplifiers TODO
+        # Limit by amplifiers
         if ret_symbol.amplifier is not None:
             if verbose:
                 print(f"\tLimiting to symbol sets \"{[e.names[0] for e in ret_symbol.amplifier.get_applicable_symbol_sets(schema)]}\" due to amplifier \"{ret_symbol.amplifier.names[0]}\"")
-            candidates = [c for c in candidates if ret_symbol.amplifier.applies_to_entity(c)]
+            amplifier_ids = index.get_symbol_set_ids(dimensions=ret_symbol.amplifier.applies_to)
+            candidate_symbol_set_ids = [ss_id for ss_id in candidate_symbol_set_ids if ss_id in amplifier_ids]
 
-        entity_type, new_name_string = fuzzy_match(schema, proc_name_string, candidates, match_longest=True, verbose=verbose)
+        entity_type, new_name_string = fuzzy_match_pools(schema, proc_name_string, index.get_entity_pools(candidate_symbol_set_ids), verbose=verbose)
 
         symbol_set = None
         if entity_type is None:
@@ -272,19 +347,23 @@ def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_sym
             proc_name_string = new_name_string
             ret_symbol.symbol_set = symbol_set
             ret_symbol.entity = entity_type
+            resolution.components['entity'] = entity_type
 
             if verbose:
                 name = entity_type.names[0] if len(entity_type.names) > 0 else ''
                 print(f'\tAssuming entity "{name}" ({entity_type.id_code}) ' + 
                     f'from symbol set "{entity_type.symbol_set.names[0]}" leaving \"{proc_name_string}\"')
 
+    stage_times.mark('entity')
+
     # Amplifier post-run
     if (template is None or template.amplifier_is_flexible) and not prerun_amplifier:
         ret_symbol.amplifier = None
-        candidate_amplifiers = [amp for amp in schema.amplifiers.values() if amp.applies_to_entity(ret_symbol.entity)]
-        amplifier, new_name_string = fuzzy_match(schema, proc_name_string, candidate_amplifiers, match_longest=True)
+        amplifier, new_name_string = fuzzy_match_pools(schema, proc_name_string, [index.get_amplifier_pool()],
+                                                       candidate_filter=lambda amp: amp.applies_to_entity(ret_symbol.entity))
         if amplifier is not None:
             proc_name_string = new_name_string
+            resolution.components['amplifier'] = amplifier
         ret_symbol.amplifier = amplifier
 
     # Double-check amplifier
@@ -295,6 +374,7 @@ def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_sym
             print(f'No dimension {ret_symbol.amplifier.applies_to}')
         print(f'Removing amplifier "{ret_symbol.amplifier.names[0]}" due to mismatch with symbol set {ret_symbol.symbol_set}')
         ret_symbol.amplifier = None
+        resolution.components.pop('amplifier', None)
 
     if verbose:
         if ret_symbol.amplifier is not None:
@@ -302,65 +382,69 @@ def name_to_symbol(name: str, schema:Schema, verbose: bool = False, limit_to_sym
         else:
             print('\tNo modifier assigned')
 
+    stage_times.mark('amplifier')
+
     # Find task force / headquarters / dummy
     if template is None or template.hqtfd_is_flexible:
 
-        candidates = [hc for hc in schema.hqtfds.values() if not hc.matches_blacklist(proc_name_string) and hc.applies_to_symbol_set(ret_symbol.symbol_set)]
-
-        hqtfd, new_name_string = fuzzy_match(schema, proc_name_string,
-                                             [code for code in schema.hqtfds.values() if code in candidates],
-                                             match_longest=True)
+        hqtfd_name_string = proc_name_string
+        hqtfd, new_name_string = fuzzy_match_pools(schema, proc_name_string, [index.get_hqtfd_pool()],
+                                                   candidate_filter=lambda hc: not hc.matches_blacklist(hqtfd_name_string) and hc.applies_to_symbol_set(ret_symbol.symbol_set))
         if hqtfd is not None:
             proc_name_string = new_name_string
+            resolution.components['hqtfd'] = hqtfd
             if verbose:
                 print(f'\tAssuming HQTFD code "{hqtfd.names[0]}" leaving "{proc_name_string}"')
 
         ret_symbol.hqtfd = hqtfd
 
+    stage_times.mark('hqtfd')
+
     # Find status code
     if template is None or template.status_is_flexible:
-        # print([status.names for status in symbol_schema.statuses.values()])
-        status_code, new_name_string = fuzzy_match(schema, proc_name_string,
-                                                   [code for code in schema.statuses.values()],
-                                                   match_longest=True)
+        status_code, new_name_string = fuzzy_match_pools(schema, proc_name_string, [index.get_status_pool()])
         if status_code is not None:
             proc_name_string = new_name_string
+            resolution.components['status'] = status_code
             if verbose:
                 print(f'\tAssuming status code "{status_code.names[0]}" leaving "{proc_name_string}"')
 
         ret_symbol.status = status_code
 
+    stage_times.mark('status')
+
     # Find modifiers
 
     # Assemble options
-    modifier_candidates = []
+    symbol_set = ret_symbol.symbol_set
+    modifier_pools = []
     mod_candidate_sets = {}
     for mod_set in [1, 2]:
-        if template is None or getattr(template, f'modifier_{mod_set}_is_flexible'):
-            sym_set_mods = list(getattr(symbol_set, f'm{mod_set}').values())
-            modifier_candidates += sym_set_mods
-            for c in sym_set_mods:
-                mod_candidate_sets[c] = mod_set
-
-            for extra_symbol_set in schema.symbol_sets.values():
-                if extra_symbol_set.common:
-                    modifier_candidates += list(getattr(extra_symbol_set, f'm{mod_set}').values())
-                    for c in sym_set_mods:
-                        mod_candidate_sets[c] = mod_set
+        if symbol_set is not None and (template is None or getattr(template, f'modifier_{mod_set}_is_flexible')):
+            for mod_symbol_set_id in [symbol_set.id_code] + index.get_common_symbol_set_ids():
+                pool = index.get_modifier_pool(mod_symbol_set_id, mod_set)
+                modifier_pools.append(pool)
+                mod_candidate_sets[pool] = mod_set
 
     # Pick the modifier
-    mod, new_name_string = fuzzy_match(schema, proc_name_string, modifier_candidates, match_longest=True, print_candidates=True)
+    mod, new_name_string = fuzzy_match_pools(schema, proc_name_string, modifier_pools)
 
     if mod is not None:
         proc_name_string = new_name_string
-        mod_set = mod_candidate_sets[mod]
+        mod_set = [mod_candidate_sets[pool] for pool in modifier_pools if mod in pool][0]
 
         if verbose:
             print(f'\tAssuming modifier {mod_set} "{mod.names[0]}" ({mod.id_code}) from "{mod.symbol_set.names[0]}" leaving "{proc_name_string}"')
 
         setattr(ret_symbol, f'modifier_{mod_set}', mod)
+        resolution.components[f'modifier_{mod_set}'] = mod
+
+    stage_times.mark('modifier')
+    stage_times.finish()
 
-    return ret_symbol
+    resolution.symbol = ret_symbol
+    resolution.remaining = proc_name_string
+    return resolution
 
 if __name__ == '__main__':
 
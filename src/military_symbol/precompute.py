@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+import command_line
+import batch_render
+from schema import Schema
+from symbol import Symbol
+from symbol_cache import SymbolCache
+from library_version import VERSION
+
+"""
+Rendering of the whole symbol catalog ahead of time, into the persistent SVG cache or a directory of SVG files
+"""
+
+MANIFEST_FORMAT_VERSION:int = 1
+
+
+def get_base_affiliations(schema:Schema) -> list:
+    """
+    Returns the affiliations that use their own frames, rather than another affiliation's (such as assumed friend)
+    """
+    return [affiliation for affiliation in schema.affiliations.values() if affiliation.frame_id == affiliation.id_code]
+
+
+def enumerate_catalog(schema:Schema, affiliations:list=None, styles:list=SymbolCache.STYLE_OPTIONS, variants:list=[False, True],
+                      limit_to_symbol_sets:list=None, sidc_version:str='10'):
+    """
+    Generates every combination of entity, affiliation, style and variant option to render
+    :param schema: The schema to enumerate
+    :param affiliations: The affiliations to render each entity with; defaults to the base affiliations
+    :param styles: The styles to render in, from SymbolCache.STYLE_OPTIONS
+    :param variants: The variant options to render with
+    :param limit_to_symbol_sets: An optional list of symbol set ID codes to restrict the catalog to
+    :param sidc_version: The 2-digit version to start each SIDC with
+    :return: A generator of (SIDC, style, use variants) tuples, with SIDCs varying slowest
+    """
+    if affiliations is None:
+        affiliations = get_base_affiliations(schema)
+
+    for symbol_set in schema.symbol_sets.values():
+        if limit_to_symbol_sets is not None and symbol_set.id_code not in limit_to_symbol_sets:
+            continue
+        for entity in symbol_set.entities.values():
+            for affiliation in affiliations:
+                sidc:str = f'{sidc_version}0{affiliation.id_code}{symbol_set.id_code}0000{entity.id_code}0000'
+                for style in styles:
+                    for use_variants in variants:
+                        yield (sidc, style, use_variants)
+
+
+def get_output_filename(sidc:str, style:str, use_variants:bool) -> str:
+    return f'{sidc}-{style}{"-variant" if use_variants else ""}.svg'
+
+
+# The disk cache this process writes to, if it's rendering into one; set by _open_disk_cache
+_disk_cache = None
+
+
+def _open_disk_cache(disk_cache_path:str):
+    global _disk_cache
+    if _disk_cache is not None:
+        _disk_cache.close()
+    if disk_cache_path is not None:
+        from svg_disk_cache import SVGDiskCache
+        _disk_cache = SVGDiskCache(disk_cache_path, schema_hash=command_line.get_schema().source_hash)
+    else:
+        _disk_cache = None
+
+
+def _init_precompute_worker(schema_dir:str, snapshot_path:str, disk_cache_path:str):
+    batch_render._init_worker(schema_dir, snapshot_path, None)
+    _open_disk_cache(disk_cache_path)
+
+
+def _precompute_chunk(tasks:list, options:dict) -> list:
+    schema:Schema = command_line.get_schema()
+    output_dir:str = options['output_dir']
+    disk_items:list = []
+    results:list = []
+
+    for sidc, style, use_variants in tasks:
+        result:dict = {'sidc': sidc, 'style': style, 'variants': use_variants, 'file': None, 'bytes': 0, 'error': None}
+        try:
+            symbol:Symbol = Symbol.from_sidc(sidc=sidc, schema=schema)
+            output_style = SymbolCache.make_output_style(options['padding'], style, use_variants, options['use_background'],
+                                                         options['background_color'])
+            svg_string:str = symbol.get_svg(output_style=output_style) if symbol is not None else None
+            if not svg_string:
+                raise Exception(f'Unable to render "{sidc}"')
+
+            result['bytes'] = len(svg_string)
+            if _disk_cache is not None:
+                # Stored under the canonical SIDC that SymbolCache looks SVGs up by, whatever spelling is requested
+                options_string:str = SymbolCache.options_string_encode(options['padding'], style, use_variants,
+                                                                      options['use_background'], options['background_color'])
+                disk_items.append((symbol.get_sidc(), options_string, svg_string))
+            else:
+                result['file'] = get_output_filename(sidc, style, use_variants)
+                with open(os.path.join(output_dir, result['file']), 'w') as out_file:
+                    out_file.write(svg_string)
+        except Exception as ex:
+            result['error'] = f'{type(ex).__name__}: {ex}'
+        results.append(result)
+
+    # Written in one transaction per chunk, which is much faster than one per SVG
+    if _disk_cache is not None:
+        _disk_cache.put_many(disk_items)
+    return results
+
+
+def _failed_precompute_chunk(tasks:list, ex:BaseException) -> list:
+    return [{'sidc': sidc, 'style': style, 'variants': use_variants, 'file': None, 'bytes': 0,
+             'error': f'{type(ex).__name__}: {ex}'} for sidc, style, use_variants in tasks]
+
+
+def _write_json_atomically(path:str, value:dict):
+    temp_path:str = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as out_file:
+        json.dump(value, out_file, indent=2)
+    os.replace(temp_path, path)
+
+
+def _read_completed(manifest_path:str, log_path:str, parameters:dict) -> set:
+    # Returns the keys of the renders recorded by a previous run with the same parameters, or None if there wasn't one
+    try:
+        with open(manifest_path, 'r') as in_file:
+            manifest:dict = json.load(in_file)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('parameters', None) != parameters:
+        print(f'Manifest "{manifest_path}" is for a different schema, version or options; starting over', file=sys.stderr)
+        return None
+
+    completed:set = set()
+    try:
+        with open(log_path, 'r') as in_file:
+            for line in in_file:
+                try:
+                    entry:dict = json.loads(line)
+                except ValueError:
+                    # The last line of an interrupted run may be incomplete
+                    continue
+                if entry.get('error', None) is None:
+                    completed.add((entry['sidc'], entry['style'], entry['variants']))
+    except OSError:
+        pass
+    return completed
+
+
+def precompute(output_dir:str=None, disk_cache_path:str=None, manifest_path:str=None, styles:list=SymbolCache.STYLE_OPTIONS,
+               variants:list=[False, True], all_affiliations:bool=False, limit_to_symbol_sets:list=None, padding:int=4,
+               use_background:bool=False, background_color:str='#ffffff', sidc_version:str='10', workers:int=None,
+               chunk_size:int=256, resume:bool=True, schema_dir:str=None, snapshot_path:str=None, progress=None) -> dict:
+    """
+    Renders every entity of every symbol set in each affiliation, style and variant option, into the persistent SVG
+    disk cache or as files in an output directory. A manifest records the parameters and the result of each render as
+    it finishes, so an interrupted run can be resumed where it stopped.
+    :param output_dir: The directory to write SVG files to, if no disk cache is given
+    :param disk_cache_path: The SQLite SVG cache to render into, as used by SymbolCache(disk_cache_path=...)
+    :param manifest_path: The manifest file; defaults to manifest.json in the output directory, or next to the disk cache.
+        Each render is logged to the same path with an .ndjson extension.
+    :param styles: The styles to render in, from SymbolCache.STYLE_OPTIONS
+    :param variants: The variant options to render with
+    :param all_affiliations: Whether to render every affiliation rather than only the base ones
+    :param limit_to_symbol_sets: An optional list of symbol set names or ID codes to restrict the catalog to
+    :param padding: The padding around each symbol, in pixels
+    :param use_background: Whether to draw a background halo around each symbol
+    :param background_color: The background color, if it's used
+    :param sidc_version: The 2-digit version to start each generated SIDC with, as used in output filenames; the disk
+        cache stores each SVG under its canonical SIDC, so it's found by any spelling
+    :param workers: The number of worker processes to use, defaulting to the number of CPUs
+    :param chunk_size: The number of renders sent to a worker at a time
+    :param resume: Whether to skip renders recorded by a previous run with the same parameters
+    :param schema_dir: The directory to load the schema JSON files from; defaults to the bundled schema
+    :param snapshot_path: An optional compiled schema snapshot to load
+    :param progress: An optional function called with (is_error) after each render
+    :return: The manifest summary
+    """
+    if (output_dir is None) == (disk_cache_path is None):
+        raise Exception('Exactly one of an output directory and a disk cache path must be given')
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    if manifest_path is None:
+        manifest_path = os.path.join(output_dir, 'manifest.json') if output_dir is not None else f'{disk_cache_path}.manifest.json'
+    log_path:str = os.path.splitext(manifest_path)[0] + '.ndjson'
+
+    if schema_dir is not None or snapshot_path is not None:
+        command_line.init(schema_dir=schema_dir, snapshot_path=snapshot_path)
+    schema:Schema = command_line.get_schema()
+
+    symbol_set_ids:list = None
+    if limit_to_symbol_sets is not None:
+        import name_to_sidc
+        symbol_set_ids = []
+        for item in limit_to_symbol_sets:
+            symbol_set = schema.symbol_sets.get(item, None) if item in schema.symbol_sets else name_to_sidc.symbol_set_from_name(schema, item)
+            if symbol_set is None:
+                raise Exception(f'Unknown symbol set "{item}"')
+            symbol_set_ids.append(symbol_set.id_code)
+
+    affiliations:list = list(schema.affiliations.values()) if all_affiliations else get_base_affiliations(schema)
+    parameters:dict = {
+        'format': MANIFEST_FORMAT_VERSION,
+        'library_version': VERSION,
+        'schema_hash': schema.source_hash,
+        'target': 'disk_cache' if disk_cache_path is not None else 'directory',
+        'styles': list(styles),
+        'variants': list(variants),
+        'affiliations': [affiliation.id_code for affiliation in affiliations],
+        'symbol_sets': symbol_set_ids,
+        'padding': padding,
+        'use_background': use_background,
+        'background_color': background_color,
+        'sidc_version': sidc_version
+    }
+
+    completed:set = _read_completed(manifest_path, log_path, parameters) if resume else None
+    if completed is None:
+        completed = set()
+        open(log_path, 'w').close()
+
+    summary:dict = {
+        'parameters': parameters,
+        'output': os.path.abspath(output_dir if output_dir is not None else disk_cache_path),
+        'log': os.path.basename(log_path),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'finished': None,
+        'complete': False,
+        'total': 0,
+        'skipped': 0,
+        'rendered': 0,
+        'failed': 0,
+        'bytes': 0
+    }
+    _write_json_atomically(manifest_path, summary)
+
+    def generate_tasks():
+        for task in enumerate_catalog(schema, affiliations=affiliations, styles=styles, variants=variants,
+                                      limit_to_symbol_sets=symbol_set_ids, sidc_version=sidc_version):
+            summary['total'] += 1
+            if task in completed:
+                summary['skipped'] += 1
+                continue
+            yield task
+
+    options:dict = {
+        'output_dir': output_dir,
+        'padding': padding,
+        'use_background': use_background,
+        'background_color': background_color
+    }
+    initargs:tuple = (schema_dir, snapshot_path, disk_cache_path)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        def run_in_process():
+            import itertools
+            _open_disk_cache(disk_cache_path)
+            task_iter = generate_tasks()
+            while True:
+                tasks:list = list(itertools.islice(task_iter, chunk_size))
+                if len(tasks) < 1:
+                    break
+                yield from _precompute_chunk(tasks, options)
+        results = run_in_process()
+    else:
+        results = batch_render._map_chunks(generate_tasks(), _precompute_chunk, (options,), _failed_precompute_chunk,
+                                           workers=workers, ordered=False, chunk_size=chunk_size,
+                                           initializer=_init_precompute_worker, initargs=initargs)
+
+    with open(log_path, 'a') as log_file:
+        for result in results:
+            is_error:bool = result['error'] is not None
+            if is_error:
+                summary['failed'] += 1
+            else:
+                summary['rendered'] += 1
+                summary['bytes'] += result['bytes']
+            log_file.write(json.dumps(result) + '\n')
+            if progress is not None:
+                progress(is_error)
+
+    summary['finished'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    summary['complete'] = summary['failed'] == 0
+    _write_json_atomically(manifest_path, summary)
+    return summary
+
+
+def precompute_main(argv:list):
+    """
+    Runs the precompute command from "military-symbol precompute" command-line arguments
+    :param argv: The arguments following "precompute"
+    """
+    parser = argparse.ArgumentParser(prog='military-symbol precompute',
+                                     description='Render every entity in every affiliation, style and variant option ahead of time')
+    parser.add_argument('-o', '--output-dir', dest='output_dir', default=None, help='The directory to write SVG files to')
+    parser.add_argument('--disk-cache', dest='disk_cache_path', default=None,
+                        help='The SQLite SVG cache to render into instead of a directory')
+    parser.add_argument('--manifest', dest='manifest_path', default=None,
+                        help='The manifest file; defaults to manifest.json in the output directory, or next to the disk cache')
+    parser.add_argument('-s', '--style', dest='styles', action='append', default=[], choices=SymbolCache.STYLE_OPTIONS,
+                        help='A style to render; may be given more than once, and defaults to all of them')
+    parser.add_argument('--no-variants', dest='no_variants', action='store_const', const=True, default=False,
+                        help='Only render without variant symbols')
+    parser.add_argument('--all-affiliations', dest='all_affiliations', action='store_const', const=True, default=False,
+                        help='Render every affiliation, not only those with their own frames')
+    parser.add_argument('-e', '--limit-to', dest='limit_to_symbol_sets', action='append', default=[],
+                        help='Limits to a symbol set, by name or ID code; may be given more than once')
+    parser.add_argument('-p', '--padding', dest='padding', type=int, default=4, help='Padding for each SVG; default is 4')
+    parser.add_argument('-b', '--use-background', dest='use_background', action='store_const', const=True, default=False,
+                        help='Whether to draw a background halo around each symbol')
+    parser.add_argument('-c', '--background-color', dest='background_color', default='#ffffff',
+                        help='Background color to use, if it\'s used')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=0,
+                        help='The number of worker processes to render with; default 0 uses one per CPU')
+    parser.add_argument('--snapshot', dest='snapshot_path', default=None, help='A compiled schema snapshot to load from')
+    parser.add_argument('--restart', dest='restart', action='store_const', const=True, default=False,
+                        help='Render everything again rather than resuming a previous run')
+    parser.add_argument('--progress', dest='progress', action='store_const', const=True, default=False,
+                        help='Report progress and throughput to stderr')
+    arguments = parser.parse_args(argv)
+
+    if (arguments.output_dir is None) == (arguments.disk_cache_path is None):
+        parser.error('exactly one of --output-dir and --disk-cache is required')
+
+    reporter = command_line.ProgressReporter(enabled=arguments.progress)
+    summary:dict = precompute(output_dir=arguments.output_dir, disk_cache_path=arguments.disk_cache_path,
+                              manifest_path=arguments.manifest_path,
+                              styles=arguments.styles if len(arguments.styles) > 0 else SymbolCache.STYLE_OPTIONS,
+                              variants=[False] if arguments.no_variants else [False, True],
+                              all_affiliations=arguments.all_affiliations,
+                              limit_to_symbol_sets=arguments.limit_to_symbol_sets if len(arguments.limit_to_symbol_sets) > 0 else None,
+                              padding=arguments.padding, use_background=arguments.use_background,
+                              background_color=arguments.background_color,
+                              workers=arguments.jobs if arguments.jobs > 0 else None, resume=not arguments.restart,
+                              snapshot_path=arguments.snapshot_path, progress=reporter.add)
+    reporter.finish()
+
+    print(f'{summary["total"]} in catalog: {summary["rendered"]} rendered, {summary["skipped"]} already done, '
+          f'{summary["failed"]} failed', file=sys.stderr)
+    if not summary['complete']:
+        sys.exit(1)
@@ -3,9 +3,14 @@ import re
 import json
 import sys
 import glob
+import threading
+from collections.abc import MutableMapping
 sys.path.append(os.path.dirname(__file__))
 
 import drawing_items
+import schema_snapshot
+import name_index
+import instrumentation
 
 def is_valid_hex_key(key:str, required_length:int=-1) -> bool:
 	"""
@@ -22,11 +27,19 @@ def is_valid_hex_key(key:str, required_length:int=-1) -> bool:
 			return False
 	return True
 
+def intern_names(names:list) -> list:
+	"""
+	Returns a list of the given names interned, so that names repeated across the schema share one string
+	"""
+	return [sys.intern(name) for name in names]
+
 
 class Context:
 	"""
 	Represents a standard identity context
 	"""
+	__slots__ = ('id_code', 'names', 'base_context', 'match_name', 'dashed')
+
 	def __init__(self):
 		self.id_code:str = ""      # The ID code of the context, a 1-digit hexadecimal 
 		self.names:list  = []      # The names of the context
@@ -48,8 +61,8 @@ class Context:
 
 		context:Context = Context()
 		context.id_code = id_code
-		context.names = json['names']
-		context.base_context = json.get('base context', id_code)
+		context.names = intern_names(json['names'])
+		context.base_context = sys.intern(json.get('base context', id_code))
 		return context
 
 
@@ -57,6 +70,7 @@ class Affiliation:
 	"""
 	Represents a standard identity affiliation
 	"""
+	__slots__ = ('id_code', 'names', 'colors', 'dashed', 'has_civilian_variant', 'frame_id', 'color_id', 'match_name')
 
 	def __init__(self):
 		self.id_code:str = ""                 # A 1-digit hexadecimal
@@ -89,11 +103,11 @@ class Affiliation:
 
 		affiliation:Affiliation = Affiliation()
 		affiliation.id_code = id_code
-		affiliation.names = json["names"]
+		affiliation.names = intern_names(json["names"])
 		affiliation.has_civilian_variant = bool(json.get("has civilian variant", True))
 		affiliation.dashed = bool(json.get('dashed', False))
-		affiliation.frame_id = json.get("frame base", "")
-		affiliation.color_id = json.get("color base", "")
+		affiliation.frame_id = sys.intern(json.get("frame base", ""))
+		affiliation.color_id = sys.intern(json.get("color base", ""))
 
 		if 'colors' in json:
 			if len([c for c in schema.color_modes if c in json['colors']]) != len(schema.color_modes):
@@ -135,20 +149,71 @@ class FrameShape:
 		'hostile': '6'
 	}
 
+	__slots__ = ('id_code', 'names', 'frames', 'amplifier_offsets', 'svg_fragments', 'bboxes')
+
 	def __init__(self):
 		self.id_code:str = ""  # Frame shape
 		self.names:list = []   # List of human-readable names
 		self.frames:dict = {}  # Dictionary of frames for IDs
 		self.amplifier_offsets:dict = self.DEFAULT_AMPLIFIER_OFFSETS
+		self.svg_fragments:dict = {}  # Cache of rendering options to serialized frame elements, built on first use
+		self.bboxes:dict = {}         # Cache of rendering options to frame bounding boxes, built on first use
 
 	def __repr__(self):
 		return f'Frame shape \"{self.id_code}\" ({len(self.frames[list(self.frames.keys())[0]])} elements)'
 
+	def __getstate__(self) -> tuple:
+		# Rendering caches are rebuilt on demand rather than pickled
+		state:tuple = super().__getstate__() # (None, {slot: value})
+		state[1]['svg_fragments'] = {}
+		state[1]['bboxes'] = {}
+		return state
+
+	def get_svg_fragments(self, symbol, output_style, dashed:bool) -> list:
+		"""
+		Returns the serialized SVG elements of the frame for the given symbol's affiliation, with colors still named.
+		Frames only vary by affiliation, dashing, fill style and text options, so each combination is serialized once.
+		"""
+		unfilled:bool = output_style.fill_style == 'unfilled'
+		key:tuple = (symbol.affiliation.frame_id, dashed, unfilled, output_style.use_text_paths, output_style.text_path_font)
+		fragments:list = self.svg_fragments.get(key, None)
+		if fragments is not None:
+			return fragments
+
+		instrumentation.count('render.frame_serialized')
+		base_frame = self.frames[symbol.affiliation.frame_id]
+		fragments = []
+		if dashed:
+			if not unfilled:
+				fragments += [base_frame[0].copy_with_stroke(stroke_color='white').svg(symbol=symbol, output_style=output_style)]
+			fragments += [base_frame[0].copy_with_stroke(stroke_color='icon', stroke_dashed=True).with_fill(fill_color=None).svg(symbol=symbol, output_style=output_style)]
+			fragments += [e.svg(symbol=symbol, output_style=output_style) for e in base_frame[1:]]
+		elif not unfilled:
+			fragments += [e.svg(symbol=symbol, output_style=output_style) for e in base_frame]
+		else:
+			fragments += [base_frame[0].copy_with_fill(fill_color=None).svg(symbol=symbol, output_style=output_style)]
+			fragments += [e.svg(symbol=symbol, output_style=output_style) for e in base_frame[1:]]
+
+		self.svg_fragments[key] = fragments
+		return fragments
+
+	def get_bbox(self, symbol, output_style):
+		"""
+		Returns the bounding box of the frame for the given symbol's affiliation. The box is shared, so callers must
+		not modify it.
+		"""
+		key:tuple = (symbol.affiliation.frame_id, output_style.use_text_paths, output_style.text_path_font)
+		bbox = self.bboxes.get(key, None)
+		if bbox is None:
+			bbox = drawing_items.BBox.merge_all([e.get_bbox(symbol=symbol, output_style=output_style) for e in self.frames[symbol.affiliation.frame_id]])
+			self.bboxes[key] = bbox
+		return bbox
+
 	@classmethod
 	def from_dict(cls, id_code:str, json:dict, over_dict:dict):
 		frame_shape:frame_shape = cls()
 		frame_shape.id_code = id_code
-		frame_shape.names = json.get('names', [id_code])
+		frame_shape.names = intern_names(json.get('names', [id_code]))
 
 		def create_base_frames(json:dict, over_dict:dict, ret:dict = {}) -> dict:
 			amplifier_offsets = {}
@@ -201,6 +266,7 @@ class Dimension:
 	""" 
 	Represents a dimension, which sets the frame type
 	"""
+	__slots__ = ('id_code', 'names', 'frame_shape')
 
 	def __init__(self):
 		self.id_code:str = ""  # Human readable name for the dimension
@@ -214,7 +280,7 @@ class Dimension:
 	def from_dict(cls, id_code:str, json:dict, schema):
 		dimension = cls()
 		dimension.id_code = id_code
-		dimension.names = json.get('names', [id_code])
+		dimension.names = intern_names(json.get('names', [id_code]))
 		frame_shape_code:str = json.get('frame shape')
 		if schema is None or frame_shape_code not in schema.frame_shapes:
 			raise Exception(f"No frame shape \"{frame_shape_code}\" in schema for dimension {dimension.names[0]}")
@@ -228,6 +294,7 @@ class Status:
 	"""
 	Represents a status
 	"""
+	__slots__ = ('id_code', 'names', 'dashed', 'icon', 'alt_icon', 'icon_side', 'alt_icon_side', 'match_name')
 
 	def __init__(self):
 		self.id_code:str = ""
@@ -257,7 +324,7 @@ class Status:
 
 		status:Status = Status()
 		status.id_code = id_code
-		status.names = json.get('names', [])
+		status.names = intern_names(json.get('names', []))
 		status.dashed = json.get("dashed", False)
 
 		if 'icon' in json:
@@ -284,6 +351,7 @@ class HQTFD:
 	"""
 	Represents a HQTFD code
 	"""
+	__slots__ = ('id_code', 'names', 'dashed', 'headquarters', 'task_force', 'dummy', 'blacklist', 'match_name')
 
 	def __init__(self):
 		self.id_code:str = "" # 1-digit hexadecimal
@@ -322,7 +390,7 @@ class HQTFD:
 
 		hqtfd:HQTFD = HQTFD()
 		hqtfd.id_code = id_code
-		hqtfd.names = json.get('names', [])
+		hqtfd.names = intern_names(json.get('names', []))
 		if len(hqtfd.names) < 1:
 			print(f"No names for amplifier {self.id_code}")
 			return None
@@ -342,6 +410,8 @@ class Amplifier:
 	"""
 	Represents an amplifier
 	"""
+	__slots__ = ('id_code', 'names', 'category', 'applies_to', 'icon', 'icon_side', 'alt_icon', 'alt_icon_side', 'prerun',
+		'match_name')
 
 	def __init__(self):
 		self.id_code:str = "" # 1-digit hexadecimal
@@ -394,12 +464,12 @@ class Amplifier:
 
 		amplifier:Amplifier = Amplifier()
 		amplifier.id_code = id_code
-		amplifier.names = json.get("names", [])
+		amplifier.names = intern_names(json.get("names", []))
 		if len(amplifier.names) < 1:
 			print(f"No names for amplifier {self.id_code}", file=sys.stderr)
 			return None
 
-		amplifier.category = json.get("category", "")
+		amplifier.category = sys.intern(json.get("category", ""))
 		amplifier.applies_to = [] 
 		for apt in json.get("applies to", []):
 			if apt not in schema.dimensions:
@@ -437,6 +507,9 @@ class Amplifier:
 A full symbol component (e.g. an entity or modifier)
 """
 class SymbolLayer:
+	__slots__ = ('id_code', 'names', 'elements', 'civilian', 'icon', 'alt_icon', 'symbol_set', 'match_name', 'match_weight',
+		'svg_fragments', 'bboxes')
+
 	def __init__(self, symbol_set=None):
 		self.id_code:str = '' # A six (for entities) or two-digit hex code
 		self.names:str = [] # Human-readable names
@@ -447,8 +520,43 @@ class SymbolLayer:
 		self.symbol_set = symbol_set
 		self.match_name:bool = True
 		self.match_weight:float = None
+		self.svg_fragments:dict = {} # Cache of rendering options to serialized icon elements, built on first use
+		self.bboxes:dict = {} # Cache of rendering options to icon bounds, built on first use
 		pass
 
+	def __getstate__(self) -> tuple:
+		# Rendering caches are rebuilt on demand rather than pickled
+		state:tuple = super().__getstate__() # (None, {slot: value})
+		state[1]['svg_fragments'] = {}
+		state[1]['bboxes'] = {}
+		return state
+
+	def get_svg_fragments(self, symbol, output_style) -> list:
+		"""
+		Returns the serialized SVG elements of the icon (or alternate icon) for the given symbol, with colors still
+		named. Icons only vary by affiliation (for full-frame elements) and text options, so each combination is
+		serialized once.
+		"""
+		use_alt_icon:bool = bool(output_style.use_alternate_icons and self.alt_icon)
+		key:tuple = (use_alt_icon, symbol.affiliation.frame_id, output_style.use_text_paths, output_style.text_path_font)
+		fragments:list = self.svg_fragments.get(key, None)
+		if fragments is None:
+			instrumentation.count('render.icon_serialized')
+			fragments = [e.svg(symbol=symbol, output_style=output_style) for e in (self.alt_icon if use_alt_icon else self.icon)]
+			self.svg_fragments[key] = fragments
+		return fragments
+
+	def get_bbox(self, symbol, output_style):
+		"""
+		Returns the bounding box of the icon (or alternate icon) for the given symbol, or None if the icon is empty.
+		The box is shared, so callers must not modify it.
+		"""
+		use_alt_icon:bool = bool(output_style.use_alternate_icons and self.alt_icon)
+		key:tuple = (use_alt_icon, symbol.affiliation.frame_id, output_style.use_text_paths, output_style.text_path_font)
+		if key not in self.bboxes:
+			self.bboxes[key] = drawing_items.BBox.merge_all([e.get_bbox(symbol=symbol, output_style=output_style) for e in (self.alt_icon if use_alt_icon else self.icon)])
+		return self.bboxes[key]
+
 	def get_match_weight(self) -> float:
 		if self.match_weight is None:
 			return self.symbol_set.match_weight if self.symbol_set is not None else 0
@@ -485,8 +593,8 @@ class SymbolLayer:
 		# 	return None
 
 		symbol_layer = SymbolLayer()
-		symbol_layer.id_code = id_code
-		symbol_layer.names = json['names'] if 'names' in json else []
+		symbol_layer.id_code = sys.intern(id_code)
+		symbol_layer.names = intern_names(json['names'] if 'names' in json else [])
 		symbol_layer.civilian = json.get('civ', False)
 
 		if 'match weight' in json:
@@ -506,6 +614,8 @@ class Entity(SymbolLayer):
 	"""
 	Represents an entity
 	"""
+	__slots__ = ()
+
 	def __init__(self):
 		super().__init__()
 
@@ -517,6 +627,8 @@ class Modifier(SymbolLayer):
 	"""
 	Represents a modifier
 	"""
+	__slots__ = ()
+
 	def __init__(self):
 		super().__init__()
 
@@ -525,6 +637,8 @@ class SymbolSet:
 	"""
 	Represents a symbol set with entities and modifiers
 	"""
+	__slots__ = ('id_code', 'names', 'dimension', 'common', 'entities', 'm1', 'm2', 'match_name', 'match_weight')
+
 	def __init__(self):
 		self.id_code:str = '00' # The identifier of the symbol set
 		self.names:list = []
@@ -546,14 +660,11 @@ class SymbolSet:
 	def __repr__(self) -> str:
 		return f'{self.names[0]} ({self.id_code})'
 
-	@classmethod
-	def parse_from_file(cls, filepath:str, schema, verbose:bool=False):
+	@staticmethod
+	def read_json_file(filepath:str) -> dict:
 		"""
-		Parse a JSON file representing a single symbol set.
+		Reads the JSON dictionary for a single symbol set file, stripping comments.
 		"""
-
-		ITEM_TYPES = [("IC", Entity), ("M1", Modifier), ("M2", Modifier)]
-
 		if not os.path.exists(filepath):
 			print(f'No file "{filepath}" in parsing SymbolSet', file=sys.stderr)
 			return None
@@ -563,7 +674,27 @@ class SymbolSet:
 			json_str = json_file.read()
 			json_str = re.sub('#[.]*\n', '', json_str)
 
-		json_dict = json.loads(json_str)
+		return json.loads(json_str)
+
+	@classmethod
+	def parse_from_file(cls, filepath:str, schema, verbose:bool=False):
+		"""
+		Parse a JSON file representing a single symbol set.
+		"""
+
+		json_dict = cls.read_json_file(filepath)
+		if json_dict is None:
+			return None
+
+		return cls.parse_from_dict(json_dict, schema=schema, filepath=filepath, verbose=verbose)
+
+	@classmethod
+	def parse_from_dict(cls, json_dict:dict, schema, filepath:str='', verbose:bool=False):
+		"""
+		Parse the JSON dictionary representing a single symbol set.
+		"""
+
+		ITEM_TYPES = [("IC", Entity), ("M1", Modifier), ("M2", Modifier)]
 
 		# Parse icon sets
 		ret:dict = {
@@ -613,11 +744,185 @@ class SymbolSet:
 		ret_set.m1 = ret['M1']
 		ret_set.m2 = ret['M2']
 		ret_set.match_weight = json_dict.get('match weight', 0.0)
-		ret_set.names = json_dict['names'] if 'names' in json_dict else [json_dict['name']]
+		ret_set.names = intern_names(json_dict['names'] if 'names' in json_dict else [json_dict['name']])
 		ret_set.dimension = schema.dimensions[json_dict['dimension']] if not is_common else False
 		ret_set.common = is_common
 		return ret_set
 
+class SymbolSetHeader:
+	"""
+	Lightweight description of a symbol set, available before the set's entities and modifiers are parsed
+	"""
+	__slots__ = ('id_code', 'names', 'common', 'dimension_id', 'match_name', 'match_weight', 'filepath', 'snapshot_blob',
+		'json_dict', 'failed')
+
+	def __init__(self):
+		self.id_code:str = ''
+		self.names:list = []
+		self.common:bool = False
+		self.dimension_id:str = ''
+		self.match_name:bool = True
+		self.match_weight:float = 0.0
+		self.filepath:str = ''      # The JSON file to parse the set from
+		self.snapshot_blob:bytes = None # The compiled set, if loaded from a snapshot
+		self.json_dict:dict = None  # The JSON the header was read from, kept until the set is first parsed
+		self.failed:bool = False    # Whether parsing the set failed
+
+	def __repr__(self) -> str:
+		return f'{self.names[0] if self.names else ""} ({self.id_code}) [{"loaded" if self.snapshot_blob is None else "compiled"}]'
+
+	@classmethod
+	def from_dict(cls, json_dict:dict, filepath:str=''):
+		if 'set' not in json_dict:
+			print(f'No set in "{filepath}"', file=sys.stderr)
+			return None
+
+		header = cls()
+		header.id_code = json_dict['set']
+		header.names = intern_names(json_dict['names'] if 'names' in json_dict else [json_dict['name']])
+		header.common = json_dict.get('common', False)
+		header.dimension_id = json_dict.get('dimension', '')
+		header.match_name = json_dict.get('match name', True)
+		header.match_weight = json_dict.get('match weight', 0.0)
+		header.filepath = filepath
+		header.json_dict = json_dict
+		return header
+
+	@classmethod
+	def from_symbol_set(cls, symbol_set:SymbolSet):
+		header = cls()
+		header.id_code = symbol_set.id_code
+		header.names = symbol_set.names
+		header.common = symbol_set.common
+		header.dimension_id = symbol_set.dimension.id_code if symbol_set.dimension else ''
+		header.match_name = symbol_set.match_name
+		header.match_weight = symbol_set.match_weight
+		return header
+
+	def load(self, schema) -> SymbolSet:
+		"""
+		Materializes the full symbol set, from its compiled form if available or its JSON otherwise. The JSON read
+		when indexing is only used once, so the file isn't read and parsed a second time.
+		"""
+		if self.snapshot_blob is not None:
+			return schema_snapshot.load_symbol_set(self.snapshot_blob, schema=schema)
+		json_dict, self.json_dict = self.json_dict, None
+		if json_dict is not None:
+			return SymbolSet.parse_from_dict(json_dict, schema=schema, filepath=self.filepath)
+		return SymbolSet.parse_from_file(self.filepath, schema=schema)
+
+	def with_snapshot_blob(self, snapshot_blob:bytes):
+		"""
+		Returns a copy of this header holding the given compiled set instead of its JSON
+		"""
+		header = SymbolSetHeader()
+		for attr in SymbolSetHeader.__slots__:
+			setattr(header, attr, getattr(self, attr))
+		header.snapshot_blob = snapshot_blob
+		header.json_dict = None
+		return header
+
+
+class LazySymbolSetDict(MutableMapping):
+	"""
+	A mapping of [symbol set ID : symbol set object] that only parses each symbol set on first access. The
+	headers (IDs, names, and dimensions) of every set are available up front without parsing any set.
+	"""
+	def __init__(self, schema):
+		self.schema = schema
+		self.headers:dict = {} # Symbol set ID to SymbolSetHeader, in load order
+		self.loaded:dict = {}  # Symbol set ID to parsed SymbolSet
+		self.version:int = 0   # Incremented whenever sets are added or removed
+		self.lock = threading.Lock()
+
+	def __repr__(self) -> str:
+		return f'LazySymbolSetDict({len(self.loaded)}/{len(self)} loaded)'
+
+	def add_header(self, header:SymbolSetHeader):
+		self.headers[header.id_code] = header
+		self.version += 1
+
+	def get_header(self, key:str) -> SymbolSetHeader:
+		header = self.headers.get(key, None)
+		return header if header is not None and not header.failed else None
+
+	def get_headers(self) -> list:
+		return [header for header in self.headers.values() if not header.failed]
+
+	def is_loaded(self, key:str) -> bool:
+		return key in self.loaded
+
+	def load_all(self):
+		for key in list(self.headers):
+			self.get(key)
+
+	def __getitem__(self, key):
+		symbol_set = self.loaded.get(key, None)
+		if symbol_set is not None:
+			return symbol_set
+
+		header = self.get_header(key)
+		if header is None:
+			raise KeyError(key)
+
+		with self.lock:
+			symbol_set = self.loaded.get(key, None)
+			if symbol_set is None:
+				with instrumentation.timer('schema.parse_symbol_set'):
+					symbol_set = header.load(self.schema)
+				if symbol_set is None:
+					print(f"Bad symbol set file \"{header.filepath}\"", file=sys.stderr)
+					header.failed = True
+					raise KeyError(key)
+				self.loaded[key] = symbol_set
+
+		return symbol_set
+
+	def __setitem__(self, key, symbol_set:SymbolSet):
+		if key not in self.headers:
+			self.headers[key] = SymbolSetHeader.from_symbol_set(symbol_set)
+		self.loaded[key] = symbol_set
+		self.version += 1
+
+	def __delitem__(self, key):
+		del self.headers[key]
+		self.loaded.pop(key, None)
+		self.version += 1
+
+	def __contains__(self, key) -> bool:
+		return self.get_header(key) is not None
+
+	def __iter__(self):
+		return iter([header.id_code for header in self.get_headers()])
+
+	def __len__(self) -> int:
+		return len(self.get_headers())
+
+	def values(self) -> list:
+		return [symbol_set for symbol_set in (self.get(key) for key in list(self.headers)) if symbol_set is not None]
+
+	def items(self) -> list:
+		return [(symbol_set.id_code, symbol_set) for symbol_set in self.values()]
+
+	def __getstate__(self) -> dict:
+		# Pickle every set in its compiled form so that unpickled schemas stay lazy; the compiled forms go on copies
+		# of the headers, so they aren't kept in memory after pickling
+		headers:dict = {}
+		for key, header in self.headers.items():
+			if header.snapshot_blob is None and not header.failed:
+				symbol_set = self.get(key)
+				if symbol_set is not None:
+					header = header.with_snapshot_blob(schema_snapshot.dump_symbol_set(symbol_set, schema=self.schema))
+			headers[key] = header
+		return {'schema': self.schema, 'headers': headers}
+
+	def __setstate__(self, state:dict):
+		self.schema = state['schema']
+		self.headers = state['headers']
+		self.loaded = {}
+		self.version = len(self.headers)
+		self.lock = threading.Lock()
+
 class Schema:
 	"""
 	Represents a full symbol schema
@@ -644,10 +949,41 @@ class Schema:
 		self.hqtfds:dict = {}
 		## Amplifiers
 		self.amplifiers:dict = {}
-		## A mapping of [symbol set ID : symbol set object]
-		self.symbol_sets:dict = {}
+		## A mapping of [symbol set ID : symbol set object], parsed lazily on access
+		self.symbol_sets:LazySymbolSetDict = LazySymbolSetDict(self)
 
 		self.templates:list = []
+		## Incremented whenever templates are added
+		self.template_version:int = 0
+
+		## The directory of JSON files this schema was loaded from, and their content hash if it's been computed
+		self.source_directory:str = ''
+		self._source_hash:str = None
+
+		## Index of candidate names for name matching, built on first use
+		self.name_index:name_index.NameIndex = None
+		## Cached (symbol set version, entity list) for get_flat_entities()
+		self.flat_entities:tuple = None
+
+	def __getstate__(self) -> dict:
+		# Derived indices are rebuilt on demand rather than pickled
+		state = self.__dict__.copy()
+		state['name_index'] = None
+		state['flat_entities'] = None
+		return state
+
+	@property
+	def source_hash(self) -> str:
+		"""
+		Content hash of the JSON files this schema was loaded from, computed on first use since it reads every file
+		"""
+		if self._source_hash is None:
+			self._source_hash = schema_snapshot.compute_source_hash(self.source_directory) if self.source_directory else ''
+		return self._source_hash
+
+	@source_hash.setter
+	def source_hash(self, source_hash:str):
+		self._source_hash = source_hash
 
 	def add_templates(self, templates:list):
 		for temp in templates:
@@ -655,6 +991,12 @@ class Schema:
 				self.templates.append(temp)
 
 		self.templates = list(set(self.templates))
+		self.template_version += 1
+
+	def get_name_index(self) -> name_index.NameIndex:
+		if self.name_index is None:
+			self.name_index = name_index.NameIndex(self)
+		return self.name_index
 
 	def print_constants(self):
 		print("Constants set")
@@ -715,7 +1057,7 @@ class Schema:
 		# Load color modes
 		self.color_modes = []
 		for color_mode in json_dict['color modes']:
-			self.color_modes.append(color_mode.lower())
+			self.color_modes.append(sys.intern(color_mode.lower()))
 
 		# Load affiliations
 		for aff_id, aff_dict in json_dict["affiliations"].items():
@@ -763,18 +1105,38 @@ class Schema:
 		return True
 
 	def get_flat_entities(self) -> list:
-		ret = []
-		for symbol_set in self.symbol_sets.values():
-			ret += list(symbol_set.entities.values())
-		return ret
+		if self.flat_entities is None or self.flat_entities[0] != self.symbol_sets.version:
+			ret = []
+			for symbol_set in self.symbol_sets.values():
+				ret += list(symbol_set.entities.values())
+			self.flat_entities = (self.symbol_sets.version, ret)
+		return self.flat_entities[1]
 
 	@classmethod
-	def load_from_directory(cls, directory:str=os.path.join(os.path.dirname(__file__), 'schema'), verbose:bool = False):
+	def load_from_directory(cls, directory:str=os.path.join(os.path.dirname(__file__), 'schema'), verbose:bool = False, snapshot_path:str = None):
 		"""
-		Parses the schema from a directory of files
+		Parses the schema from a directory of files. If snapshot_path is given, the schema is loaded from that
+		compiled snapshot when it was built from the current contents of the directory; otherwise the JSON files
+		are parsed and the snapshot is (re)written for the next load.
 		"""
 
+		load_times = instrumentation.stages('schema.load')
+		# Hashing reads every file, so it's only done up front to check the snapshot against
+		source_hash:str = None
+		if snapshot_path:
+			source_hash = schema_snapshot.compute_source_hash(directory)
+			load_times.mark('hash')
+			schema = schema_snapshot.read_snapshot(snapshot_path, source_hash=source_hash)
+			load_times.mark('read_snapshot')
+			if schema is not None:
+				if verbose:
+					print(f'Loaded schema snapshot "{snapshot_path}"')
+				load_times.finish()
+				return schema
+
 		schema = cls()
+		schema.source_directory = directory
+		schema.source_hash = source_hash
 		files = glob.glob(os.path.join(directory, '*.json'))
 
 		# Parse the constant file
@@ -785,19 +1147,40 @@ class Schema:
 
 		schema.parse_constants_from_file(filepath=constant_files[0])
 
-		# Parse all the JSON files
-		symbol_sets = []
+		# Index all the symbol set files; each set is only parsed when first accessed
 		for filename in [f for f in files if os.path.basename(f) != 'constants.json']:
 			if verbose:
-				print(f'Parsing "{filename}"...')
-			symbol_set:SymbolSet = SymbolSet.parse_from_file(filename, schema=schema, verbose=verbose)
-			if symbol_set is None:
+				print(f'Indexing "{filename}"...')
+			json_dict = SymbolSet.read_json_file(filename)
+			header:SymbolSetHeader = SymbolSetHeader.from_dict(json_dict, filepath=filename) if json_dict is not None else None
+			if header is None:
 				print(f"Bad symbol set file \"{filename}\"", file=sys.stderr)
 				continue
 
-			schema.symbol_sets[symbol_set.id_code] = symbol_set		
+			schema.symbol_sets.add_header(header)
+
+		load_times.mark('parse')
+		if snapshot_path:
+			if verbose:
+				print(f'Writing schema snapshot "{snapshot_path}"')
+			schema_snapshot.write_snapshot(schema, snapshot_path, source_hash=source_hash)
+			load_times.mark('write_snapshot')
+
+		load_times.finish()
 		return schema
 
 	@classmethod
-	def load(cls, verbose:bool=False):
-		return Schema.load_from_directory(verbose=verbose)
\ No newline at end of file
+	def compile_snapshot(cls, snapshot_path:str, directory:str=os.path.join(os.path.dirname(__file__), 'schema'), verbose:bool = False) -> bool:
+		"""
+		Parses the schema from a directory of JSON files and writes it to a compiled snapshot at snapshot_path,
+		for later use with load_from_directory(snapshot_path=...)
+		:return: Whether the snapshot was written
+		"""
+		schema = cls.load_from_directory(directory=directory, verbose=verbose)
+		if schema is None:
+			return False
+		return schema_snapshot.write_snapshot(schema, snapshot_path, source_hash=schema.source_hash)
+
+	@classmethod
+	def load(cls, verbose:bool=False, snapshot_path:str = None):
+		return Schema.load_from_directory(verbose=verbose, snapshot_path=snapshot_path)
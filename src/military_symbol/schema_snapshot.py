@@ -0,0 +1,125 @@
+import os
+import sys
+import glob
+import pickle
+import hashlib
+import io
+
+"""
+Helpers for reading and writing compiled schema snapshots. A snapshot is a pickled copy of a fully
+parsed Schema, preceded by a small header recording the snapshot format and a content hash of the JSON
+files it was built from, so that a stale snapshot is detected without unpickling the schema itself.
+Each symbol set is stored as its own pickled blob and only unpickled when the set is first accessed.
+
+Snapshots are pickles; only load them from locations you trust.
+"""
+
+# Bump whenever the layout of the pickled schema objects changes
+SNAPSHOT_FORMAT_VERSION:int = 7
+SNAPSHOT_MAGIC:str = 'military-symbol-schema-snapshot'
+
+def compute_source_hash(directory:str) -> str:
+	"""
+	Returns a hex digest over the names and contents of every JSON file in the given schema directory.
+	"""
+	digest = hashlib.sha256()
+	digest.update(f'{SNAPSHOT_MAGIC}:{SNAPSHOT_FORMAT_VERSION}'.encode('utf-8'))
+	for filepath in sorted(glob.glob(os.path.join(directory, '*.json'))):
+		digest.update(os.path.basename(filepath).encode('utf-8'))
+		with open(filepath, 'rb') as json_file:
+			digest.update(json_file.read())
+	return digest.hexdigest()
+
+def write_snapshot(schema, snapshot_path:str, source_hash:str) -> bool:
+	"""
+	Writes the given schema to a snapshot file. The file is written to a temporary path first and then
+	moved into place, so concurrent readers never see a partially written snapshot.
+	:return: Whether the snapshot was written
+	"""
+	header:dict = {
+		'magic': SNAPSHOT_MAGIC,
+		'format': SNAPSHOT_FORMAT_VERSION,
+		'source hash': source_hash
+	}
+
+	temp_path:str = f'{snapshot_path}.{os.getpid()}.tmp'
+	try:
+		snapshot_dir = os.path.dirname(os.path.abspath(snapshot_path))
+		os.makedirs(snapshot_dir, exist_ok=True)
+		with open(temp_path, 'wb') as snapshot_file:
+			pickle.dump(header, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+			pickle.dump(schema, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(temp_path, snapshot_path)
+	except (OSError, pickle.PicklingError, RecursionError) as ex:
+		print(f'Unable to write schema snapshot "{snapshot_path}": {ex}', file=sys.stderr)
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+		return False
+
+	return True
+
+def read_snapshot(snapshot_path:str, source_hash:str):
+	"""
+	Reads a schema from the given snapshot file if it exists and was built from sources matching
+	the given hash.
+	:return: The Schema, or None if the snapshot is missing, stale, or unreadable
+	"""
+	if not os.path.exists(snapshot_path):
+		return None
+
+	try:
+		with open(snapshot_path, 'rb') as snapshot_file:
+			header = pickle.load(snapshot_file)
+			if not isinstance(header, dict) or header.get('magic') != SNAPSHOT_MAGIC:
+				print(f'"{snapshot_path}" is not a schema snapshot; ignoring', file=sys.stderr)
+				return None
+
+			if header.get('format') != SNAPSHOT_FORMAT_VERSION or header.get('source hash') != source_hash:
+				return None
+
+			return pickle.load(snapshot_file)
+	except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as ex:
+		print(f'Unable to read schema snapshot "{snapshot_path}": {ex}', file=sys.stderr)
+		return None
+
+class _SymbolSetPickler(pickle.Pickler):
+	"""
+	Pickles a symbol set, storing references to the schema-level dimensions and frame shapes it uses
+	rather than copies of them.
+	"""
+	def __init__(self, file, schema):
+		super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+		self.shared_objects:dict = {}
+		for kind, items in [('dimension', schema.dimensions), ('frame shape', schema.frame_shapes)]:
+			for id_code, item in items.items():
+				self.shared_objects[id(item)] = (kind, id_code)
+
+	def persistent_id(self, obj):
+		return self.shared_objects.get(id(obj), None)
+
+class _SymbolSetUnpickler(pickle.Unpickler):
+	def __init__(self, file, schema):
+		super().__init__(file)
+		self.schema = schema
+
+	def persistent_load(self, pid):
+		kind, id_code = pid
+		if kind == 'dimension':
+			return self.schema.dimensions[id_code]
+		elif kind == 'frame shape':
+			return self.schema.frame_shapes[id_code]
+		raise pickle.UnpicklingError(f'Unknown shared schema object {pid}')
+
+def dump_symbol_set(symbol_set, schema) -> bytes:
+	"""
+	Returns the compiled form of a single symbol set belonging to the given schema.
+	"""
+	buffer = io.BytesIO()
+	_SymbolSetPickler(buffer, schema=schema).dump(symbol_set)
+	return buffer.getvalue()
+
+def load_symbol_set(blob:bytes, schema):
+	"""
+	Returns the symbol set stored in the given compiled blob, attached to the given schema.
+	"""
+	return _SymbolSetUnpickler(io.BytesIO(blob), schema=schema).load()
@@ -0,0 +1,258 @@
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+import command_line
+import name_to_sidc
+from schema import Schema
+from symbol import Symbol
+from symbol_cache import SymbolCache
+
+"""
+Sharing one loaded schema between worker processes forked from a parent, such as gunicorn workers with preload_app
+or a multiprocessing pool using the fork start method. Pages a forked worker only reads stay shared with its parent,
+but the garbage collector writes to the header of every object it examines, so a worker's first full collection
+copies every page the schema occupies. preload() loads the default schema completely in the parent, fills its
+lazily-built indexes and rendering caches, and moves everything allocated so far into the collector's permanent
+generation with gc.freeze(), so that collections in the workers skip it.
+
+Reference counts still change on objects a worker touches, which copies those pages; freezing keeps the rest shared.
+"""
+
+# The (schema directory, snapshot path, template file) preload() loaded the default schema with, the process it ran
+# in, and the schema and its template version; a different process with these set was forked from it after preloading
+_preload_args:tuple = None
+_preload_pid:int = 0
+_preload_schema:Schema = None
+_preload_template_version:int = -1
+
+
+def preload(schema_dir:str=None, snapshot_path:str=None, template_filename:str='', cache_options:dict=None,
+            warm_render:bool=True, freeze:bool=True) -> Schema:
+    """
+    Loads the default schema and symbol cache used by the module-level helper functions for sharing with worker
+    processes forked afterwards. Call this in the parent process before forking.
+    :param schema_dir: The directory to load the schema JSON files from; defaults to the bundled schema
+    :param snapshot_path: An optional compiled schema snapshot to load from (and write if stale)
+    :param template_filename: An optional template JSON file to add to the schema
+    :param cache_options: Optional keyword arguments for the default SymbolCache
+    :param warm_render: Whether to render every entity in each base affiliation, filled and unfilled, so that the
+        schema's frame and icon serialization caches are filled before they're shared
+    :param freeze: Whether to freeze every object allocated so far with gc.freeze(). Frozen objects are never
+        collected, so a schema replaced later by init() stays in memory.
+    :return: The default schema
+    """
+    global _preload_args, _preload_pid, _preload_schema, _preload_template_version
+
+    # Collecting while loading would free garbage between the schema's objects, leaving holes that later
+    # allocations in each worker fill, copying those pages
+    gc_was_enabled:bool = gc.isenabled()
+    gc.disable()
+    try:
+        schema:Schema = command_line.init(schema_dir=schema_dir, snapshot_path=snapshot_path, cache_options=cache_options)
+        if template_filename:
+            command_line.add_templates_from_file(template_filename)
+
+        schema.symbol_sets.load_all()
+        schema.get_flat_entities()
+        schema.get_name_index().build_all()
+        if warm_render:
+            _warm_render_caches(schema)
+
+        if freeze:
+            gc.freeze()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    _preload_args = (schema_dir, snapshot_path, template_filename or '')
+    _preload_pid = os.getpid()
+    _preload_schema = schema
+    _preload_template_version = schema.template_version
+    return schema
+
+
+def clear_preload():
+    """
+    Forgets the schema preload() loaded, so that workers forked afterwards load their own; called by
+    command_line.init() when it replaces the default schema
+    """
+    global _preload_args, _preload_pid, _preload_schema, _preload_template_version
+    _preload_args = None
+    _preload_pid = 0
+    _preload_schema = None
+    _preload_template_version = -1
+
+
+def _warm_render_caches(schema:Schema):
+    from precompute import enumerate_catalog
+
+    output_styles:dict = {style: SymbolCache.make_output_style(4, style, False, False, '#ffffff') for style in ['light', 'unfilled']}
+    for sidc, style, use_variants in enumerate_catalog(schema, styles=list(output_styles), variants=[False]):
+        symbol:Symbol = Symbol.from_sidc(sidc=sidc, schema=schema)
+        if symbol is not None:
+            symbol.get_svg(output_style=output_styles[style])
+
+
+def is_preloaded_in_parent(schema_dir:str=None, snapshot_path:str=None, template_filename:str='') -> bool:
+    """
+    Returns whether this process was forked from one that preloaded the default schema with the given arguments, so
+    that the inherited schema can be used instead of loading another copy. Templates added to the preloaded schema
+    afterwards make it differ from what the arguments would load, so it isn't used then.
+    """
+    if _preload_args != (schema_dir, snapshot_path, template_filename or '') or _preload_pid == os.getpid():
+        return False
+    return command_line.get_schema() is _preload_schema and _preload_schema.template_version == _preload_template_version
+
+
+def get_memory_usage(pid:int=None) -> dict:
+    """
+    Returns the resident memory of a process, split into pages shared with other processes and pages private to it,
+    from /proc/<pid>/smaps_rollup
+    :param pid: The process to measure; defaults to this one
+    :return: A dict of 'rss', 'pss', 'shared', 'private' and each field of smaps_rollup, such as 'private_dirty',
+        in bytes; or None where smaps_rollup isn't available (Linux 4.14 and later)
+    """
+    path:str = f'/proc/{pid if pid is not None else "self"}/smaps_rollup'
+    try:
+        with open(path, 'r') as rollup_file:
+            lines:list = rollup_file.readlines()
+    except OSError:
+        return None
+
+    usage:dict = {}
+    for line in lines[1:]:
+        fields:list = line.split()
+        if len(fields) == 3 and fields[2] == 'kB':
+            usage[fields[0].rstrip(':').lower()] = int(fields[1]) * 1024
+
+    usage['shared'] = usage.get('shared_clean', 0) + usage.get('shared_dirty', 0)
+    usage['private'] = usage.get('private_clean', 0) + usage.get('private_dirty', 0)
+    return usage
+
+
+def _measure_worker(connection, sidcs:list, names:list):
+    # Renders and resolves a sample through the default cache like a server worker would, then runs a full
+    # collection, which is what touches every object the parent didn't freeze
+    for style in SymbolCache.STYLE_OPTIONS:
+        for sidc in sidcs:
+            command_line.get_svg_string(sidc, True, style=style)
+
+    schema:Schema = command_line.get_schema()
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in names:
+            name_to_sidc.name_to_symbol(name, schema)
+
+    gc.collect()
+    connection.send(get_memory_usage())
+    # Stays alive until the parent has every measurement, so pages stay shared with the other workers meanwhile
+    connection.recv()
+    connection.close()
+
+
+def measure_workers(workers:int=4, freeze:bool=True, render_sample:int=500, snapshot_path:str=None,
+                    warm_render:bool=True) -> dict:
+    """
+    Preloads the default schema, forks worker processes that each render and resolve a sample of symbols, and
+    reports the memory each worker shares with the others and keeps private
+    :param workers: The number of worker processes to fork
+    :param freeze: Whether to freeze the preloaded schema, for comparison with a run without
+    :param render_sample: The number of entity symbols each worker renders in each style
+    :param snapshot_path: A compiled schema snapshot to preload from
+    :param warm_render: Whether preloading fills the schema's rendering caches
+    :return: A JSON-serializable dict of the parent's and each worker's memory usage, from get_memory_usage()
+    """
+    if get_memory_usage() is None:
+        raise Exception('Measuring shared memory requires /proc/self/smaps_rollup, available on Linux 4.14 and later')
+
+    import multiprocessing
+    from benchmark import get_entity_sidcs, get_benchmark_names
+
+    # Only objects this call freezes are unfrozen afterwards, which is only possible if nothing was frozen before
+    frozen_before:int = gc.get_freeze_count()
+    start_time:float = time.perf_counter()
+    schema:Schema = preload(snapshot_path=snapshot_path, warm_render=warm_render, freeze=freeze)
+    preload_time:float = time.perf_counter() - start_time
+
+    all_sidcs:list = get_entity_sidcs(schema)
+    step:int = max(len(all_sidcs) // max(render_sample, 1), 1)
+    sidcs:list = all_sidcs[::step][:render_sample]
+    names:list = get_benchmark_names()
+
+    context = multiprocessing.get_context('fork')
+    processes:list = []
+    connections:list = []
+    for _ in range(workers):
+        parent_connection, child_connection = context.Pipe()
+        process = context.Process(target=_measure_worker, args=(child_connection, sidcs, names))
+        process.start()
+        child_connection.close()
+        processes.append(process)
+        connections.append(parent_connection)
+
+    try:
+        worker_usage:list = [connection.recv() for connection in connections]
+        parent_usage:dict = get_memory_usage()
+    finally:
+        for connection in connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for process in processes:
+            process.join()
+
+    if freeze and frozen_before == 0:
+        gc.unfreeze()
+
+    return {
+        'frozen': freeze,
+        'warm_render': warm_render,
+        'preload_s': round(preload_time, 3),
+        'workers': worker_usage,
+        'parent': parent_usage,
+        'python': sys.version.split()[0],
+        'schema_hash': schema.source_hash
+    }
+
+
+def shared_memory_main(argv:list):
+    """
+    Runs the shared memory measurement from "military-symbol shared-memory" command-line arguments
+    :param argv: The arguments following "shared-memory"
+    """
+    import argparse
+    parser = argparse.ArgumentParser(prog='military-symbol shared-memory',
+                                     description='Measure the memory forked workers share with a parent that preloaded the schema')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=4,
+                        help='The number of worker processes to fork; default is 4')
+    parser.add_argument('--no-freeze', dest='freeze', action='store_const', const=False, default=True,
+                        help='Preload without freezing the schema, for comparison')
+    parser.add_argument('--no-warm', dest='warm_render', action='store_const', const=False, default=True,
+                        help='Preload without filling the rendering caches')
+    parser.add_argument('--render-sample', dest='render_sample', type=int, default=500,
+                        help='The number of symbols each worker renders in each style; default is 500')
+    parser.add_argument('--snapshot', dest='snapshot_path', default=None, help='A compiled schema snapshot to preload from')
+    parser.add_argument('-o', '--output', dest='output', default='',
+                        help='The file to write the JSON report to; defaults to stdout')
+    arguments = parser.parse_args(argv)
+
+    report:dict = measure_workers(workers=arguments.workers, freeze=arguments.freeze, render_sample=arguments.render_sample,
+                                  snapshot_path=arguments.snapshot_path, warm_render=arguments.warm_render)
+
+    print(f'Preloaded {"and froze " if report["frozen"] else ""}the schema in {report["preload_s"]:.2f} s', file=sys.stderr)
+    print(f'{"process":<12} {"RSS MB":>10} {"shared MB":>10} {"private MB":>11} {"PSS MB":>10}', file=sys.stderr)
+    for process_name, usage in [('parent', report['parent'])] + [(f'worker {i}', usage) for i, usage in enumerate(report['workers'])]:
+        print(f'{process_name:<12} {usage["rss"] / 1e6:10.1f} {usage["shared"] / 1e6:10.1f} {usage["private"] / 1e6:11.1f} '
+              f'{usage["pss"] / 1e6:10.1f}', file=sys.stderr)
+
+    if arguments.output != '':
+        with open(arguments.output, 'w') as out_file:
+            json.dump(report, out_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,177 @@
+import os
+import sys
+import sqlite3
+import threading
+
+sys.path.append(os.path.dirname(__file__))
+from library_version import VERSION
+
+"""
+A persistent cache of rendered SVGs in a SQLite database, shared between processes on the same host
+"""
+
+class SVGDiskCache:
+    """
+    Rendered SVGs stored in a SQLite file, keyed by canonical SIDC (Symbol.get_sidc()) and encoded options along
+    with the hash of the schema and the library version that rendered them, so that SVGs from another schema or
+    version are never served.
+    Each thread and process opens its own connection; the database uses write-ahead logging so that readers
+    don't block on other processes writing. Errors are reported and otherwise treated as cache misses.
+    """
+
+    def __init__(self, path:str, schema_hash:str, library_version:str=VERSION, timeout:float=30.0):
+        """
+        :param path: The path of the SQLite database file, which is created if it doesn't exist
+        :param schema_hash: The source hash of the schema the SVGs are rendered from
+        :param library_version: The library version the SVGs are rendered with
+        :param timeout: How long to wait, in seconds, for another process to finish writing
+        """
+        self.path:str = path
+        self.schema_hash:str = schema_hash
+        self.library_version:str = library_version
+        self.timeout:float = timeout
+
+        self.local = threading.local()
+        self.hits:int = 0
+        self.misses:int = 0
+        self.writes:int = 0
+        self.errors:int = 0
+
+        db_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(db_dir, exist_ok=True)
+        connection = self._get_connection()
+        if connection is not None:
+            try:
+                with connection:
+                    connection.execute('CREATE TABLE IF NOT EXISTS svgs ('
+                                       'sidc TEXT NOT NULL, options TEXT NOT NULL, schema_hash TEXT NOT NULL, '
+                                       'library_version TEXT NOT NULL, svg TEXT NOT NULL, '
+                                       'PRIMARY KEY (sidc, options, schema_hash, library_version)) WITHOUT ROWID')
+            except sqlite3.Error as ex:
+                self._report_error('creating', ex)
+
+    def __repr__(self) -> str:
+        return f'SVGDiskCache("{self.path}")'
+
+    def _report_error(self, action:str, ex:Exception):
+        self.errors += 1
+        print(f'Error {action} SVG disk cache "{self.path}": {ex}', file=sys.stderr)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Connections can't be shared between threads, or carried across a fork
+        connection:sqlite3.Connection = getattr(self.local, 'connection', None)
+        if connection is not None and self.local.pid == os.getpid():
+            return connection
+
+        try:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.Error as ex:
+            self._report_error('opening', ex)
+            return None
+
+        self.local.connection = connection
+        self.local.pid = os.getpid()
+        return connection
+
+    def get(self, sidc:str, options:str) -> str:
+        """
+        Returns the SVG stored for the given SIDC and encoded options, or None if there isn't one
+        :param sidc: The canonical SIDC of the symbol
+        :param options: The options, as encoded by SymbolCache.options_string_encode
+        :return: The SVG string, or None
+        """
+        connection = self._get_connection()
+        if connection is None:
+            return None
+
+        try:
+            row = connection.execute('SELECT svg FROM svgs WHERE sidc = ? AND options = ? AND schema_hash = ? AND library_version = ?',
+                                     (sidc, options, self.schema_hash, self.library_version)).fetchone()
+        except sqlite3.Error as ex:
+            self._report_error('reading', ex)
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    def put(self, sidc:str, options:str, svg:str):
+        """
+        Stores the SVG for the given SIDC and encoded options
+        :param sidc: The canonical SIDC of the symbol
+        :param options: The options, as encoded by SymbolCache.options_string_encode
+        :param svg: The rendered SVG string
+        """
+        connection = self._get_connection()
+        if connection is None:
+            return
+
+        try:
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO svgs (sidc, options, schema_hash, library_version, svg) VALUES (?, ?, ?, ?, ?)',
+                                   (sidc, options, self.schema_hash, self.library_version, svg))
+            self.writes += 1
+        except sqlite3.Error as ex:
+            self._report_error('writing', ex)
+
+    def put_many(self, items:list):
+        """
+        Stores several SVGs in one transaction
+        :param items: A list of (SIDC, encoded options, SVG string) tuples
+        """
+        connection = self._get_connection()
+        if connection is None or len(items) < 1:
+            return
+
+        try:
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO svgs (sidc, options, schema_hash, library_version, svg) VALUES (?, ?, ?, ?, ?)',
+                                       [(sidc, options, self.schema_hash, self.library_version, svg) for sidc, options, svg in items])
+            self.writes += len(items)
+        except sqlite3.Error as ex:
+            self._report_error('writing', ex)
+
+    def prune(self) -> int:
+        """
+        Deletes every SVG rendered from a different schema or library version than this cache's
+        :return: The number of SVGs deleted
+        """
+        connection = self._get_connection()
+        if connection is None:
+            return 0
+
+        try:
+            with connection:
+                cursor = connection.execute('DELETE FROM svgs WHERE schema_hash != ? OR library_version != ?',
+                                            (self.schema_hash, self.library_version))
+            return cursor.rowcount
+        except sqlite3.Error as ex:
+            self._report_error('pruning', ex)
+            return 0
+
+    def close(self):
+        """
+        Closes the calling thread's connection to the database
+        """
+        connection:sqlite3.Connection = getattr(self.local, 'connection', None)
+        if connection is not None and self.local.pid == os.getpid():
+            connection.close()
+        self.local.connection = None
+
+    def get_stats(self) -> dict:
+        """
+        Returns statistics for the disk cache
+        :return: A dict of the database path and the hit, miss, write, and error counts
+        """
+        return {
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'errors': self.errors
+        }
@@ -3,8 +3,33 @@ from output_style import OutputStyle
 import re
 import os
 from drawing_items import BBox
+import instrumentation
 import math
 
+def get_svg_colors(fill_style:str, icon_fill_color) -> dict:
+	"""
+	Returns the named colors that icon and frame elements may use for their stroke and fill attributes, mapped to
+	the RGB tuples (or None, for no color) they're resolved to at the end of Symbol.get_svg
+	"""
+	return {
+		'icon': (0, 0, 0) if fill_style != 'unfilled' else icon_fill_color,
+		'icon_fill': icon_fill_color if fill_style != 'unfilled' else None,
+		'status yellow': (255, 255, 0),
+		'status red': (255, 0, 0),
+		'status blue': (0, 180, 240),
+		'status green': (0, 255, 0),
+		'mine yellow': (255, 255, 0),
+		'mine orange': (255, 141, 42),
+		'mine bright green': (0, 255, 0),
+		'mine dark green': (0, 130, 24),
+		'mine red': (255, 0, 0),
+		'white': (255, 255, 255) if fill_style != 'unfilled' else None,
+		'yellow': (255, 255, 128)
+	}
+
+# Matches every named color attribute in a single pass
+SVG_COLOR_REGEX = re.compile('(?:stroke|fill)="(?:' + '|'.join([re.escape(name) for name in get_svg_colors(OutputStyle.DEFAULT_FILL_STYLE, None)]) + ')"')
+
 class Symbol():
 	def __init__(self, schema=None):
 		self.schema = schema
@@ -144,6 +169,8 @@ class Symbol():
 		if not self.is_valid():
 			return None
 
+		render_times = instrumentation.stages('render')
+
 		# Assemble elements
 		elements:list = []
 		ret_bbox = BBox()
@@ -155,28 +182,12 @@ class Symbol():
 
 		SVG_NAMESPACE:str = "http://www.w3.org/2000/svg";
 
-		if self.is_frame_dashed():
-			base_frame = frame_to_use.frames[self.affiliation.frame_id]
-			if output_style.fill_style != 'unfilled':
-				elements += [base_frame[0].copy_with_stroke(stroke_color='white').svg(symbol=self, output_style=output_style)]
-
-			elements += [base_frame[0].copy_with_stroke(stroke_color='icon', stroke_dashed=True).with_fill(fill_color=None).svg(symbol=self, output_style=output_style)]
-
-			elements += [
-				e.svg(symbol=self, output_style=output_style) for e in base_frame[1:]
-			]
-		else:
-			if output_style.fill_style != 'unfilled':
-				elements += [e.svg(symbol=self, output_style=output_style) for e in frame_to_use.frames[self.affiliation.frame_id]]
-			else:
-				base_frame = frame_to_use.frames[self.affiliation.frame_id]
-				elements += [base_frame[0].copy_with_fill(fill_color=None).svg(symbol=self, output_style=output_style)]
-				elements += [e.svg(symbol=self, output_style=output_style) for e in base_frame[1:]]
-		
+		elements += frame_to_use.get_svg_fragments(symbol=self, output_style=output_style, dashed=self.is_frame_dashed())
 		frame_commands += [c for c in frame_to_use.frames[self.affiliation.frame_id]]
 
-		frame_bbox = BBox.merge_all([e.get_bbox(symbol=self, output_style=output_style) for e in frame_to_use.frames[self.affiliation.frame_id]])
+		frame_bbox = frame_to_use.get_bbox(symbol=self, output_style=output_style)
 		ret_bbox.merge(frame_bbox)
+		render_times.mark('frame')
 
 		# Handle headquarters
 		if self.is_headquarters():
@@ -262,13 +273,18 @@ class Symbol():
 
 			elements = [cmd.copy_with_stroke(stroke_color=f'{bg_color}', stroke_width=output_style.background_width*2, stroke_style='round').svg(symbol=self, output_style=output_style) for cmd in frame_commands] + elements
 
+		render_times.mark('amplifiers')
+
 		# Handle entities and modifiers
 		for entmod in [self.entity, self.modifier_1, self.modifier_2]:
 			if not entmod:
 				continue
-			icon_to_use = entmod.alt_icon if output_style.use_alternate_icons and entmod.alt_icon else entmod.icon
-			#print(f'{type(entmod).__name__} {entmod.names[0]}: {entmod.icon}')
-			elements += [e.svg(symbol=self, output_style=output_style) for e in icon_to_use]
+			elements += entmod.get_svg_fragments(symbol=self, output_style=output_style)
+			icon_bbox = entmod.get_bbox(symbol=self, output_style=output_style)
+			if icon_bbox is not None:
+				ret_bbox.merge(icon_bbox)
+
+		render_times.mark('icons')
 
 		# Create the SVGs
 		ret_bbox.expand(padding=output_style.padding)
@@ -281,30 +297,22 @@ class Symbol():
 			('\n'.join(elements) if elements is not None else '') + \
 			'\n</svg>'
 
+		render_times.mark('assemble')
+
 		# Determine proper coloration
 		icon_fill_color = self.schema.affiliations[self.affiliation.color_id].colors.get(output_style.fill_style, OutputStyle.DEFAULT_FILL_STYLE)
 
-		COLOR_DICT = {
-			'icon': (0, 0, 0) if output_style.fill_style != 'unfilled' else icon_fill_color,
-			'icon_fill': icon_fill_color if output_style.fill_style != 'unfilled' else None,
-			'status yellow': (255, 255, 0),
-			'status red': (255, 0, 0),
-			'status blue': (0, 180, 240),
-			'status green': (0, 255, 0),
-			'mine yellow': (255, 255, 0),
-			'mine orange': (255, 141, 42),
-			'mine bright green': (0, 255, 0),
-			'mine dark green': (0, 130, 24),
-			'mine dark green': (0, 130, 24),
-			'mine red': (255, 0, 0),
-			'white': (255, 255, 255) if output_style.fill_style != 'unfilled' else None,
-			'yellow': (255, 255, 128)
-		}
+		COLOR_DICT = get_svg_colors(output_style.fill_style, icon_fill_color)
 
+		# Replace every named color attribute in one pass over the SVG
+		color_attributes:dict = {}
 		for color_type in ['stroke', 'fill']:
 			for key, replacement in COLOR_DICT.items():
-				svg_content = re.sub(f'{color_type}="{key}"', f'{color_type}="rgb({replacement[0]}, {replacement[1]}, {replacement[2]})"' if replacement is not None else 'none', svg_content)
-			pass
+				color_attributes[f'{color_type}="{key}"'] = f'{color_type}="rgb({replacement[0]}, {replacement[1]}, {replacement[2]})"' if replacement is not None else 'none'
+
+		svg_content = SVG_COLOR_REGEX.sub(lambda match: color_attributes[match.group(0)], svg_content)
+		render_times.mark('color')
+		render_times.finish()
 
 		return svg_content
 
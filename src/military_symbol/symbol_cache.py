@@ -1,12 +1,29 @@
 import sys
 import os
+import threading
 
 sys.path.append(os.path.dirname(__file__))
 from symbol import Symbol
+from bounded_cache import BoundedCache
 import name_to_sidc
 from schema import Schema
 from output_style import OutputStyle
 
+class _Flight:
+    """
+    A value being created by one thread that other threads asking for the same key wait on
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.exception:BaseException = None
+
+    def wait(self):
+        self.done.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
 class SymbolCache:
 
     STYLE_OPTIONS = [
@@ -16,11 +33,125 @@ class SymbolCache:
         'unfilled'
     ]
 
-    def __init__(self, symbol_schema):
-        self.sidc_to_symbol_map:dict = {}  # Map of SIDCs + options to SVG string
-        self.name_to_sidc_string_map:dict = {}  # Map of names to (symbol, SIDC) pairs
+    # Default capacity limits; None means unlimited
+    DEFAULT_MAX_NAMES:int = 4096
+    DEFAULT_MAX_SYMBOLS:int = 4096
+    DEFAULT_MAX_SVGS:int = 16384
+    DEFAULT_MAX_SVG_BYTES:int = 64 * 1024 * 1024
+
+    def __init__(self, symbol_schema, max_names:int=DEFAULT_MAX_NAMES, max_symbols:int=DEFAULT_MAX_SYMBOLS,
+        max_svgs:int=DEFAULT_MAX_SVGS, max_svg_bytes:int=DEFAULT_MAX_SVG_BYTES, symbol_policy:str='lru', svg_policy:str='lru', thread_safe:bool=False,
+        disk_cache_path:str=None):
+        """
+        :param symbol_schema: The schema to construct symbols from
+        :param max_names: The maximum number of symbols resolved from names to keep, or None for no limit
+        :param max_symbols: The maximum number of symbols constructed from SIDCs to keep, or None for no limit
+        :param max_svgs: The maximum number of rendered SVGs to keep, or None for no limit
+        :param max_svg_bytes: The maximum total length of the rendered SVGs to keep, or None for no limit
+        :param symbol_policy: The eviction policy for symbols, either 'lru' or 'lfu'
+        :param svg_policy: The eviction policy for rendered SVGs, either 'lru' or 'lfu'
+        :param thread_safe: Whether the cache may be used from multiple threads at once. Cached lookups don't wait on
+            a lock, and concurrent requests for the same uncached symbol or SVG wait on a single thread creating it.
+        :param disk_cache_path: An optional SQLite file to persist SVGs rendered from SIDCs in, which may be shared by
+            several processes
+        """
+        self.symbols:BoundedCache = BoundedCache(max_entries=max_symbols, policy=symbol_policy, thread_safe=thread_safe)  # Map of SIDCs to symbols
+        self.svgs:BoundedCache = BoundedCache(max_entries=max_svgs, max_bytes=max_svg_bytes, policy=svg_policy, size_func=len, thread_safe=thread_safe)  # Map of (SIDC or name key, options) to SVG strings
+        self.names:BoundedCache = BoundedCache(max_entries=max_names, policy='lru', thread_safe=thread_safe)  # Map of name resolution keys to symbols
         self.symbol_schema = symbol_schema
 
+        self.thread_safe:bool = thread_safe
+        self.flight_lock = threading.Lock() if thread_safe else None
+        self.flights:dict = {}  # Map of (tier, key) to the _Flight creating it
+
+        self.disk_cache = None
+        if disk_cache_path is not None:
+            # Imported here so that sqlite3 is only loaded when a disk cache is used
+            from svg_disk_cache import SVGDiskCache
+            if symbol_schema.source_hash:
+                self.disk_cache = SVGDiskCache(disk_cache_path, schema_hash=symbol_schema.source_hash)
+            else:
+                print(f'Schema has no source hash; not using SVG disk cache "{disk_cache_path}"', file=sys.stderr)
+
+    def get_name_cache_stats(self) -> dict:
+        """
+        Returns statistics for the name resolution cache
+        :return: A dict of the number of cached names, the maximum size, and the hit and miss counts
+        """
+        return self.names.get_stats()
+
+    def get_stats(self) -> dict:
+        """
+        Returns statistics for each tier of the cache
+        :return: A dict of tier name ('names', 'symbols', 'svgs', and 'disk' if there is a disk cache) to a dict of
+            the tier's statistics
+        """
+        stats:dict = {
+            'names': self.names.get_stats(),
+            'symbols': self.symbols.get_stats(),
+            'svgs': self.svgs.get_stats()
+        }
+        if self.disk_cache is not None:
+            stats['disk'] = self.disk_cache.get_stats()
+        return stats
+
+    def clear(self):
+        """
+        Removes every cached name, symbol, and SVG, keeping the statistics
+        """
+        self.names.clear()
+        self.symbols.clear()
+        self.svgs.clear()
+
+    def _get_or_create(self, tier:BoundedCache, key, create_func):
+        """
+        Returns the value cached in the given tier under the given key, calling create_func to create and cache it
+        if it's missing. In thread-safe mode only one thread creates any given value; the others wait for it.
+        :param tier: The BoundedCache to look in
+        :param key: The key to look up
+        :param create_func: A function returning the value, or None to only return cached values
+        :return: The value, or None if it isn't cached and create_func is None
+        """
+        value = tier.get(key, None)
+        if value is not None or create_func is None:
+            return value
+
+        # Failures (None) aren't cached, so they're retried next time and never reach a tier's size function
+        if not self.thread_safe:
+            value = create_func()
+            if value is not None:
+                tier.put(key, value)
+            return value
+
+        flight_key:tuple = (id(tier), key)
+        with self.flight_lock:
+            # Another thread may have finished creating the value since the lookup above
+            value = tier.peek(key, None)
+            if value is not None:
+                return value
+
+            flight:_Flight = self.flights.get(flight_key, None)
+            is_creator:bool = flight is None
+            if is_creator:
+                flight = _Flight()
+                self.flights[flight_key] = flight
+
+        if not is_creator:
+            return flight.wait()
+
+        try:
+            flight.value = create_func()
+            if flight.value is not None:
+                tier.put(key, flight.value)
+            return flight.value
+        except BaseException as ex:
+            flight.exception = ex
+            raise
+        finally:
+            with self.flight_lock:
+                del self.flights[flight_key]
+            flight.done.set()
+
     @classmethod
     def options_string_encode(cls, padding:int, style:str, use_variants:bool, use_background:bool, background_color:str):
         """
@@ -42,46 +173,39 @@ class SymbolCache:
             background_color
         )
 
-    def _get_symbol_cache_from_sidc(self, sidc, create_if_missing:bool=True, verbose:bool=False) -> tuple:
-        symbol_cache_entry:tuple = self.sidc_to_symbol_map.get(sidc, ())
-        if len(symbol_cache_entry) < 1:
-            # Entry doesn't exist
-            if create_if_missing:
-                # Tuple doesn't exist
-                symbol:Symbol = Symbol.from_sidc(sidc=sidc, schema=self.symbol_schema)
-                symbol_cache_entry = (symbol, {})
-                self.sidc_to_symbol_map[sidc] = symbol_cache_entry
-
-                return symbol_cache_entry
-            else:
-                return None
-        else:
-            # print('Symbol cache hit')
-            return symbol_cache_entry
+    @classmethod
+    def make_output_style(cls, padding:int, style:str, use_variants:bool, use_background:bool, background_color:str) -> OutputStyle:
+        """
+        Returns the OutputStyle that SVGs cached with the given options are rendered with
+        """
+        output_style = OutputStyle()
+        output_style.padding = padding
+        output_style.use_alternate_icons = use_variants
+        output_style.use_background = use_background
+        output_style.background_width = OutputStyle.DEFAULT_BACKGROUND_WIDTH if use_background else 0
+        output_style.background_color = background_color
+        output_style.fill_style = style
+        return output_style
+
+    def _get_symbol_from_sidc(self, sidc, create_if_missing:bool=True, verbose:bool=False) -> Symbol:
+        create_func = (lambda: Symbol.from_sidc(sidc=sidc, schema=self.symbol_schema)) if create_if_missing else None
+        return self._get_or_create(self.symbols, sidc, create_func)
 
     def get_symbol_from_sidc(self, sidc:str, create_if_missing:bool=True, verbose:bool=False) -> Symbol:
-        ret = self._get_symbol_cache_from_sidc(sidc, create_if_missing, verbose=verbose)
-        return ret[0] if ret is not None else None
-
-    def _get_symbol_cache_from_name(self, name, create_if_missing:bool=True, verbose:bool=False, limit_to_symbol_sets=None) -> tuple:
-        sidc:str = self.name_to_sidc_string_map.get(name, '')
-        if sidc == '':
-            if create_if_missing:
-                symbol:Symbol = name_to_sidc.name_to_symbol(name, self.symbol_schema, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)
-                sidc = symbol.to_sidc()
-                cache_entry:tuple = (symbol, {})
-                self.sidc_to_symbol_map[sidc] = cache_entry
-                self.name_to_sidc_string_map[name] = sidc
-                return cache_entry
-            else:
-                return None
-        else:
-            # print('Cache hit on symbol cache to name')
-            return self.sidc_to_symbol_map[sidc]
+        return self._get_symbol_from_sidc(sidc, create_if_missing, verbose=verbose)
+
+    def _get_symbol_from_name(self, name, create_if_missing:bool=True, verbose:bool=False, limit_to_symbol_sets=None) -> tuple:
+        # Names are cached by the normalized string name_to_symbol matches against, so that variations in case and
+        # spacing share one entry, along with the symbol set limits and template version that affect the result.
+        # The resolved symbol is kept with the name rather than looked up by SIDC, since not every symbol built
+        # from a name survives a round trip through its SIDC.
+        name_key:tuple = name_to_sidc.name_resolution_key(name, self.symbol_schema, limit_to_symbol_sets)
+        create_func = (lambda: name_to_sidc.name_to_symbol(name, self.symbol_schema, verbose=verbose,
+            limit_to_symbol_sets=limit_to_symbol_sets)) if create_if_missing else None
+        return name_key, self._get_or_create(self.names, name_key, create_func)
 
     def get_symbol_from_name(self, name, create_if_missing:bool=True, verbose:bool=False, limit_to_symbol_sets=None) -> Symbol:
-        cache_entry:tuple = self._get_symbol_cache_from_name(name, create_if_missing, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)
-        return cache_entry[0] if cache_entry is not None else None
+        return self._get_symbol_from_name(name, create_if_missing, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)[1]
 
     def get_symbol(self, creator_var:str, is_sidc:bool, create_if_missing:bool=True, verbose:bool=False, limit_to_symbol_sets=None):
         if is_sidc:
@@ -93,49 +217,89 @@ class SymbolCache:
         use_background:bool=True, background_color:str='#ffffff', create_if_missing:bool=True, verbose:bool=False, force_all_elements:bool=False,
         limit_to_symbol_sets=None) -> tuple:
 
-        cache_entry_tuple: tuple = self._get_symbol_cache_from_sidc(creator_val,
-                                                                    create_if_missing) if is_sidc else self._get_symbol_cache_from_name(
-            creator_val, create_if_missing, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)
+        # SVGs are keyed by the SIDC string or name resolution key the symbol was looked up by
+        if is_sidc:
+            symbol_key = creator_val
+            symbol:Symbol = self._get_symbol_from_sidc(creator_val, create_if_missing, verbose=verbose)
+        else:
+            symbol_key, symbol = self._get_symbol_from_name(creator_val, create_if_missing, verbose=verbose, limit_to_symbol_sets=limit_to_symbol_sets)
 
-        if cache_entry_tuple is None:
+        if symbol is None:
             return None, ''
 
-        symbol: Symbol = cache_entry_tuple[0]
-        svg_map: dict = cache_entry_tuple[1]
-
-        key_string: str = self.options_string_encode(padding, style, use_variants, use_background, background_color)
-        svg_string: str = svg_map.get(key_string, '')
-        if svg_string == '':
-            if create_if_missing:
-                output_style = OutputStyle()
-                output_style.padding = padding
-                output_style.use_alternate_icons = use_variants
-                output_style.use_background = use_background
-                output_style.background_width = OutputStyle.DEFAULT_BACKGROUND_WIDTH if use_background else 0
-                output_style.background_color = background_color
-                output_style.fill_style = style
-
-                svg_string = symbol.get_svg(output_style=output_style)
-                svg_map[key_string] = svg_string
-                return symbol, svg_string
-            else:
-                return symbol, ''
-        else:
-            return symbol, svg_string
+        options_string:str = self.options_string_encode(padding, style, use_variants, use_background, background_color)
+
+        def render_svg() -> str:
+            # Only SVGs looked up by SIDC are persisted, since names resolve differently with different templates.
+            # They're stored under the symbol's canonical SIDC, so that every spelling of a SIDC (20 or 30 digits,
+            # either version) shares one entry.
+            use_disk_cache:bool = is_sidc and self.disk_cache is not None
+            if use_disk_cache:
+                canonical_sidc:str = symbol.get_sidc()
+                svg_string:str = self.disk_cache.get(canonical_sidc, options_string)
+                if svg_string is not None:
+                    return svg_string
+
+            output_style = self.make_output_style(padding, style, use_variants, use_background, background_color)
+            svg_string:str = symbol.get_svg(output_style=output_style)
+
+            if use_disk_cache:
+                self.disk_cache.put(canonical_sidc, options_string, svg_string)
+            return svg_string
+
+        key:tuple = (symbol_key, options_string)
+        svg_string:str = self._get_or_create(self.svgs, key, render_svg if create_if_missing else None)
+        return symbol, svg_string if svg_string is not None else ''
+
+    def get_cached_symbol(self, creator_val:str, is_sidc:bool, limit_to_symbol_sets=None) -> Symbol:
+        """
+        Returns the symbol for the given SIDC or name if it's already cached, without creating it or counting a miss
+        :param creator_val: The SIDC or name of the symbol
+        :param is_sidc: Whether the creator value is a SIDC (true) or name (false)
+        :param limit_to_symbol_sets: A list of symbol set names to restrict name guessing to
+        :return: The cached symbol, or None if it isn't cached
+        """
+        tier, symbol_key = self._get_symbol_tier_and_key(creator_val, is_sidc, limit_to_symbol_sets)
+        return tier.get(symbol_key, None) if symbol_key in tier else None
+
+    def get_cached_symbol_and_svg_string(self, creator_val:str, is_sidc:bool, padding:int, style:str, use_variants:bool,
+        use_background:bool=True, background_color:str='#ffffff', limit_to_symbol_sets=None) -> tuple:
+        """
+        Returns the symbol and SVG for the given SIDC or name if both are already cached in memory, without creating
+        either, reading the disk cache, waiting on another thread, or counting a miss
+        :return: A (Symbol, str) tuple, or (None, '') if either isn't cached
+        """
+        tier, symbol_key = self._get_symbol_tier_and_key(creator_val, is_sidc, limit_to_symbol_sets)
+        key:tuple = (symbol_key, self.options_string_encode(padding, style, use_variants, use_background, background_color))
+        if symbol_key not in tier or key not in self.svgs:
+            return None, ''
+
+        # Either may have been evicted by another thread since the check above
+        symbol:Symbol = tier.get(symbol_key, None)
+        svg_string:str = self.svgs.get(key, None)
+        if symbol is None or svg_string is None:
+            return None, ''
+        return symbol, svg_string
+
+    def _get_symbol_tier_and_key(self, creator_val:str, is_sidc:bool, limit_to_symbol_sets=None) -> tuple:
+        if is_sidc:
+            return self.symbols, creator_val
+        return self.names, name_to_sidc.name_resolution_key(creator_val, self.symbol_schema, limit_to_symbol_sets)
 
-    def get_svg_string(self, creator_val:str, is_sidc:bool, padding:int, style:str, use_variants:bool, use_background:bool=True, 
+    def get_svg_string(self, creator_val:str, is_sidc:bool, padding:int, style:str, use_variants:bool, use_background:bool=True,
         background_color:str='#ffffff', create_if_missing:bool=True, verbose:bool=False, force_all_elements:bool=False,
         limit_to_symbol_sets=None):
 
         return self.get_symbol_and_svg_string(creator_val, is_sidc, padding, style, use_variants, use_background, 
-            background_color, create_if_missing, verbose=verbose, force_all_elements=force_all_elements)[1]
+            background_color, create_if_missing, verbose=verbose, force_all_elements=force_all_elements,
+            limit_to_symbol_sets=limit_to_symbol_sets)[1]
 
     def get_svg_string_from_name(self, name, padding:int, style:str, use_variants:bool=False, use_background:bool=True, 
         background_color:str='#ffffff', create_if_missing:bool=True, verbose:bool=False, force_all_elements:bool=False,
         limit_to_symbol_sets=None):
 
         return self.get_svg_string(name, False, padding, style, use_variants, use_background, background_color, create_if_missing, 
-            verbose=verbose, force_all_elements=force_all_elements)
+            verbose=verbose, force_all_elements=force_all_elements, limit_to_symbol_sets=limit_to_symbol_sets)
 
     def get_svg_string_from_sidc(self, sidc, padding:int, style:str, use_variants:bool=False, use_background:bool=True, 
         background_color:str='#ffffff', create_if_missing:bool=True, verbose:bool=False, force_all_elements:bool=False):
@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+sys.path.append(os.path.dirname(__file__))
+import command_line
+import instrumentation
+from symbol_cache import SymbolCache
+from library_version import VERSION
+
+"""
+A small HTTP server for rendering symbols, built on the standard library's http.server
+"""
+
+class ServerMetrics:
+    """
+    Request counts and timings for a SymbolServer, safe to update from its request threads
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time:float = time.time()
+        self.requests:int = 0
+        self.responses:dict = {}    # Map of HTTP status code to the number of responses with it
+        self.bytes_sent:int = 0
+        self.request_seconds:float = 0.0
+
+    def add(self, status:int, bytes_sent:int, elapsed:float):
+        with self.lock:
+            self.requests += 1
+            self.responses[status] = self.responses.get(status, 0) + 1
+            self.bytes_sent += bytes_sent
+            self.request_seconds += elapsed
+
+    def to_prometheus(self, prefix:str='military_symbol') -> str:
+        metrics:dict = self.to_dict()
+        lines:list = [
+            f'# HELP {prefix}_http_responses_total HTTP responses by status code',
+            f'# TYPE {prefix}_http_responses_total counter'
+        ]
+        lines += [f'{prefix}_http_responses_total{{status="{status}"}} {count}' for status, count in metrics['responses'].items()]
+        lines += [
+            f'# HELP {prefix}_http_response_bytes_total Bytes of response bodies sent',
+            f'# TYPE {prefix}_http_response_bytes_total counter',
+            f'{prefix}_http_response_bytes_total {metrics["bytes_sent"]}',
+            f'# HELP {prefix}_http_request_seconds_total Time spent handling requests',
+            f'# TYPE {prefix}_http_request_seconds_total counter',
+            f'{prefix}_http_request_seconds_total {metrics["request_seconds"]:.6f}'
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                'uptime_s': round(time.time() - self.start_time, 3),
+                'requests': self.requests,
+                'responses': {str(status): count for status, count in sorted(self.responses.items())},
+                'not_modified': self.responses.get(304, 0),
+                'bytes_sent': self.bytes_sent,
+                'request_seconds': round(self.request_seconds, 6)
+            }
+
+
+class SymbolServer(ThreadingHTTPServer):
+    """
+    A threaded HTTP server rendering symbols through one shared SymbolCache. Serves:
+        /sidc/<SIDC>.svg    The symbol for a SIDC
+        /name/<name>.svg    The best-guess symbol for a URL-encoded name
+        /metrics            Request and cache statistics, and instrumentation timings if enabled, as JSON; with
+                            ?format=prometheus, request and instrumentation metrics in Prometheus text format
+    SVG requests take the query parameters style (light, medium, dark or unfilled), padding, variants (0 or 1),
+    background (0 or 1) and background_color, and for names, limit_to (repeatable) to restrict name guessing.
+    """
+
+    daemon_threads = True
+
+    # SVGs for a SIDC never change for a given schema and library version, and names only change when templates do
+    SIDC_CACHE_CONTROL:str = 'public, max-age=31536000, immutable'
+    NAME_CACHE_CONTROL:str = 'public, max-age=86400'
+
+    def __init__(self, server_address:tuple, symbol_cache:SymbolCache=None, quiet:bool=False):
+        """
+        :param server_address: The (host, port) to listen on; port 0 picks a free port
+        :param symbol_cache: The SymbolCache to render with; defaults to the module-level default cache
+        :param quiet: Whether to skip logging each request to stderr
+        """
+        super().__init__(server_address, SymbolRequestHandler)
+        self.symbol_cache:SymbolCache = symbol_cache if symbol_cache is not None else command_line.get_symbol_cache()
+        self.quiet:bool = quiet
+        self.metrics:ServerMetrics = ServerMetrics()
+
+    def get_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def get_etag(self, sidc:str, options_string:str) -> str:
+        """
+        Returns the strong ETag for the SVG of the given canonical SIDC rendered with the given encoded options
+        """
+        schema_hash:str = self.symbol_cache.symbol_schema.source_hash
+        digest:str = hashlib.sha1(f'{sidc}|{options_string}|{schema_hash}|{VERSION}'.encode('utf-8')).hexdigest()
+        return f'"{digest}"'
+
+
+class SymbolRequestHandler(BaseHTTPRequestHandler):
+
+    server_version:str = f'military-symbol/{VERSION}'
+    protocol_version:str = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _handle(self, send_body:bool):
+        start_time:float = time.perf_counter()
+        try:
+            status, headers, body = self._route()
+        except Exception as ex:
+            status, headers, body = self._error(500, f'{type(ex).__name__}: {ex}')
+
+        # Counted before the response is sent, so a client sees its own request in the metrics that follow it
+        self.server.metrics.add(status, len(body) if send_body else 0, time.perf_counter() - start_time)
+
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def _error(self, status:int, message:str) -> tuple:
+        return status, {'Content-Type': 'text/plain; charset=utf-8', 'Cache-Control': 'no-store'}, (message + '\n').encode('utf-8')
+
+    def _route(self) -> tuple:
+        url = urlsplit(self.path)
+        path:str = url.path
+
+        if path == '/metrics':
+            if parse_qs(url.query).get('format', [''])[-1] == 'prometheus':
+                text:str = self.server.metrics.to_prometheus() + instrumentation.to_prometheus()
+                return 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Cache-Control': 'no-store'}, text.encode('utf-8')
+
+            metrics:dict = self.server.metrics.to_dict()
+            metrics['cache'] = self.server.symbol_cache.get_stats()
+            if instrumentation.enabled:
+                metrics['instrumentation'] = instrumentation.get_snapshot()
+            return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, json.dumps(metrics).encode('utf-8')
+
+        for prefix, is_sidc in [('/sidc/', True), ('/name/', False)]:
+            if path.startswith(prefix) and path.endswith('.svg'):
+                creator_val:str = unquote(path[len(prefix):-len('.svg')])
+                if not creator_val:
+                    return self._error(404, 'No SIDC or name given')
+                return self._render(creator_val, is_sidc, parse_qs(url.query))
+
+        return self._error(404, f'Not found: {path}')
+
+    def _render(self, creator_val:str, is_sidc:bool, query:dict) -> tuple:
+        def get_param(name:str, default:str) -> str:
+            values:list = query.get(name, [])
+            return values[-1] if len(values) > 0 else default
+
+        style:str = get_param('style', 'light').lower()
+        styles:list = [choice for choice in SymbolCache.STYLE_OPTIONS if choice == style or choice[0] == style]
+        if len(styles) < 1:
+            return self._error(400, f'Unknown style "{style}"; must be one of {SymbolCache.STYLE_OPTIONS}')
+        style = styles[0]
+
+        try:
+            padding:int = int(get_param('padding', '4'))
+        except ValueError:
+            return self._error(400, 'padding must be an integer')
+
+        use_variants:bool = get_param('variants', '0').lower() in ['1', 'true', 'yes']
+        use_background:bool = get_param('background', '0').lower() in ['1', 'true', 'yes']
+        background_color:str = get_param('background_color', '#ffffff')
+        limit_to_symbol_sets:list = query.get('limit_to', None) if not is_sidc else None
+
+        symbol_cache:SymbolCache = self.server.symbol_cache
+        if is_sidc:
+            # Bad SIDCs are the client's fault, so they're rejected here rather than failing while parsing or rendering
+            creator_val = re.sub(r'\s+', '', creator_val)
+            if not re.fullmatch(r'[0-9]{20,30}', creator_val):
+                return self._error(400, f'SIDC "{creator_val}" must be 20 to 30 decimal digits')
+            if creator_val[4:6] not in symbol_cache.symbol_schema.symbol_sets:
+                return self._error(404, f'Unknown symbol set "{creator_val[4:6]}" in SIDC "{creator_val}"')
+
+        # Name guessing reports what it had to assume on stdout, which belongs to whoever runs the server
+        with contextlib.redirect_stdout(sys.stderr):
+            symbol = symbol_cache.get_symbol(creator_val, is_sidc, limit_to_symbol_sets=limit_to_symbol_sets)
+        if symbol is None:
+            return self._error(404, f'Unable to create a symbol from "{creator_val}"')
+        if symbol.entity is None:
+            return self._error(404, f'Unknown entity "{creator_val[10:16] if is_sidc else creator_val}"')
+
+        # The ETag only depends on the symbol and options, so a matching request is answered without rendering
+        options_string:str = SymbolCache.options_string_encode(padding, style, use_variants, use_background, background_color)
+        etag:str = self.server.get_etag(symbol.get_sidc(), options_string)
+        headers:dict = {
+            'ETag': etag,
+            'Cache-Control': SymbolServer.SIDC_CACHE_CONTROL if is_sidc else SymbolServer.NAME_CACHE_CONTROL
+        }
+
+        # If-None-Match uses weak comparison, so a tag the client sends back marked weak (W/"...") still matches
+        if_none_match:str = self.headers.get('If-None-Match', None)
+        if if_none_match is not None and (if_none_match.strip() == '*' or
+                                          etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]):
+            return 304, headers, b''
+
+        with contextlib.redirect_stdout(sys.stderr):
+            symbol, svg_string = symbol_cache.get_symbol_and_svg_string(creator_val, is_sidc, padding, style, use_variants,
+                use_background=use_background, background_color=background_color, limit_to_symbol_sets=limit_to_symbol_sets)
+        if not svg_string:
+            return self._error(500, f'Unable to render "{creator_val}"')
+
+        headers['Content-Type'] = 'image/svg+xml'
+        return 200, headers, svg_string.encode('utf-8')
+
+
+def make_server(host:str='127.0.0.1', port:int=8080, symbol_cache:SymbolCache=None, quiet:bool=False) -> SymbolServer:
+    """
+    Creates a symbol server listening on the given address, without starting it
+    :param host: The host to listen on
+    :param port: The port to listen on; 0 picks a free port, which is available from server_address
+    :param symbol_cache: The SymbolCache to render with; defaults to the module-level default cache
+    :param quiet: Whether to skip logging each request to stderr
+    :return: The SymbolServer; call serve_forever() to run it and shutdown() from another thread to stop it
+    """
+    return SymbolServer((host, port), symbol_cache=symbol_cache, quiet=quiet)
+
+
+def serve_main(argv:list):
+    """
+    Runs the symbol server from "military-symbol serve" command-line arguments
+    :param argv: The arguments following "serve"
+    """
+    parser = argparse.ArgumentParser(prog='military-symbol serve', description='Serve rendered symbols over HTTP')
+    parser.add_argument('--host', dest='host', default='127.0.0.1', help='The host to listen on; default is 127.0.0.1')
+    parser.add_argument('--port', dest='port', type=int, default=8080, help='The port to listen on; default is 8080')
+    parser.add_argument('--snapshot', dest='snapshot_path', default=None,
+                        help='A compiled schema snapshot to load from, which is written if it is missing or stale')
+    parser.add_argument('--disk-cache', dest='disk_cache_path', default=None,
+                        help='A SQLite file to persist rendered SVGs in')
+    parser.add_argument('-m', '--template', dest='template_filename', default='',
+                        help='A template JSON file; see example folder for details')
+    parser.add_argument('--instrument', dest='instrument', action='store_const', const=True, default=False,
+                        help='Record per-stage timings, reported by /metrics')
+    parser.add_argument('-q', '--quiet', dest='quiet', action='store_const', const=True, default=False,
+                        help='Don\'t log each request to stderr')
+    arguments = parser.parse_args(argv)
+
+    if arguments.instrument:
+        instrumentation.enable()
+
+    cache_options:dict = {'disk_cache_path': arguments.disk_cache_path} if arguments.disk_cache_path else None
+    command_line.init(snapshot_path=arguments.snapshot_path, cache_options=cache_options)
+    if arguments.template_filename != '':
+        command_line.add_templates_from_file(arguments.template_filename)
+
+    server = make_server(arguments.host, arguments.port, quiet=arguments.quiet)
+    print(f'Serving symbols on {server.get_url()}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -2,7 +2,6 @@ import os
 import re
 import json
 import sys
-import yaml
 import copy
 
 sys.path.append(os.path.dirname(__file__))
@@ -148,6 +147,8 @@ class Template():
 			schema = Schema.load()
 		if not os.path.exists(filename):
 			raise Exception(f'Template file \"{filename}\" doesn\'t exist')
+
+		import yaml
 		with open(filename, 'r') as in_file:
 			data = yaml.safe_load(in_file)
 
@@ -0,0 +1,89 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'military_symbol'))
+from output_style import OutputStyle
+from schema import Schema
+from symbol import Symbol
+
+"""
+Byte-for-byte regression tests for rendered SVGs. data/golden_svgs.json holds symbols rendered across affiliations,
+fill styles and text options; each is rendered twice so both the first render and the one served from the frame,
+icon, color and glyph caches are checked against it. After an intended change to rendering, regenerate the fixture
+with:
+
+    python test/test_golden_svgs.py --write
+"""
+
+FIXTURE_PATH:str = os.path.join(os.path.dirname(__file__), 'data', 'golden_svgs.json')
+
+# SIDCs with their affiliation digit left as {}
+SIDC_TEMPLATES:list = [
+    '130{}01000011000001010000000000', # Air military attack heavy, with text in its icon and both modifiers
+    '130{}10152112050000100000000000', # Land unit with a headquarters staff, echelon and status
+    '130{}36000011000000000000000000', # Sea mine, which has an alternate icon
+]
+AFFILIATIONS:str = '1346' # Unknown, friend, neutral and hostile
+FILL_STYLES:list = ['light', 'medium', 'dark', 'unfilled']
+
+
+def get_cases() -> dict:
+    """
+    Returns a map of case names to (SIDC, output style) tuples
+    """
+    cases:dict = {}
+    for sidc_template in SIDC_TEMPLATES:
+        for affiliation in AFFILIATIONS:
+            sidc:str = sidc_template.format(affiliation)
+            for fill_style in FILL_STYLES:
+                for use_text_paths in [False, True]:
+                    output_style = OutputStyle(use_text_paths=use_text_paths)
+                    output_style.fill_style = fill_style
+                    cases[f'{sidc} {fill_style}{" text-paths" if use_text_paths else ""}'] = (sidc, output_style)
+
+            # Alternate icons and backgrounds change the icon fragments and color substitutions used
+            output_style = OutputStyle()
+            output_style.use_alternate_icons = True
+            output_style.background_width = OutputStyle.DEFAULT_BACKGROUND_WIDTH
+            output_style.background_color = 'ff0000'
+            cases[f'{sidc} light alternate background'] = (sidc, output_style)
+    return cases
+
+
+def render_cases(schema:Schema) -> dict:
+    rendered:dict = {}
+    for name, (sidc, output_style) in get_cases().items():
+        with contextlib.redirect_stderr(io.StringIO()):
+            rendered[name] = Symbol.from_sidc(sidc, schema).get_svg(output_style=output_style)
+    return rendered
+
+
+class GoldenSVGTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema = Schema.load_from_directory()
+        with open(FIXTURE_PATH, 'r') as fixture_file:
+            cls.golden = json.load(fixture_file)
+
+    def test_fixture_covers_cases(self):
+        self.assertEqual(sorted(self.golden), sorted(get_cases()))
+
+    def test_renders_match_fixture(self):
+        for attempt in ['first render', 'cached render']:
+            rendered:dict = render_cases(self.schema)
+            for name, svg_string in rendered.items():
+                self.assertEqual(svg_string, self.golden[name], f'{name} ({attempt})')
+
+
+if __name__ == '__main__':
+    if '--write' in sys.argv:
+        with open(FIXTURE_PATH, 'w') as fixture_file:
+            json.dump(render_cases(Schema.load_from_directory()), fixture_file, indent=1, sort_keys=True)
+            fixture_file.write('\n')
+    else:
+        unittest.main()
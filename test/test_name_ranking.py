@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+from functools import cmp_to_key
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'military_symbol'))
+from schema import Schema
+import benchmark
+import name_to_sidc
+
+"""
+Regression tests for name resolution. data/name_corpus.tsv holds names and the SIDCs they resolved to before match
+ranking moved from a comparator to a sort key; rank_matches is also checked against that comparator directly.
+"""
+
+CORPUS_PATH:str = os.path.join(os.path.dirname(__file__), 'data', 'name_corpus.tsv')
+
+
+def read_corpus() -> list:
+    with open(CORPUS_PATH, 'r') as corpus_file:
+        return [tuple(line.rstrip('\n').split('\t')) for line in corpus_file if line.strip()]
+
+
+def comparator_rank(name_string:str, matches:list):
+    # The comparator rank_matches used to sort with, kept as the reference ordering
+    from thefuzz import fuzz
+
+    for match in matches:
+        if name_to_sidc.exact_match(name_string, match[0]):
+            matches = [(name, cand) for (name, cand) in matches if name_to_sidc.exact_match(name, name_string)]
+            break
+
+    if len(matches) < 1:
+        return None, None
+
+    def match_weight(obj) -> float:
+        get_match_weight = getattr(obj, 'get_match_weight', None)
+        return get_match_weight() if callable(get_match_weight) else 0.0
+
+    def sort_func(a, b):
+        score_a = fuzz.partial_ratio(a[0], name_string)
+        score_b = fuzz.partial_ratio(b[0], name_string)
+        if score_a == score_b:
+            if match_weight(a[1]) > match_weight(b[1]):
+                return -1
+            elif match_weight(a[1]) < match_weight(b[1]):
+                return 1
+            if len(a[0]) == len(b[0]):
+                return 0
+            return 1 if len(a[0]) < len(b[0]) else -1
+        return 1 if score_a > score_b else -1
+
+    matches = sorted(matches, key=cmp_to_key(sort_func))
+    return matches[0][1], name_string.replace(matches[0][0], '').strip().replace('  ', ' ')
+
+
+class NameRankingTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema = Schema.load_from_directory()
+        cls.corpus = read_corpus()
+
+    def test_corpus_resolves_to_recorded_sidcs(self):
+        mismatches:list = []
+        for name, expected_sidc in self.corpus:
+            # Name guessing reports what it assumes on stdout
+            with contextlib.redirect_stdout(io.StringIO()):
+                symbol = name_to_sidc.name_to_symbol(name, self.schema)
+            sidc:str = symbol.to_sidc() if symbol is not None else ''
+            if sidc != expected_sidc:
+                mismatches.append((name, expected_sidc, sidc))
+        self.assertEqual(mismatches, [])
+
+    def test_rank_matches_agrees_with_comparator(self):
+        names:list = [name for name, _ in self.corpus] + benchmark.BENCHMARK_AMBIGUOUS_NAMES
+        for name in names:
+            name_string:str = name.lower().strip()
+            matches:list = benchmark.get_entity_matches(self.schema, name_string)
+            expected:tuple = comparator_rank(name_string, matches)
+            ranked:tuple = name_to_sidc.rank_matches(name_string, matches)
+            self.assertIs(ranked[0], expected[0], name)
+            self.assertEqual(ranked[1], expected[1], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
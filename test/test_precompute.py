@@ -0,0 +1,51 @@
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'military_symbol'))
+import command_line
+import precompute
+from symbol_cache import SymbolCache
+
+"""
+Tests for precomputing the catalog into the persistent SVG cache
+"""
+
+
+class PrecomputeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.disk_cache_path:str = os.path.join(self.temp_dir.name, 'svgs.sqlite')
+
+    def tearDown(self):
+        precompute._open_disk_cache(None)
+        self.temp_dir.cleanup()
+
+    def test_precomputed_entry_serves_other_spellings(self):
+        # Air missile (02) has a single entity, so this renders one entry per base affiliation
+        summary:dict = precompute.precompute(disk_cache_path=self.disk_cache_path, styles=['light'], variants=[False],
+                                             limit_to_symbol_sets=['02'], workers=1)
+        self.assertTrue(summary['complete'])
+        with contextlib.closing(sqlite3.connect(self.disk_cache_path)) as connection:
+            row_count:int = connection.execute('SELECT COUNT(*) FROM svgs').fetchone()[0]
+        self.assertEqual(row_count, summary['rendered'])
+
+        schema = command_line.get_schema()
+        entity_id:str = list(schema.symbol_sets['02'].entities)[0]
+        # Precompute generates 20-digit version 10 SIDCs; ask for a 30-digit version 13 spelling instead
+        sidc:str = f'1303020000{entity_id}00000000000000'
+        symbol_cache = SymbolCache(schema, disk_cache_path=self.disk_cache_path)
+        svg_string:str = symbol_cache.get_svg_string_from_sidc(sidc, 4, 'light', use_background=False)
+
+        self.assertTrue(svg_string.startswith('<svg'))
+        self.assertEqual(symbol_cache.disk_cache.get_stats()['hits'], 1)
+        self.assertEqual(symbol_cache.disk_cache.get_stats()['writes'], 0)
+        symbol_cache.disk_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'military_symbol'))
+from schema import Schema
+from symbol_cache import SymbolCache
+
+"""
+Tests for the persistent SVG cache, which stores SVGs under each symbol's canonical SIDC
+"""
+
+SHORT_SIDC:str = '10031000001211000000'
+LONG_SIDC:str = '130310000012110000000000000000'
+
+
+class SVGDiskCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema = Schema.load_from_directory()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.disk_cache_path:str = os.path.join(self.temp_dir.name, 'svgs.sqlite')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def count_rows(self) -> int:
+        with contextlib.closing(sqlite3.connect(self.disk_cache_path)) as connection:
+            return connection.execute('SELECT COUNT(*) FROM svgs').fetchone()[0]
+
+    def test_sidc_spellings_share_one_row(self):
+        first_cache = SymbolCache(self.schema, disk_cache_path=self.disk_cache_path)
+        first_svg:str = first_cache.get_svg_string_from_sidc(SHORT_SIDC, 4, 'light')
+        first_cache.disk_cache.close()
+        self.assertEqual(self.count_rows(), 1)
+
+        # A fresh cache has nothing in memory, so the 30-digit spelling can only be served from the row above
+        second_cache = SymbolCache(self.schema, disk_cache_path=self.disk_cache_path)
+        second_svg:str = second_cache.get_svg_string_from_sidc(LONG_SIDC, 4, 'light')
+        second_cache.disk_cache.close()
+
+        self.assertEqual(second_svg, first_svg)
+        self.assertEqual(second_cache.disk_cache.get_stats()['hits'], 1)
+        self.assertEqual(second_cache.disk_cache.get_stats()['writes'], 0)
+        self.assertEqual(self.count_rows(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'military_symbol'))
+from drawing_items import SymbolElement, BBox
+from output_style import OutputStyle
+from schema import Schema
+from symbol import Symbol
+
+"""
+Tests for the bounds of text elements, which depend on whether text is rendered as <text> or as paths, and for the
+viewBox of symbols whose icons hold text
+"""
+
+
+def make_text(text:str) -> SymbolElement.Text:
+    return SymbolElement.Text.parse_from_dict({'text': text})
+
+
+def bbox_tuple(bbox:BBox) -> tuple:
+    return (bbox.x_min, bbox.y_min, bbox.x_max, bbox.y_max)
+
+
+class TextBBoxTest(unittest.TestCase):
+
+    def test_text_uses_font_metric_estimate(self):
+        output_style = OutputStyle(use_text_paths=False)
+        element = make_text('MIL')
+        bbox = element.get_bbox(None, output_style)
+
+        self.assertGreater(bbox.width(), 0)
+        self.assertGreater(bbox.height(), 0)
+        # Centered on the text's origin and spanning its baseline
+        self.assertAlmostEqual((bbox.x_min + bbox.x_max) / 2, element.pos[0])
+        self.assertLess(bbox.y_min, element.pos[1])
+        self.assertGreater(bbox.y_max, element.pos[1])
+
+    def test_text_estimate_grows_with_text(self):
+        output_style = OutputStyle(use_text_paths=False)
+        short_bbox = make_text('W').get_bbox(None, output_style)
+        long_bbox = make_text('WWWW').get_bbox(None, output_style)
+        self.assertGreater(long_bbox.width(), short_bbox.width())
+
+    def test_text_estimate_follows_alignment(self):
+        output_style = OutputStyle(use_text_paths=False)
+        element = make_text('MIL')
+        element.align = 'start'
+        self.assertAlmostEqual(element.get_bbox(None, output_style).x_min, element.pos[0])
+        element.align = 'end'
+        self.assertAlmostEqual(element.get_bbox(None, output_style).x_max, element.pos[0])
+
+    def test_text_paths_use_outline_bounds(self):
+        output_style = OutputStyle(use_text_paths=True)
+        element = make_text('MIL')
+        ret_path, bounds = element.get_text_path(output_style)
+        bbox = element.get_bbox(None, output_style)
+
+        self.assertEqual(bbox_tuple(bbox), tuple(bounds))
+        self.assertGreater(bbox.width(), 0)
+        self.assertGreater(bbox.height(), 0)
+        # Centered on the text's origin, with the glyphs above its baseline
+        self.assertLess(bbox.x_min, element.pos[0])
+        self.assertGreater(bbox.x_max, element.pos[0])
+        self.assertLessEqual(bbox.y_max, element.pos[1] + 1)
+
+    def test_text_paths_grow_with_text(self):
+        output_style = OutputStyle(use_text_paths=True)
+        short_bbox = make_text('W').get_bbox(None, output_style)
+        long_bbox = make_text('WWWW').get_bbox(None, output_style)
+        self.assertGreater(long_bbox.width(), short_bbox.width())
+
+    def test_empty_text_is_a_point(self):
+        element = make_text('')
+        for use_text_paths in [False, True]:
+            bbox = element.get_bbox(None, OutputStyle(use_text_paths=use_text_paths))
+            self.assertEqual(bbox_tuple(bbox), (element.pos[0], element.pos[1], element.pos[0], element.pos[1]))
+
+
+class SymbolViewBoxTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema = Schema.load_from_directory()
+
+    def test_view_box_contains_icon_text(self):
+        # Air military attack heavy, whose "H" modifier sits on the bottom edge of the frame
+        symbol = Symbol.from_sidc('130001000011000001010000000000', self.schema)
+        for use_text_paths in [False, True]:
+            output_style = OutputStyle(use_text_paths=use_text_paths)
+            output_style.padding = 0
+            match = re.search(r'viewBox="([^"]*)"', symbol.get_svg(output_style=output_style))
+            x, y, width, height = [float(value) for value in match.group(1).split()]
+
+            for layer in [symbol.entity, symbol.modifier_1, symbol.modifier_2]:
+                for element in layer.icon:
+                    bbox = element.get_bbox(symbol, output_style)
+                    self.assertGreaterEqual(bbox.x_min, x)
+                    self.assertGreaterEqual(bbox.y_min, y)
+                    self.assertLessEqual(bbox.x_max, x + width)
+                    self.assertLessEqual(bbox.y_max, y + height)
+
+
+if __name__ == '__main__':
+    unittest.main()